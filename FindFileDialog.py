@@ -12,19 +12,42 @@ from __future__ import unicode_literals
 import os
 import re
 import sys
+import csv
 import json
 from collections import OrderedDict
 
-from PyQt5.QtCore import pyqtSignal, Qt, pyqtSlot
+from PyQt5.QtCore import pyqtSignal, Qt, pyqtSlot, QTimer
 from PyQt5.QtGui import QCursor, QFont
 from PyQt5.QtWidgets import QDialog, QApplication, QMenu, QDialogButtonBox, \
-    QTreeWidgetItem, QComboBox, QStyleFactory, QMdiSubWindow, QFileDialog, QMessageBox
+    QComboBox, QStyleFactory, QFileDialog, QMessageBox, QHeaderView, \
+    QAction
 
 from E5Gui.E5Application import e5App, E5Application
 from E5Gui import E5MessageBox
 from E5Gui.E5PathPicker import E5PathPickerModes
 
-from subWindow import subForm
+from SearchEngine.DiffWriter import UnifiedDiffWriter
+from SearchEngine.ReplacePlan import ReplacePlan
+from SearchEngine import FileIO
+from SearchEngine.Rules import SearchRule
+from SearchEngine.Scheduler import TimeSlicer, RateLimiter
+from SearchEngine.SearchJob import SearchJob
+from SearchEngine.Cache import SearchCache
+from SearchEngine import ResultExport
+from SearchEngine.ResultFilter import ResultFilter
+from SearchEngine.Checkpoint import ReplaceCheckpoint, checkpointPath
+from SearchEngine.ImportReport import ImportReportJob
+from SearchEngine.QrcResolver import QrcResolver
+from SearchEngine.Resources import checkWritable
+from SearchEngine.Session import SessionExtension, SessionError, \
+    saveSession, loadSession
+from SearchEngine.RulePack import RulePack, RulePackError, loadPack, \
+    availablePacks, packDirectories
+from ReplaceThread import ReplaceThread
+from FindResultModel import FindResultModel
+from ResultFilterThread import ResultFilterThread
+from ImportReportDialog import ImportReportDialog
+from RuleModel import RuleModel
 
 # try:
 from Ui_FindFileDialog import Ui_FindFileDialog
@@ -41,9 +64,10 @@ class FindFileDialog(QDialog, Ui_FindFileDialog):
     """
     Class implementing a dialog to search for text in files.
     
-    The occurrences found are displayed in a QTreeWidget showing the filename,
-    the linenumber and the found text. The file will be opened upon a double
-    click onto the respective entry of the list.
+    The occurrences found are kept in a FindResultModel displayed by a
+    QTreeView showing the filename, the linenumber and the found text. The
+    file will be opened upon a double click onto the respective entry of the
+    list.
     
     @signal sourceFile(str, int, str, int, int) emitted to open a source file
         at a line
@@ -52,11 +76,12 @@ class FindFileDialog(QDialog, Ui_FindFileDialog):
     sourceFile = pyqtSignal(str, int, str, int, int)
     designerFile = pyqtSignal(str)
 
-    lineRole = Qt.UserRole + 1
-    startRole = Qt.UserRole + 2
-    endRole = Qt.UserRole + 3
-    replaceRole = Qt.UserRole + 4
-    md5Role = Qt.UserRole + 5
+    lineRole = FindResultModel.LineRole
+    startRole = FindResultModel.StartRole
+    endRole = FindResultModel.EndRole
+    replaceRole = FindResultModel.ReplaceRole
+    md5Role = FindResultModel.Md5Role
+    editsRole = FindResultModel.EditsRole
 
     def __init__(self, parent=None, replaceMode=True, projectPath=None):
         """
@@ -99,6 +124,75 @@ class FindFileDialog(QDialog, Ui_FindFileDialog):
                                      QDialogButtonBox.ActionRole)
         self.findButton.setEnabled(False)
         self.findButton.setDefault(True)
+
+        self.dryRunButton = \
+            self.buttonBox.addButton(self.tr("Dry Run"),
+                                     QDialogButtonBox.ActionRole)
+        self.dryRunButton.setToolTip(
+            self.tr("Write the selected replacements as a unified diff"
+                    " without changing any file"))
+        self.dryRunButton.setEnabled(False)
+        self.__dryRunMenu = QMenu(self)
+        self.__dryRunMenu.addAction(self.tr("To File..."),
+                                    self.__dryRunToFile)
+        act = self.__dryRunMenu.addAction(self.tr("To Standard Output"),
+                                          self.__dryRunToStdout)
+        # there is no console for frozen GUI executables
+        act.setEnabled(sys.stdout is not None)
+        self.dryRunButton.setMenu(self.__dryRunMenu)
+
+        self.resumeButton = \
+            self.buttonBox.addButton(self.tr("Resume"),
+                                     QDialogButtonBox.ActionRole)
+        self.resumeButton.setToolTip(
+            self.tr("Resume an interrupted replace run"))
+        self.resumeButton.setEnabled(os.path.exists(checkpointPath()))
+
+        self.resultsButton = \
+            self.buttonBox.addButton(self.tr("Results"),
+                                     QDialogButtonBox.ActionRole)
+        self.resultsButton.setToolTip(
+            self.tr("Export or import search results as JSON Lines or CSV"))
+        self.__resultsMenu = QMenu(self)
+        self.__exportResultsAct = self.__resultsMenu.addAction(
+            self.tr("Export..."), self.__exportResults)
+        self.__resultsMenu.addAction(self.tr("Import..."),
+                                     self.__importResults)
+        self.__resultsMenu.aboutToShow.connect(self.__showResultsMenu)
+        self.resultsButton.setMenu(self.__resultsMenu)
+
+        self.reportButton = \
+            self.buttonBox.addButton(self.tr("Report"),
+                                     QDialogButtonBox.ActionRole)
+        self.reportButton.setToolTip(
+            self.tr("Count the imported versions of the QML modules of the"
+                    " directory"))
+        self.__reportDialog = None
+
+        # the rules are rows of a table, the current rule is shown by the
+        # single rule editor, the view has to see the changes first
+        self.__ruleModel = RuleModel(self)
+        self.rulesView.setModel(self.__ruleModel)
+        self.__ruleModel.rowsInserted.connect(self.__rulesChanged)
+        self.__ruleModel.rowsRemoved.connect(self.__rulesChanged)
+        self.__ruleModel.modelReset.connect(self.__rulesChanged)
+        self.__ruleModel.dataChanged.connect(self.__ruleDataChanged)
+        self.rulesView.horizontalHeader().setSectionResizeMode(
+            RuleModel.FindColumn, QHeaderView.Stretch)
+        self.rulesView.selectionModel().currentRowChanged.connect(
+            self.__currentRuleChanged)
+        self.__removeRuleAct = QAction(self.tr("Remove Rule"), self)
+        self.__removeRuleAct.setShortcut(Qt.Key_Delete)
+        self.__removeRuleAct.setShortcutContext(Qt.WidgetShortcut)
+        self.__removeRuleAct.triggered.connect(self.__removeRule)
+        self.rulesView.addAction(self.__removeRuleAct)
+        self.__editingRule = False
+        self.ruleEditor.ruleChanged.connect(self.__ruleEdited)
+        self.ruleEditor.setEnabled(False)
+        self.__packMenu = QMenu(self)
+        self.__packMenu.aboutToShow.connect(self.__showPackMenu)
+        self.__packMenu.triggered.connect(self.__packTriggered)
+        self.packButton.setMenu(self.__packMenu)
         
         if projectPath is not None:
             self.projectPath = projectPath.replace("\\","/")
@@ -108,13 +202,17 @@ class FindFileDialog(QDialog, Ui_FindFileDialog):
             self.replaceButton.setEnabled(False)
             self.setWindowTitle(self.tr("Replace in Files"))
         else:
-            self.replaceLabel.hide()
-            self.replacetextCombo.hide()
+            self.ruleEditor.replaceLabel.hide()
+            self.ruleEditor.replacetextCombo.hide()
             self.replaceButton.hide()
+            self.dryRunButton.hide()
+            self.resumeButton.hide()
 
         self.findProgressLabel.setMaximumWidth(550)
 
-        self.findList.headerItem().setText(self.findList.columnCount(), "")
+        self.__resultModel = FindResultModel(self.__replaceMode, self)
+        self.__resultModel.rowsInserted.connect(self.__spanFileRows)
+        self.findList.setModel(self.__resultModel)
         self.findList.header().setSortIndicator(0, Qt.AscendingOrder)
         self.__section0Size = self.findList.header().sectionSize(0)
         self.findList.setExpandsOnDoubleClick(False)
@@ -124,51 +222,44 @@ class FindFileDialog(QDialog, Ui_FindFileDialog):
             # font = Preferences.getEditorOtherFonts("MonospacedFont")
             self.findList.setFont(font)
 
-        self.__cancelSearch = False
-        self.__lastFileItem = None
+        self.__searchJob = None
+        # directory listings and files stay cached for repeated searches
+        self.__searchCache = SearchCache()
+        # resource URLs of the directory for the 'qrc' template filter
+        self.__qrcResolver = QrcResolver(os.curdir)
+        self.__replaceThread = None
+        self.__templateTables = {}
+        # rules are compiled as they are edited
+        self.__ruleModel.setCompileArgs(self.__templateTables,
+                                        self.__replaceMode,
+                                        self.__qrcResolver.filters())
         self.__populating = False
 
+        # the filter is applied, when typing pauses
+        self.__filterThread = None
+        self.__filterThreads = []   # all threads still running
+        self.__pendingFilter = None
+        self.__filterTimer = QTimer(self)
+        self.__filterTimer.setSingleShot(True)
+        self.__filterTimer.setInterval(250)
+        self.__filterTimer.timeout.connect(self.__applyFilter)
+        self.filterEdit.textChanged.connect(self.__filterTimer.start)
+
         self.setContextMenuPolicy(Qt.CustomContextMenu)
         self.customContextMenuRequested.connect(self.__contextMenuRequested)
 
-    def __createItem(self, file, line, text, start, end, replTxt="", md5=""):
-        """
-        Private method to create an entry in the file list.
-        创建 Item
-        @param file filename of file (string)
-        @param line line number (integer)
-        @param text text found (string)
-        @param start start position of match (integer)
-        @param end end position of match (integer)
-        @param replTxt text with replacements applied (string)
-        @keyparam md5 MD5 hash of the file (string)
-        """
-        if self.__lastFileItem is None:
-            # It's a new file
-            self.__lastFileItem = QTreeWidgetItem(self.findList, [file])
-            self.__lastFileItem.setFirstColumnSpanned(True)
-            self.__lastFileItem.setExpanded(True)
-            if self.__replaceMode:
-                self.__lastFileItem.setFlags(
-                    self.__lastFileItem.flags() |
-                    Qt.ItemFlags(Qt.ItemIsUserCheckable | Qt.ItemIsTristate))
-                # Qt bug:
-                # item is not user checkable if setFirstColumnSpanned
-                # is True (< 4.5.0)
-            self.__lastFileItem.setData(0, self.md5Role, md5)
-
-        itm = QTreeWidgetItem(self.__lastFileItem)
-        itm.setTextAlignment(0, Qt.AlignRight)
-        itm.setData(0, Qt.DisplayRole, line)
-        itm.setData(1, Qt.DisplayRole, text)
-        itm.setData(0, self.lineRole, line)
-        itm.setData(0, self.startRole, start)
-        itm.setData(0, self.endRole, end)
-        itm.setData(0, self.replaceRole, replTxt)
-        if self.__replaceMode:
-            itm.setFlags(itm.flags() | Qt.ItemFlags(Qt.ItemIsUserCheckable))
-            itm.setCheckState(0, Qt.Checked)
-            self.replaceButton.setEnabled(True)
+    def __spanFileRows(self, parent, first, last):
+        """
+        Private slot to show the file names over the whole width of the
+        result list.
+        
+        @param parent index of the parent of the inserted rows (QModelIndex)
+        @param first first inserted row (integer)
+        @param last last inserted row (integer)
+        """
+        if not parent.isValid():
+            for row in range(first, last + 1):
+                self.findList.setFirstColumnSpanned(row, parent, True)
 
     def show(self, txt=""):
         """
@@ -178,14 +269,10 @@ class FindFileDialog(QDialog, Ui_FindFileDialog):
         """
 
         if self.__replaceMode:
-            self.findList.clear()
+            self.__clearResults()
 
         super(FindFileDialog, self).show()
 
-    def resizeEvent(self, e):
-        self.mdiArea.tileSubWindows()
-        return super().resizeEvent(e)
-
     def on_dirPicker_editTextChanged(self, text):
         """
         Private slot to handle the textChanged signal of the directory
@@ -193,11 +280,14 @@ class FindFileDialog(QDialog, Ui_FindFileDialog):
         
         @param text (ignored)
         """
-        self.enableFindButton(False, False)
+        self.enableFindButton()
 
-    def enableFindButton(self, sub=None, close=None):
+    def enableFindButton(self):
         """
         Private slot called to enable the find button.
+        
+        The rule model keeps count of the incomplete rules, so the check
+        does not depend on the number of rules.
         """
 
         def closeBtn():
@@ -212,37 +302,8 @@ class FindFileDialog(QDialog, Ui_FindFileDialog):
             closeBtn()
         elif os.path.exists(os.path.abspath(self.dirPicker.currentText())) is False:
             closeBtn()
-        elif sub is not None:
-            if close is None:
-                if sub.findtextCombo.currentText() == "" or (sub.filterEdit.text() == "") \
-                        or (self.__replaceMode is False and sub.replacetextCombo.currentText() == ""):
-                    closeBtn()
-                else:
-                    openBtn()
-            elif close is True:
-                subList = self.mdiArea.subWindowList()
-                for sub_ in subList:
-                    sub__ = sub_.widget()
-
-                    if sub__ != sub:
-                        if sub__.findtextCombo.currentText() == "" or (sub__.filterEdit.text() == ""):
-                            closeBtn()
-                            break
-                        else:
-                            openBtn()
-                    else:
-                        if len(subList) == 1:
-                            closeBtn()
-            elif close is False:
-
-                for sub_ in self.mdiArea.subWindowList():
-                    sub__ = sub_.widget()
-
-                    if sub__.findtextCombo.currentText() == "" or (sub__.filterEdit.text() == ""):
-                        closeBtn()
-                        break
-                    else:
-                        openBtn()
+        elif not self.__ruleModel.isComplete():
+            closeBtn()
         else:
             openBtn()
 
@@ -253,44 +314,52 @@ class FindFileDialog(QDialog, Ui_FindFileDialog):
         @param button button that was clicked (QAbstractButton)
         """
         if button == self.findButton:
-            self.findList.clear()
+            self.__clearResults()
             self.__doSearch()
         elif button == self.stopButton:
             self.__stopSearch()
+        elif button == self.resumeButton:
+            self.__resumeReplace()
+        elif button == self.reportButton:
+            self.__importReport()
         elif button == self.importButton:
             self.clear_btn.click()
-            fileName, ok = QFileDialog.getOpenFileName(self, "Open", "history.json", "Json (*.json)")
+            fileName, ok = QFileDialog.getOpenFileName(
+                self, "Open", "history.json",
+                "Json (*.json);;Sessions (*{0})".format(SessionExtension))
             if fileName == '':
                 return
+            elif fileName.endswith(SessionExtension):
+                self.__loadSession(fileName)
             else:
                 self.loadFromFile(fileName)
         elif button == self.exportButton:
-            fileName, ok = QFileDialog.getSaveFileName(self, "Save", "history.json", "Json (*.json)")
+            fileName, ok = QFileDialog.getSaveFileName(
+                self, "Save", "history.json",
+                "Json (*.json);;Sessions (*{0})".format(SessionExtension))
             if fileName == '':
                 return
+            elif fileName.endswith(SessionExtension):
+                self.__saveSession(fileName)
             else:
                 self.saveToFile(fileName)
         elif button == self.transButton:
-            for sub in self.mdiArea.subWindowList():
-                sub = sub.widget()
-                a, b = sub.findtextCombo.currentText(), sub.replacetextCombo.currentText()
-                sub.findtextCombo.setCurrentText(b), sub.replacetextCombo.setCurrentText(a)
-
-    def __stripEol(self, txt):
-        """
-        Private method to strip the eol part.
-        
-        @param txt line of text that should be treated (string)
-        @return text with eol stripped (string)
-        """
-        return txt.replace("\r", "").replace("\n", "")
+            for row, (pack, rule) in enumerate(self.__ruleModel.rows()):
+                data = rule.toDict()
+                data['findtextCombo'], data['replacetextCombo'] = \
+                    data['replacetextCombo'], data['findtextCombo']
+                self.__ruleModel.setRuleData(
+                    self.__ruleModel.index(row, 0), data)
 
     def __stopSearch(self):
         """
         Private slot to handle the stop button being pressed.
         """
 
-        self.__cancelSearch = True
+        if self.__searchJob is not None:
+            self.__searchJob.cancel()
+        if self.__replaceThread is not None:
+            self.__replaceThread.cancel()
 
     def __doSearch(self):
         """
@@ -301,177 +370,349 @@ class FindFileDialog(QDialog, Ui_FindFileDialog):
         #    not e5App().getObject("ViewManager").checkAllDirty():
         #     return
 
-        self.__cancelSearch = False
-
-        occurrences = 0
-        progress = 0
-        for sub in self.mdiArea.subWindowList():
-            sub = sub.widget()
-            fileFilter = sub.filterEdit.text()
-            fileFilterList = \
-                ["^{0}$".format(filter.replace(".", "\.").replace("*", ".*"))
-                 for filter in fileFilter.split(";")]
-            # *.qml -> .*\.qml
-            filterRe = re.compile("|".join(fileFilterList))
-
-            # 开始查找
-            files = self.__getFileList(
-                os.path.abspath(self.dirPicker.currentText()),
-                filterRe)
-
-            QApplication.processEvents()
-            QApplication.processEvents()
-
-            # retrieve the values
-            reg = sub.regexpCheckBox.isChecked()
-            wo = sub.wordCheckBox.isChecked()
-            cs = sub.caseCheckBox.isChecked()
-            ct = sub.findtextCombo.currentText()
-            if reg:
-                txt = ct
-            else:
-                txt = re.escape(ct)
-            if wo:
-                txt = "\\b{0}\\b".format(txt)
-            if sys.version_info[0] == 2:
-                flags = re.UNICODE | re.LOCALE
-            else:
-                flags = re.UNICODE
-            if not cs:
-                flags |= re.IGNORECASE
-            try:
-                search = re.compile(txt, flags)
-            except re.error as why:
-                E5MessageBox.critical(
-                    self,
-                    self.tr("Invalid search expression"),
-                    self.tr("""<p>The search expression is not valid.</p>"""
-                            """<p>Error: {0}</p>""").format(str(why)))
-                self.stopButton.setEnabled(False)
-                self.findButton.setEnabled(True)
-                self.findButton.setDefault(True)
-                return
-
-            if self.__replaceMode:
-                replTxt = sub.replacetextCombo.currentText()
+        root = os.path.abspath(self.dirPicker.currentText())
+        self.__qrcResolver.setRoot(root)
+
+        # the rules were compiled, when they were edited
+        invalid = self.__ruleModel.invalidRules()
+        if invalid:
+            self.__reportInvalidRules(invalid)
+            return
+        rules = self.__ruleModel.compiledRules()
+        if not rules:
+            return
+
+        # ======================================================
+        # set the button states
+        self.stopButton.setEnabled(True)
+        self.stopButton.setDefault(True)
+        self.findButton.setEnabled(False)
 
-            # ======================================================
-            # set the button states
-            self.stopButton.setEnabled(True)
-            self.stopButton.setDefault(True)
-            self.findButton.setEnabled(False)
+        # 开始查找
+        # the progress is shown as bytes done of bytes found
+        job = SearchJob(rules, root, self.__replaceMode,
+                        cache=self.__searchCache,
+                        resources=self.resourcesCheckBox.isChecked())
+        self.__searchJob = job
+        self.findProgress.setFormat("%p%")
+        self.findProgress.setMaximum(1000)
+        self.findProgress.setValue(0)
 
-            # now go through all the files
-            self.__populating = True
-            self.findList.setUpdatesEnabled(False)
-
-            breakSearch = False
-
-            fileOccurrences = 0
-
-            for file in files:
-                self.__lastFileItem = None
-                found = False
-                if self.__cancelSearch or breakSearch:
-                    break
-
-                self.findProgressLabel.setPath(file)
-
-                fn = file
-
-                # read the file and split it into textlines
-                try:
-                    text, encoding, hashStr = Utilities.readEncodedFileWithHash(fn)
-                    lines = text.splitlines(True)
-                except (UnicodeError, IOError):
-                    progress += 1
-                    self.findProgress.setValue(progress)
-                    continue
-
-                # now perform the search and display the lines found
-                count = 0
-                for line in lines:
-                    if self.__cancelSearch:
-                        break
-
-                    count += 1
-                    contains = search.search(line)
-                    if contains:
-                        occurrences += 1
-                        found = True
-                        start = contains.start()
-                        end = contains.end()
-                        if self.__replaceMode:
-                            rline = search.sub(replTxt, line)
-                        else:
-                            rline = ""
-                        line = self.__stripEol(line)
-                        if len(line) > 1024:
-                            line = "{0} ...".format(line[:1024])
-                        if self.__replaceMode:
-                            if len(rline) > 1024:
-                                rline = "{0} ...".format(line[:1024])
-                            line = "- {0}\n+ {1}".format(
-                                line, self.__stripEol(rline))
-                        self.__createItem(file, count, line, start, end,
-                                          rline, hashStr)
-
-                    QApplication.processEvents()
+        # yield to the event loop every 16 ms instead of after every line
+        slicer = TimeSlicer(QApplication.processEvents)
+        progressLimiter = RateLimiter(10)
 
+        # now go through all the files
+        self.__populating = True
+        self.findList.setUpdatesEnabled(False)
 
+        occurrences = 0
+        fileOccurrences = 0
+        for file, hashStr, matches in job.results(idle=slicer.yieldNow,
+                                                  tick=slicer.tick):
+            if progressLimiter.due():
+                self.findProgressLabel.setTextPath(
+                    "{0}  ({1})".format("{0}", job.meter.summary()), file)
+                self.findProgress.setValue(job.meter.fraction())
+
+            if matches:
+                occurrences += len(matches)
+                fileOccurrences += 1
+                self.__resultModel.addFile(file, hashStr, matches)
+                if self.__replaceMode:
+                    self.replaceButton.setEnabled(True)
+                    self.dryRunButton.setEnabled(True)
                 self.findList.setUpdatesEnabled(True)
-                self.findList.sortItems(self.findList.sortColumn(),
-                                        self.findList.header().sortIndicatorOrder())
                 self.findList.resizeColumnToContents(1)
-                count_ = self.findList.topLevelItemCount()
+            slicer.tick()
+        self.__searchJob = None
 
-                if found:
-                    fileOccurrences += 1
-                    progress += 1
-                    self.findProgress.setValue(progress)
-            #
-            if not files:
-                self.findProgress.setMaximum(1)
-                self.findProgress.setValue(1)
-            #
-            resultFormat = self.tr("{0} / {1}", "occurrences / files")
-            self.findProgressLabel.setPath(resultFormat.format(
-                self.tr("%n occurrence(s)", "", occurrences),
-                self.tr("%n file(s)", "", count_)))
-
-            if self.__replaceMode:
-                self.findList.header().resizeSection(0, self.__section0Size + 30)
-            self.findList.header().setStretchLastSection(True)
-            self.__populating = False
+        self.findList.setUpdatesEnabled(True)
+        self.findProgress.setValue(self.findProgress.maximum())
+
+        resultFormat = self.tr("{0} / {1}", "occurrences / files")
+        self.findProgressLabel.setTextPath("{0}", resultFormat.format(
+            self.tr("%n occurrence(s)", "", occurrences),
+            self.tr("%n file(s)", "", fileOccurrences)))
+
+        if self.__replaceMode:
+            self.findList.header().resizeSection(0, self.__section0Size + 30)
+        self.findList.header().setStretchLastSection(True)
+        self.__populating = False
 
+        self.stopButton.setEnabled(False)
+        self.findButton.setEnabled(True)
+        self.findButton.setDefault(True)
+
+    def __reportInvalidRules(self, invalid):
+        """
+        Private method to report the rules, that could not be compiled.
+        
+        @param invalid tuples of the row and the error of the invalid rules
+            (list of tuples of integer and RuleError)
+        """
+        fields = {
+            'find': self.tr("search expression"),
+            'replace': self.tr("replacement template"),
+            'filter': self.tr("file filter"),
+        }
+        row, why = invalid[0]
+        self.rulesView.setCurrentIndex(self.__ruleModel.index(
+            row, RuleModel.ErrorColumns.get(why.field,
+                                            RuleModel.FindColumn)))
+        E5MessageBox.critical(
+            self,
+            self.tr("Invalid rules"),
+            self.tr("""<p>%n rule(s) are not valid:</p><ul>{0}</ul>""", "",
+                    len(invalid))
+            .format("".join(
+                self.tr("""<li>Rule {0}, {1}: {2}</li>""")
+                .format(row + 1, fields.get(why.field, why.field),
+                        Utilities.html_encode(str(why)))
+                for row, why in invalid)))
+
+    def __importReport(self):
+        """
+        Private slot to show the versions of the QML imports of the
+        directory.
+        
+        The files are selected by the file filters of the rules.
+        """
+        root = os.path.abspath(self.dirPicker.currentText())
+        if not os.path.isdir(root):
+            return
+
+        filters = []
+        for pack, rule in self.__ruleModel.rows():
+            for fileFilter in rule.fileFilter.split(";"):
+                if fileFilter and fileFilter not in filters:
+                    filters.append(fileFilter)
+
+        # scanned in process, a pool forked from the GUI process while the
+        # enumerator thread runs is not safe
+        job = ImportReportJob(root, ";".join(filters) or "*.qml")
+        self.__searchJob = job
+        self.stopButton.setEnabled(True)
+        self.findButton.setEnabled(False)
+        self.reportButton.setEnabled(False)
+        self.findProgressLabel.setTextPath("{0}", self.tr("Scanning imports"))
+        try:
+            report = job.run(idle=QApplication.processEvents)
+        finally:
+            self.__searchJob = None
             self.stopButton.setEnabled(False)
             self.findButton.setEnabled(True)
-            self.findButton.setDefault(True)
+            self.reportButton.setEnabled(True)
+        self.findProgressLabel.setTextPath("{0}", self.tr(
+            "%n file(s) scanned", "", report.files))
+        if job.isCancelled():
+            return
+
+        if self.__reportDialog is not None:
+            self.__reportDialog.close()
+        self.__reportDialog = ImportReportDialog(report, root, self)
+        self.__reportDialog.ruleRequested.connect(self.__searchImport)
+        self.__reportDialog.show()
+
+    def __searchImport(self, module, version):
+        """
+        Private slot to set up a rule searching for a module version.
+        
+        A rule of a pack is left alone, a new rule is added instead.
+        
+        @param module name of the module (string)
+        @param version version of the module (string)
+        """
+        index = self.rulesView.currentIndex()
+        if not index.isValid() or self.__ruleModel.pack(index) is not None:
+            self.add_btn.click()
+        sub = self.ruleEditor
+        sub.findtextCombo.setCurrentText(
+            r"import\s+{0}\s+{1}\b".format(re.escape(module),
+                                            re.escape(version)))
+        sub.replacetextCombo.setCurrentText(
+            "import {0} {1}".format(module, version))
+        sub.regexpCheckBox.setChecked(True)
+        sub.headerCheckBox.setChecked(True)
+
+    def __rulesChanged(self):
+        """
+        Private slot to handle added or removed rules.
+        """
+        self.rulesView.resizeColumnToContents(RuleModel.PackColumn)
+        self.__removeRuleAct.setEnabled(self.__ruleModel.rowCount() > 0)
+        if not self.rulesView.currentIndex().isValid():
+            self.__currentRuleChanged(self.rulesView.currentIndex())
+        self.enableFindButton()
+
+    def __currentRuleChanged(self, current, previous=None):
+        """
+        Private slot to show the current rule in the rule editor.
+        
+        @param current index of the current rule (QModelIndex)
+        @param previous index of the previous rule (QModelIndex)
+        """
+        rule = self.__ruleModel.rule(current)
+        self.ruleEditor.setEnabled(rule is not None)
+        if rule is not None:
+            self.__editingRule = True
+            try:
+                self.ruleEditor.deserialize(rule.toDict())
+            finally:
+                self.__editingRule = False
+
+    def __ruleEdited(self):
+        """
+        Private slot to take over a change of the rule editor.
+        """
+        if self.__editingRule:
+            return
+
+        self.__editingRule = True
+        try:
+            self.__ruleModel.setRuleData(self.rulesView.currentIndex(),
+                                         self.ruleEditor.serialize())
+        finally:
+            self.__editingRule = False
+        self.enableFindButton()
+
+    def __ruleDataChanged(self, topLeft, bottomRight):
+        """
+        Private slot to handle a rule changed in the table or by the rule
+        editor.
+        
+        @param topLeft index of the top left changed item (QModelIndex)
+        @param bottomRight index of the bottom right changed item
+            (QModelIndex)
+        """
+        if self.__editingRule:
+            return
+
+        current = self.rulesView.currentIndex()
+        if current.isValid() and \
+                topLeft.row() <= current.row() <= bottomRight.row():
+            self.__currentRuleChanged(current)
+        self.enableFindButton()
+
+    def __removeRule(self):
+        """
+        Private slot to remove the current rule.
+        """
+        self.__ruleModel.removeRule(self.rulesView.currentIndex())
+
+    def __showPackMenu(self):
+        """
+        Private slot to prepare the rule pack menu.
+        
+        The packs of the pack directories are listed to be loaded or
+        removed by checking them.
+        """
+        self.__packMenu.clear()
+        loaded = dict((pack.fileName, pack)
+                      for pack in self.__ruleModel.packs() if pack.fileName)
+        fileNames = availablePacks()
+        for fileName in fileNames:
+            try:
+                title = str(loaded.get(fileName) or loadPack(fileName))
+            except RulePackError:
+                continue
+            act = self.__packMenu.addAction(title)
+            act.setCheckable(True)
+            act.setChecked(fileName in loaded)
+            act.setData(fileName)
+        if fileNames:
+            self.__packMenu.addSeparator()
+
+        hasPack = self.__ruleModel.pack(self.rulesView.currentIndex()) \
+            is not None
+        self.__packMenu.addAction(self.tr("Load Pack..."), self.__loadPack)
+        act = self.__packMenu.addAction(self.tr("Save Pack As..."),
+                                        self.__savePack)
+        act.setEnabled(hasPack)
+        act = self.__packMenu.addAction(self.tr("Remove Pack"),
+                                        self.__removePack)
+        act.setEnabled(hasPack)
+        act = self.__packMenu.addAction(self.tr("Remove All Packs"),
+                                        self.__ruleModel.clear)
+        act.setEnabled(bool(self.__ruleModel.packs()))
+
+    def __packTriggered(self, act):
+        """
+        Private slot to load or remove a pack of the pack directories.
+        
+        @param act triggered action of the pack menu (QAction)
+        """
+        fileName = act.data()
+        if not fileName:
+            return
 
-            if breakSearch:
-                self.close()
-        count_ = self.findList.topLevelItemCount()
-        # self.findProgressLabel.setPath("")
-        # self.findProgress.setValue(count_)
-        self.findProgress.setMaximum(count_)
+        if act.isChecked():
+            self.__addPack(fileName)
+        else:
+            for pack in self.__ruleModel.packs():
+                if pack.fileName == fileName:
+                    self.__ruleModel.removePack(pack)
 
-    def __getFileList(self, path, filterRe):
+    def __addPack(self, fileName):
         """
-        Private method to get a list of files to search.
+        Private method to load a rule pack into the rule table.
         
-        @param path the root directory to search in (string)
-        @param filterRe regular expression defining the filter
-            criteria (regexp object)
-        @return list of files to be processed (list of strings)
+        @param fileName name of the pack file (string)
+        """
+        try:
+            pack = loadPack(fileName)
+        except RulePackError as err:
+            E5MessageBox.critical(
+                self,
+                self.tr("Load Rule Pack"),
+                self.tr("""<p>The rule pack <b>{0}</b> could not be"""
+                        """ loaded.</p><p>Reason: {1}</p>""")
+                .format(fileName, str(err)))
+            return
+        self.__ruleModel.addPack(pack)
+
+    def __loadPack(self):
+        """
+        Private slot to load a rule pack selected by the user.
+        """
+        fileName, selectedFilter = QFileDialog.getOpenFileName(
+            self, self.tr("Load Rule Pack"), packDirectories()[0],
+            self.tr("Rule Packs (*.json)"))
+        if fileName:
+            self.__addPack(fileName)
+
+    def __savePack(self):
+        """
+        Private slot to save the rule pack of the current rule.
         """
-        path = os.path.abspath(path)
-        files = []
-        for dirname, _, names in os.walk(path):
-            files.extend([os.path.join(dirname, f)
-                          for f in names
-                          if re.match(filterRe, f)]
-                         )
-        return files
+        pack = self.__ruleModel.pack(self.rulesView.currentIndex())
+        if pack is None:
+            return
+
+        fileName, selectedFilter = QFileDialog.getSaveFileName(
+            self, self.tr("Save Rule Pack"),
+            pack.fileName or pack.name + ".json",
+            self.tr("Rule Packs (*.json)"))
+        if fileName == '':
+            return
+
+        try:
+            pack.save(fileName)
+        except (IOError, OSError) as err:
+            E5MessageBox.critical(
+                self,
+                self.tr("Save Rule Pack"),
+                self.tr("""<p>The rule pack could not be written to"""
+                        """ <b>{0}</b>.</p><p>Reason: {1}</p>""")
+                .format(fileName, str(err)))
+
+    def __removePack(self):
+        """
+        Private slot to remove the rule pack of the current rule.
+        """
+        pack = self.__ruleModel.pack(self.rulesView.currentIndex())
+        if pack is not None:
+            self.__ruleModel.removePack(pack)
 
     def setOpenFiles(self):
         """
@@ -479,94 +720,577 @@ class FindFileDialog(QDialog, Ui_FindFileDialog):
         """
         self.openFilesButton.setChecked(True)
 
+    def __buildReplacePlan(self):
+        """
+        Private method to combine the replacements authorized by the user.
+        
+        The items of all rules are merged, so every file is changed by a
+        single read/modify/write cycle.
+        
+        @return replace plan of the checked items (ReplacePlan)
+        """
+        plan = ReplacePlan()
+        for fn, line, edits in self.__resultModel.checkedEdits():
+            for start, end, old, new in edits:
+                plan.addEdit(fn, line, start, end, old, new)
+        return plan
+
+    def __reportConflicts(self, conflicts):
+        """
+        Private method to report edits rejected by the replace plan.
+        
+        @param conflicts list of tuples of file name, reason and rejected
+            edit (list of tuples of (string, string, ReplaceEdit))
+        """
+        if not conflicts:
+            return
+
+        maxReported = 20
+        entries = []
+        for fn, reason, edit in conflicts[:maxReported]:
+            if reason == ReplacePlan.Overlap:
+                reasonText = self.tr("overlaps another replacement")
+            else:
+                reasonText = self.tr("file was changed since the search")
+            entries.append("<li>{0}:{1}: <i>{2}</i> - {3}</li>".format(
+                Utilities.html_encode(fn), edit.line,
+                Utilities.html_encode(edit.old), reasonText))
+        if len(conflicts) > maxReported:
+            entries.append(self.tr("<li>... and {0} more</li>").format(
+                len(conflicts) - maxReported))
+        E5MessageBox.warning(
+            self,
+            self.tr("Replace in Files"),
+            self.tr("""<p>The following replacements were skipped:</p>"""
+                    """<ul>{0}</ul>""").format("".join(entries)))
+
+    def __readForReplace(self, fn):
+        """
+        Private method to read a file to be changed.
+        
+        @param fn name of the file (string)
+        @return tuple of the lines including line ends and the encoding
+            verdict or None, if the file could not be read
+            (list of string, FileIO.EncodingVerdict)
+        """
+        try:
+            checkWritable(fn)
+            text, verdict, hashStr = FileIO.readEncodedFile(fn)
+            return text.splitlines(True), verdict
+        except (UnicodeError, IOError) as err:
+            E5MessageBox.critical(
+                self,
+                self.tr("Replace in Files"),
+                self.tr(
+                    """<p>Could not read the file <b>{0}</b>."""
+                    """ Skipping it.</p><p>Reason: {1}</p>""")
+                    .format(fn, str(err))
+            )
+            return None
+
     @pyqtSlot()
     def on_replaceButton_clicked(self):
         """
         Private slot to perform the requested replace actions.
         替换开始
         """
-        self.findProgress.setMaximum(self.findList.topLevelItemCount())
+        plan = self.__buildReplacePlan()
+        try:
+            checkpoint = ReplaceCheckpoint.create(
+                checkpointPath(), plan,
+                os.path.abspath(self.dirPicker.currentText()))
+        except (IOError, OSError) as err:
+            E5MessageBox.warning(
+                self,
+                self.tr("Replace in Files"),
+                self.tr("""<p>The checkpoint file <b>{0}</b> could not be"""
+                        """ written. An interrupted replace cannot be"""
+                        """ resumed.</p><p>Reason: {1}</p>""")
+                .format(checkpointPath(), str(err)))
+            checkpoint = ReplaceCheckpoint(None, plan, "")
+        self.__startReplace(checkpoint)
+
+    def __resumeReplace(self):
+        """
+        Private slot to resume an interrupted replace run.
+        """
+        checkpoint = ReplaceCheckpoint.load(checkpointPath())
+        if checkpoint is None:
+            E5MessageBox.warning(
+                self,
+                self.tr("Resume Replace"),
+                self.tr("""<p>There is no interrupted replace run.</p>"""))
+            self.resumeButton.setEnabled(False)
+            return
+
+        pending = len(checkpoint.pendingFiles())
+        yes = E5MessageBox.yesNo(
+            self,
+            self.tr("Resume Replace"),
+            self.tr("""<p>Resume the replace run in <b>{0}</b>?</p>"""
+                    """<p>{1} of {2} files are still to be changed.</p>""")
+            .format(checkpoint.root, pending, len(checkpoint.plan)),
+            yesDefault=True)
+        if yes:
+            self.__startReplace(checkpoint)
+
+    def __startReplace(self, checkpoint):
+        """
+        Private method to start the background replace run.
+        
+        @param checkpoint checkpoint of the run containing the plan
+            (ReplaceCheckpoint)
+        """
+        self.__replaceErrors = []
+        self.__replaceConflicts = []
+
+        self.findProgress.setFormat(self.tr("%v/%m Files"))
+        self.findProgress.setMaximum(len(checkpoint.plan))
+        self.findProgress.setValue(len(checkpoint.done))
+
+        self.__replaceThread = ReplaceThread(checkpoint, self)
+        self.__replaceThread.fileStarted.connect(self.findProgressLabel.setPath)
+        self.__replaceThread.fileDone.connect(self.__replaceProgress)
+        self.__replaceThread.fileError.connect(
+            lambda fn, err: self.__replaceErrors.append((fn, err)))
+        self.__replaceThread.conflict.connect(
+            lambda fn, reason, edit:
+                self.__replaceConflicts.append((fn, reason, edit)))
+        self.__replaceThread.finished.connect(
+            lambda: self.__replaceFinished(checkpoint))
+
+        self.replaceButton.setEnabled(False)
+        self.dryRunButton.setEnabled(False)
+        self.resumeButton.setEnabled(False)
+        self.findButton.setEnabled(False)
+        self.stopButton.setEnabled(True)
+        self.stopButton.setDefault(True)
+
+        self.__replaceThread.start()
+
+    def __replaceProgress(self, done, total):
+        """
+        Private slot to show the progress of the replace run.
+        
+        @param done number of finished files (integer)
+        @param total total number of files (integer)
+        """
+        self.findProgress.setValue(done)
+
+    def __replaceFinished(self, checkpoint):
+        """
+        Private slot handling the end of the replace run.
+        
+        @param checkpoint checkpoint of the run (ReplaceCheckpoint)
+        """
+        journalError = self.__replaceThread.journalError()
+        self.__replaceThread.deleteLater()
+        self.__replaceThread = None
+
+        if self.__replaceErrors:
+            E5MessageBox.critical(
+                self,
+                self.tr("Replace in Files"),
+                self.tr("""<p>The following files could not be changed:"""
+                        """</p><ul>{0}</ul>""").format("".join(
+                            "<li><b>{0}</b>: {1}</li>".format(
+                                Utilities.html_encode(fn),
+                                Utilities.html_encode(err))
+                            for fn, err in self.__replaceErrors)))
+        if journalError:
+            E5MessageBox.warning(
+                self,
+                self.tr("Replace in Files"),
+                self.tr("""<p>The checkpoint file could not be written."""
+                        """</p><p>Reason: {0}</p>""").format(journalError))
+        self.__reportConflicts(self.__replaceConflicts)
+
+        pending = len(checkpoint.pendingFiles())
+        if pending:
+            if self.__replaceErrors:
+                # failed files stay pending to be retried
+                self.findProgressLabel.setPath(
+                    self.tr("Replace incomplete, {0} of {1} files done")
+                    .format(len(checkpoint.plan) - pending,
+                            len(checkpoint.plan)))
+            else:
+                self.findProgressLabel.setPath(
+                    self.tr("Replace stopped, {0} of {1} files done").format(
+                        len(checkpoint.plan) - pending,
+                        len(checkpoint.plan)))
+            # pressing Replace again continues the same plan
+            self.replaceButton.setEnabled(True)
+            self.dryRunButton.setEnabled(True)
+        else:
+            self.findProgressLabel.setPath("")
+            # 替换完成
+            self.__clearResults()
+            self.replaceButton.setEnabled(False)
+            self.dryRunButton.setEnabled(False)
+
+        self.resumeButton.setEnabled(os.path.exists(checkpointPath()))
+        self.stopButton.setEnabled(False)
+        self.findButton.setEnabled(True)
+        self.findButton.setDefault(True)
+
+    def __clearResults(self):
+        """
+        Private method to remove all results keeping the filter.
+        """
+        self.__cancelFilter()
+        self.__resultModel.clear()
+
+    def __cancelFilter(self):
+        """
+        Private method to stop filtering in the background.
+        
+        A filter being computed is set without a result, so it is evaluated
+        in the foreground.
+        """
+        self.__stopFilterThreads()
+        if self.__pendingFilter is not None:
+            self.__resultModel.setFilter(self.__pendingFilter)
+            self.__pendingFilter = None
+
+    def __applyFilter(self):
+        """
+        Private slot to start filtering the results with the text of the
+        filter edit.
+        """
+        try:
+            resultFilter = ResultFilter(self.filterEdit.text())
+        except ValueError as err:
+            self.findProgressLabel.setPath(
+                self.tr("Invalid filter: {0}").format(str(err)))
+            return
+
+        if self.__filterThread is not None:
+            # it is waited for, before the results are changed
+            self.__filterThread.cancel()
+            self.__filterThread = None
+        if resultFilter.isEmpty():
+            self.__pendingFilter = None
+            self.__resultModel.setFilter(None)
+            self.__showFilterResult()
+            return
+
+        self.__pendingFilter = resultFilter
+        self.__filterThread = ResultFilterThread(
+            resultFilter, self.__resultModel.store(),
+            self.__resultModel.filterCandidates(resultFilter), self)
+        self.__filterThread.filtered.connect(self.__filterFinished)
+        self.__filterThread.finished.connect(self.__filterThreadFinished)
+        self.__filterThreads.append(self.__filterThread)
+        self.__filterThread.start()
+
+    def __stopFilterThreads(self):
+        """
+        Private method to stop all filter threads and to wait for them.
+        
+        Superseded threads may still read the result store, so they have to
+        be finished before the results are changed.
+        """
+        for thread in self.__filterThreads:
+            thread.cancel()
+        for thread in self.__filterThreads:
+            thread.wait()
+        self.__filterThread = None
+
+    def __filterThreadFinished(self):
+        """
+        Private slot to forget a finished filter thread.
+        """
+        thread = self.sender()
+        if thread in self.__filterThreads:
+            self.__filterThreads.remove(thread)
+        thread.deleteLater()
+
+    def __filterFinished(self, resultFilter, result, fileCount):
+        """
+        Private slot to show the results passing a filter.
+        
+        @param resultFilter filter applied
+            (SearchEngine.ResultFilter.ResultFilter)
+        @param result tuples of file number and the numbers of the passing
+            matches (list of tuples)
+        @param fileCount number of files covered by the result (integer)
+        """
+        if resultFilter is not self.__pendingFilter:
+            # superseded by a newer filter
+            return
+
+        self.__pendingFilter = None
+        self.__filterThread = None
+        self.__resultModel.setFilter(resultFilter, result, fileCount)
+        self.__showFilterResult()
+
+    def __showFilterResult(self):
+        """
+        Private method to show the number of results shown.
+        """
+        if self.__populating:
+            return
+
+        resultFormat = self.tr("{0} / {1}", "occurrences / files")
+        self.findProgressLabel.setTextPath("{0}", resultFormat.format(
+            self.tr("%n occurrence(s)", "",
+                    self.__resultModel.matchCount()),
+            self.tr("%n file(s)", "", self.__resultModel.fileCount())))
+
+    def closeEvent(self, evt):
+        """
+        Protected method handling the closing of the dialog.
+        
+        @param evt reference to the close event (QCloseEvent)
+        """
+        if self.__replaceThread is not None:
+            # let the current file be finished, the rest can be resumed
+            self.__replaceThread.cancel()
+            self.__replaceThread.wait()
+        self.__stopFilterThreads()
+        super(FindFileDialog, self).closeEvent(evt)
+
+    def __dryRunToFile(self):
+        """
+        Private slot to write the selected replacements as a diff file.
+        """
+        fileName, ok = QFileDialog.getSaveFileName(
+            self, self.tr("Dry Run"), "replace.diff",
+            self.tr("Patch Files (*.diff *.patch);;All Files (*)"))
+        if fileName == '':
+            return
+
+        try:
+            with open(fileName, "w", encoding="utf-8", newline="") as f:
+                self.__dryRun(f)
+        except IOError as err:
+            E5MessageBox.critical(
+                self,
+                self.tr("Dry Run"),
+                self.tr(
+                    """<p>Could not write the diff file <b>{0}</b>.</p>"""
+                    """<p>Reason: {1}</p>""").format(fileName, str(err))
+            )
+
+    def __dryRunToStdout(self):
+        """
+        Private slot to write the selected replacements as a diff to the
+        standard output.
+        """
+        self.__dryRun(sys.stdout)
+        sys.stdout.flush()
+
+    def __dryRun(self, stream):
+        """
+        Private method to write the selected replacements as a unified diff
+        without changing any file.
+        
+        @param stream text stream to write the diff to (file like object)
+        """
+        writer = UnifiedDiffWriter(
+            stream, os.path.abspath(self.dirPicker.currentText()))
+
+        plan = self.__buildReplacePlan()
+        self.findProgress.setFormat(self.tr("%v/%m Files"))
+        self.findProgress.setMaximum(len(plan))
         self.findProgress.setValue(0)
 
         progress = 0
-        for index in range(self.findList.topLevelItemCount()):
-            itm = self.findList.topLevelItem(index)
-            if itm.checkState(0) in [Qt.PartiallyChecked, Qt.Checked]:
-                file = itm.text(0)
-                origHash = itm.data(0, self.md5Role)
-
-                self.findProgressLabel.setPath(file)
-
-                fn = file
-
-                # read the file and split it into textlines
-                try:
-                    text, encoding, hashStr = \
-                        Utilities.readEncodedFileWithHash(fn)
-                    lines = text.splitlines(True)
-                except (UnicodeError, IOError) as err:
-                    E5MessageBox.critical(
-                        self,
-                        self.tr("Replace in Files"),
-                        self.tr(
-                            """<p>Could not read the file <b>{0}</b>."""
-                            """ Skipping it.</p><p>Reason: {1}</p>""")
-                            .format(fn, str(err))
-                    )
-                    progress += 1
-                    self.findProgress.setValue(progress)
-                    continue
-
-                # Check the original and the current hash. Skip the file,
-                # if hashes are different.
-
-                # if origHash != hashStr:
-                #     E5MessageBox.critical(
-                #         self,
-                #         self.tr("Replace in Files"),
-                #         self.tr(
-                #             """<p>The current and the original hash of the"""
-                #             """ file <b>{0}</b> are different. Skipping it."""
-                #             """</p><p>Hash 1: {1}</p><p>Hash 2: {2}</p>""")
-                #             .format(fn, origHash, hashStr)
-                #     )
-                #     progress += 1
-                #     self.findProgress.setValue(progress)
-                #     continue
-
-                # replace the lines authorized by the user
-                for cindex in range(itm.childCount()):
-                    citm = itm.child(cindex)
-                    if citm.checkState(0) == Qt.Checked:
-                        line = citm.data(0, self.lineRole)
-                        rline = citm.data(0, self.replaceRole)
-                        lines[line - 1] = rline
-
-                # write the file
-                # 写入
-                txt = "".join(lines)
-                try:
-                    Utilities.writeEncodedFile(fn, txt, encoding)
-                except (IOError, Utilities.CodingError, UnicodeError) as err:
-                    E5MessageBox.critical(
-                        self,
-                        self.tr("Replace in Files"),
-                        self.tr(
-                            """<p>Could not save the file <b>{0}</b>."""
-                            """ Skipping it.</p><p>Reason: {1}</p>""")
-                            .format(fn, str(err))
-                    )
+        conflicts = []
+        slicer = TimeSlicer(QApplication.processEvents, checkEvery=1)
+        for fn in plan.files():
+            self.findProgressLabel.setPath(fn)
+
+            result = self.__readForReplace(fn)
+            if result is not None:
+                lines, verdict = result
+                newLines, fileConflicts = plan.apply(fn, lines, verdict.eol)
+                conflicts.extend((fn, reason, edit)
+                                 for reason, edit in fileConflicts)
+                writer.addFile(fn, lines, newLines)
 
             progress += 1
             self.findProgress.setValue(progress)
+            slicer.tick()
 
-        self.findProgressLabel.setPath("")
+        resultFormat = self.tr("Dry run: {0}, {1} / {2}",
+                               "files, additions / deletions")
+        self.findProgressLabel.setPath(resultFormat.format(
+            self.tr("%n file(s)", "", writer.files),
+            self.tr("%n addition(s)", "", writer.additions),
+            self.tr("%n deletion(s)", "", writer.deletions)))
+        self.__reportConflicts(conflicts)
 
-        # 替换完成
-        self.findList.clear()
-        self.replaceButton.setEnabled(False)
-        self.findButton.setEnabled(True)
-        self.findButton.setDefault(True)
+    def __showResultsMenu(self):
+        """
+        Private slot to prepare the results menu.
+        """
+        self.__exportResultsAct.setEnabled(
+            self.__resultModel.fileCount() > 0 and not self.__populating)
+
+    def __exportResults(self):
+        """
+        Private slot to export the search results.
+        """
+        fileName, ok = QFileDialog.getSaveFileName(
+            self, self.tr("Export Results"), "results.jsonl",
+            self.tr("JSON Lines Files (*.jsonl);;CSV Files (*.csv)"))
+        if fileName == '':
+            return
+
+        try:
+            with open(fileName, "w", encoding="utf-8", newline="") as f:
+                count = ResultExport.exportResults(
+                    self.__resultModel.store(), f,
+                    ResultExport.formatForFile(fileName))
+        except IOError as err:
+            E5MessageBox.critical(
+                self,
+                self.tr("Export Results"),
+                self.tr(
+                    """<p>Could not write the results file <b>{0}</b>.</p>"""
+                    """<p>Reason: {1}</p>""").format(fileName, str(err))
+            )
+            return
+
+        self.findProgressLabel.setPath(
+            self.tr("%n occurrence(s) exported", "", count))
+
+    def __importResults(self):
+        """
+        Private slot to import search results exported before.
+        
+        The file is read file by file, the matches of a file are only shown
+        once it is expanded.
+        """
+        if self.__populating:
+            return
+
+        fileName, ok = QFileDialog.getOpenFileName(
+            self, self.tr("Import Results"), "",
+            self.tr("Result Files (*.jsonl *.csv);;All Files (*)"))
+        if fileName == '':
+            return
+        self.__loadResults(fileName)
+
+    def __loadResults(self, fileName):
+        """
+        Private method to load search results exported before.
+        
+        @param fileName name of the results file (string)
+        """
+        self.__clearResults()
+        self.__populating = True
+        slicer = TimeSlicer(QApplication.processEvents, checkEvery=1)
+        occurrences = 0
+        fileOccurrences = 0
+        hasEdits = False
+        try:
+            with open(fileName, "r", encoding="utf-8", newline="") as f:
+                for path, md5, matches in ResultExport.importResults(
+                        f, ResultExport.formatForFile(fileName)):
+                    self.__resultModel.addFile(path, md5, matches)
+                    occurrences += len(matches)
+                    fileOccurrences += 1
+                    hasEdits = hasEdits or any(m[4] for m in matches)
+                    slicer.tick()
+        except (IOError, ValueError, csv.Error) as err:
+            E5MessageBox.critical(
+                self,
+                self.tr("Import Results"),
+                self.tr(
+                    """<p>Could not read the results file <b>{0}</b>.</p>"""
+                    """<p>Reason: {1}</p>""").format(fileName, str(err))
+            )
+        self.__populating = False
+
+        if self.__replaceMode:
+            self.replaceButton.setEnabled(hasEdits)
+            self.dryRunButton.setEnabled(hasEdits)
+
+        resultFormat = self.tr("{0} / {1}", "occurrences / files")
+        self.findProgressLabel.setTextPath("{0}", resultFormat.format(
+            self.tr("%n occurrence(s)", "", occurrences),
+            self.tr("%n file(s)", "", fileOccurrences)))
+
+    def __saveSession(self, fileName):
+        """
+        Private method to save the rules, the results and the hash table of
+        the files read as a session.
+        
+        @param fileName name of the session file (string)
+        """
+        if self.__populating:
+            return
+
+        store = self.__resultModel.store()
+        try:
+            saveSession(fileName, self.serialize(), store,
+                        self.__searchCache.hashTable())
+        except SessionError as err:
+            E5MessageBox.critical(
+                self,
+                self.tr("Save Session"),
+                self.tr(
+                    """<p>Could not write the session file <b>{0}</b>.</p>"""
+                    """<p>Reason: {1}</p>""").format(fileName, str(err))
+            )
+            return
+
+        self.findProgressLabel.setPath(
+            self.tr("%n occurrence(s) saved", "", store.matchCount()))
+
+    def __loadSession(self, fileName):
+        """
+        Private method to restore a session without searching again.
+        
+        The texts of the matches are read from the session, when they are
+        shown.
+        
+        @param fileName name of the session file (string)
+        """
+        if self.__populating:
+            return
+
+        try:
+            rules, store, hashes = loadSession(fileName)
+        except SessionError as err:
+            E5MessageBox.critical(
+                self,
+                self.tr("Load Session"),
+                self.tr(
+                    """<p>Could not read the session file <b>{0}</b>.</p>"""
+                    """<p>Reason: {1}</p>""").format(fileName, str(err))
+            )
+            return
+
+        self.deserialize(rules)
+        self.__clearResults()
+        self.__searchCache.setHashTable(hashes)
+        self.__resultModel.setStore(store)
+        if self.filterEdit.text():
+            self.__applyFilter()
+
+        if self.__replaceMode:
+            hasEdits = any(store.edits(matchNo)
+                           for matchNo in range(store.matchCount()))
+            self.replaceButton.setEnabled(hasEdits)
+            self.dryRunButton.setEnabled(hasEdits)
+
+        # files changed since are reported as conflicts by the replace step
+        changed = sum(
+            1 for fileNo in range(store.fileCount())
+            if store.filePath(fileNo) in hashes and
+            self.__searchCache.knownHash(store.filePath(fileNo)) !=
+            store.fileMd5(fileNo))
+        resultFormat = self.tr("{0} / {1}", "occurrences / files")
+        result = resultFormat.format(
+            self.tr("%n occurrence(s)", "", store.matchCount()),
+            self.tr("%n file(s)", "", store.fileCount()))
+        if changed:
+            result = self.tr("{0}, {1} changed since").format(
+                result, self.tr("%n file(s)", "", changed))
+        self.findProgressLabel.setTextPath("{0}", result)
 
     def __contextMenuRequested(self, pos):
         """
@@ -585,11 +1309,10 @@ class FindFileDialog(QDialog, Ui_FindFileDialog):
         """
         Private method to copy the path of an entry to the clipboard.
         """
-        itm = self.findList.selectedItems()[0]
-        if itm.parent():
-            fn = itm.parent().text(0)
-        else:
-            fn = itm.text(0)
+        indexes = self.findList.selectedIndexes()
+        if not indexes:
+            return
+        fn = self.__resultModel.filePath(indexes[0])
 
         cb = QApplication.clipboard()
         cb.setText(fn)
@@ -598,21 +1321,18 @@ class FindFileDialog(QDialog, Ui_FindFileDialog):
     @pyqtSlot()
     def on_add_btn_clicked(self):
         """
-        add form.
+        Private slot to add a rule and to edit it.
         """
-
-        sub = subForm(self)
-        self.mdiArea.addSubWindow(sub)
-        sub.show()
-        self.mdiArea.tileSubWindows()
+        index = self.__ruleModel.addRule(SearchRule(""))
+        self.rulesView.setCurrentIndex(index)
+        self.ruleEditor.findtextCombo.setFocus()
 
     @pyqtSlot()
     def on_clear_btn_clicked(self):
         """
-        Slot documentation goes here.
+        Private slot to remove all rules and rule packs.
         """
-        for i in self.mdiArea.subWindowList():
-            self.mdiArea.removeSubWindow(i)
+        self.__ruleModel.clear()
 
     # =================================
     def saveToFile(self, filename):
@@ -637,29 +1357,46 @@ class FindFileDialog(QDialog, Ui_FindFileDialog):
 
     def serialize(self):
         """ÐòÁÐ»¯"""
-        subs = []
-        for sub in self.mdiArea.subWindowList():
-            subs.append(sub.widget().serialize())
+        subs = [rule.toDict() for rule in self.__ruleModel.userRules()]
 
-        return OrderedDict([
+        data = OrderedDict([
             ('subs', subs),
             ('path', self.dirPicker.path()),
         ])
+        if self.__templateTables:
+            data['tables'] = self.__templateTables
+        if self.__ruleModel.packs():
+            data['packs'] = [pack.toDict()
+                             for pack in self.__ruleModel.packs()]
+        return data
 
     def deserialize(self, data, hashmap={}, restore_id=True):
         """·´ÐòÁÐ»¯"""
 
+        if 'pack' in data:
+            # the rules of a rule pack go to the rule table
+            self.__ruleModel.addPack(RulePack.fromDict(data))
+            return True
+
         self.clear_btn.click()
 
+        # lookup tables used by '${group|table(name)}' replacements, they
+        # are set first to compile every rule once as it is added
+        self.__templateTables = data.get('tables', {})
+        self.__ruleModel.setCompileArgs(self.__templateTables,
+                                        self.__replaceMode,
+                                        self.__qrcResolver.filters())
         for sub_info in data['subs']:
-            sub = subForm(self).deserialize(sub_info)
-            self.mdiArea.addSubWindow(sub)
-            sub.show()
-        self.mdiArea.tileSubWindows()
+            self.__ruleModel.addRule(SearchRule.fromDict(sub_info))
 
         self.dirPicker.setPath(data['path'])
+        for packData in data.get('packs', []):
+            self.__ruleModel.addPack(RulePack.fromDict(packData))
+        if self.__ruleModel.rowCount():
+            self.rulesView.setCurrentIndex(
+                self.__ruleModel.index(0, RuleModel.FindColumn))
 
-        self.enableFindButton(False, False)
+        self.enableFindButton()
         return True
 
 
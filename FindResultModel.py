@@ -0,0 +1,576 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing the model of the search results.
+"""
+
+from __future__ import unicode_literals
+
+from bisect import bisect_left, bisect_right
+
+from PyQt5.QtCore import Qt, QAbstractItemModel, QModelIndex, \
+    QCoreApplication
+
+from SearchEngine.ResultStore import ResultStore, pathSortKey
+
+
+class FindFileNode(object):
+    """
+    Class implementing the view state of a file with search results.
+    """
+    __slots__ = ("key", "fileNo", "fetched", "matches")
+
+    def __init__(self, key, fileNo):
+        """
+        Constructor
+
+        @param key sort key of the node (tuple)
+        @param fileNo number of the file in the result store (integer)
+        """
+        self.key = key
+        self.fileNo = fileNo
+        self.fetched = 0
+        # numbers of the matches shown, None shows all matches of the file
+        self.matches = None
+
+
+class FindResultModel(QAbstractItemModel):
+    """
+    Class implementing a model of the search results.
+
+    The results are kept in a ResultStore, the model only keeps a small node
+    per file. Files are top level rows. Their matches are only made known to
+    the view by fetchMore() once a file is expanded, a collapsed file costs a
+    single row no matter how many matches it has. Check states and the
+    replace step work on the store directly, so they don't depend on rows
+    having been fetched.
+
+    A filter shows only the files and matches passing it. The rows of a
+    filtered file are mapped to the match numbers passing the filter.
+
+    The files are kept in ascending order of the natural sort keys of their
+    names. A new file is inserted at its position, the descending order just
+    maps the rows in reverse, so the model never has to be sorted.
+    """
+    LineRole = Qt.UserRole + 1
+    StartRole = Qt.UserRole + 2
+    EndRole = Qt.UserRole + 3
+    ReplaceRole = Qt.UserRole + 4
+    Md5Role = Qt.UserRole + 5
+    EditsRole = Qt.UserRole + 6
+
+    def __init__(self, checkable=False, parent=None):
+        """
+        Constructor
+
+        @param checkable flag indicating user checkable results (boolean)
+        @param parent reference to the parent object (QObject)
+        """
+        super(FindResultModel, self).__init__(parent)
+
+        self.__checkable = checkable
+        self.__store = ResultStore()
+        self.__fileNodes = []       # indexed by the file number
+        self.__nodes = []           # the shown files in ascending order
+        self.__keys = []            # the sort keys of the shown files
+        self.__filter = None
+        self.__descending = False
+        self.__headers = [
+            QCoreApplication.translate("FindFileDialog", "File/Line"),
+            QCoreApplication.translate("FindFileDialog", "Text"),
+        ]
+
+    def clear(self):
+        """
+        Public method to remove all results.
+        """
+        self.beginResetModel()
+        self.__store.clear()
+        self.__fileNodes = []
+        self.__nodes = []
+        self.__keys = []
+        self.endResetModel()
+
+    def addFile(self, path, md5, matches):
+        """
+        Public method to add the results of a file.
+
+        @param path name of the file (string)
+        @param md5 MD5 hash of the file (string)
+        @param matches tuples of line number, line text, start and end of
+            the first hit and edits (list of tuples)
+        """
+        fileNo = self.__store.addFile(path, md5, matches)
+        # the file number makes the key unique for files added twice
+        node = FindFileNode((pathSortKey(path), fileNo), fileNo)
+        self.__fileNodes.append(node)
+        if self.__filter is not None:
+            node.matches = self.__filter.matchFile(self.__store, fileNo)
+            if not node.matches:
+                return
+
+        pos = bisect_right(self.__keys, node.key)
+        row = len(self.__nodes) - pos if self.__descending else pos
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.__keys.insert(pos, node.key)
+        self.__nodes.insert(pos, node)
+        self.endInsertRows()
+
+    def setStore(self, store):
+        """
+        Public method to show the results of another store, e.g. of a
+        session.
+
+        The active filter is removed.
+
+        @param store result store to be shown (ResultStore)
+        """
+        self.beginResetModel()
+        self.__store = store
+        self.__filter = None
+        self.__fileNodes = [
+            FindFileNode((pathSortKey(store.filePath(fileNo)), fileNo),
+                         fileNo)
+            for fileNo in range(store.fileCount())]
+        self.__nodes = sorted(self.__fileNodes, key=lambda n: n.key)
+        self.__keys = [node.key for node in self.__nodes]
+        self.endResetModel()
+
+    def store(self):
+        """
+        Public method to get the result store.
+
+        @return result store of the model (ResultStore)
+        """
+        return self.__store
+
+    def fileCount(self):
+        """
+        Public method to get the number of shown files.
+
+        @return number of files (integer)
+        """
+        return len(self.__nodes)
+
+    def matchCount(self):
+        """
+        Public method to get the number of shown matches.
+
+        @return number of matches (integer)
+        """
+        if self.__filter is None:
+            return self.__store.matchCount()
+        return sum(len(node.matches) for node in self.__nodes)
+
+    def resultFilter(self):
+        """
+        Public method to get the active filter.
+
+        @return active filter or None (SearchEngine.ResultFilter.ResultFilter)
+        """
+        return self.__filter
+
+    def filterCandidates(self, resultFilter):
+        """
+        Public method to get the matches a new filter has to check.
+
+        If the new filter narrows the active one, only the shown matches have
+        to be checked.
+
+        @param resultFilter new filter (SearchEngine.ResultFilter.ResultFilter)
+        @return tuples of file number and the match numbers to be checked or
+            None for all matches of the file (list of tuples)
+        """
+        if resultFilter.narrows(self.__filter):
+            return [(node.fileNo, node.matches) for node in self.__nodes]
+        return [(fileNo, None) for fileNo in range(len(self.__fileNodes))]
+
+    def setFilter(self, resultFilter, result=None, fileCount=0):
+        """
+        Public method to set the filter of the shown results.
+
+        @param resultFilter filter to be set, None or an empty filter shows
+            all results (SearchEngine.ResultFilter.ResultFilter)
+        @param result result of the filter computed in the background for the
+            first fileCount files given as tuples of file number and the
+            numbers of the passing matches (list of tuples)
+        @param fileCount number of files covered by result (integer)
+        """
+        if resultFilter is not None and resultFilter.isEmpty():
+            resultFilter = None
+
+        self.beginResetModel()
+        self.__filter = resultFilter
+        for node in self.__fileNodes:
+            node.fetched = 0
+            node.matches = None
+        if resultFilter is None:
+            self.__nodes = self.__fileNodes[:]
+        else:
+            if result is None:
+                result = []
+                fileCount = 0
+            # files added while the filter was computed are done here
+            result = result + resultFilter.apply(
+                self.__store, [(fileNo, None) for fileNo in
+                               range(fileCount, len(self.__fileNodes))])
+            self.__nodes = []
+            for fileNo, matches in result:
+                node = self.__fileNodes[fileNo]
+                node.matches = matches
+                self.__nodes.append(node)
+        self.__nodes.sort(key=lambda n: n.key)
+        self.__keys = [node.key for node in self.__nodes]
+        self.endResetModel()
+
+    def checkedEdits(self):
+        """
+        Public method to iterate over the edits of all shown and checked
+        matches.
+
+        @return generator yielding tuples of file name, line number and
+            edits (string, integer, tuple of tuples)
+        """
+        store = self.__store
+        if self.__filter is None:
+            for edit in store.checkedEdits():
+                yield edit
+            return
+
+        for node in sorted(self.__nodes, key=lambda n: n.fileNo):
+            path = store.filePath(node.fileNo)
+            for matchNo in node.matches:
+                if store.isChecked(matchNo) and store.edits(matchNo):
+                    yield path, store.line(matchNo), store.edits(matchNo)
+
+    def filePath(self, index):
+        """
+        Public method to get the file name of an index.
+
+        @param index index of a file or a match (QModelIndex)
+        @return file name (string)
+        """
+        node = self.__node(index)
+        return "" if node is None else self.__store.filePath(node.fileNo)
+
+    def __node(self, index):
+        """
+        Private method to get the file node of an index.
+
+        @param index index of a file or a match (QModelIndex)
+        @return file node (FindFileNode)
+        """
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if node is None:
+            return self.__nodeAt(index.row())
+        return node
+
+    def __nodeAt(self, row):
+        """
+        Private method to get the file node shown in a row.
+
+        @param row top level row (integer)
+        @return file node (FindFileNode)
+        """
+        if self.__descending:
+            return self.__nodes[len(self.__nodes) - 1 - row]
+        return self.__nodes[row]
+
+    def __row(self, node):
+        """
+        Private method to get the row of a shown file node.
+
+        @param node file node (FindFileNode)
+        @return top level row (integer)
+        """
+        pos = bisect_left(self.__keys, node.key)
+        if self.__descending:
+            return len(self.__nodes) - 1 - pos
+        return pos
+
+    def __matchCount(self, node):
+        """
+        Private method to get the number of shown matches of a file.
+
+        @param node file node (FindFileNode)
+        @return number of matches (integer)
+        """
+        if node.matches is None:
+            return self.__store.fileMatchCount(node.fileNo)
+        return len(node.matches)
+
+    def __matchNumber(self, node, row):
+        """
+        Private method to get the match number of a row of a file.
+
+        @param node file node (FindFileNode)
+        @param row row of the match below the file (integer)
+        @return match number (integer)
+        """
+        if node.matches is None:
+            return self.__store.matchNumber(node.fileNo, row)
+        return node.matches[row]
+
+    def __checkedCount(self, node):
+        """
+        Private method to get the number of shown and checked matches of a
+        file.
+
+        @param node file node (FindFileNode)
+        @return number of checked matches (integer)
+        """
+        if node.matches is None:
+            return self.__store.checkedCount(node.fileNo)
+        isChecked = self.__store.isChecked
+        return sum(1 for matchNo in node.matches if isChecked(matchNo))
+
+    ###########################################################################
+    ## Methods of QAbstractItemModel
+    ###########################################################################
+
+    def columnCount(self, parent=QModelIndex()):
+        """
+        Public method to get the number of columns.
+
+        @param parent index of the parent item (QModelIndex)
+        @return number of columns (integer)
+        """
+        return len(self.__headers)
+
+    def rowCount(self, parent=QModelIndex()):
+        """
+        Public method to get the number of rows.
+
+        @param parent index of the parent item (QModelIndex)
+        @return number of rows (integer)
+        """
+        if not parent.isValid():
+            return len(self.__nodes)
+        if parent.internalPointer() is None and parent.column() == 0:
+            return self.__nodeAt(parent.row()).fetched
+        return 0
+
+    def hasChildren(self, parent=QModelIndex()):
+        """
+        Public method to check for the presence of child items.
+
+        @param parent index of the parent item (QModelIndex)
+        @return flag indicating the presence of child items (boolean)
+        """
+        if not parent.isValid():
+            return bool(self.__nodes)
+        if parent.internalPointer() is None and parent.column() == 0:
+            return self.__matchCount(self.__nodeAt(parent.row())) > 0
+        return False
+
+    def canFetchMore(self, parent):
+        """
+        Public method to check, if the matches of a file are not fetched
+        completely.
+
+        @param parent index of the parent item (QModelIndex)
+        @return flag indicating more matches to be fetched (boolean)
+        """
+        if parent.isValid() and parent.internalPointer() is None:
+            node = self.__nodeAt(parent.row())
+            return node.fetched < self.__matchCount(node)
+        return False
+
+    def fetchMore(self, parent):
+        """
+        Public method to make the matches of a file known to the view.
+
+        @param parent index of the parent item (QModelIndex)
+        """
+        if not self.canFetchMore(parent):
+            return
+
+        node = self.__nodeAt(parent.row())
+        count = self.__matchCount(node)
+        self.beginInsertRows(parent.sibling(parent.row(), 0),
+                             node.fetched, count - 1)
+        node.fetched = count
+        self.endInsertRows()
+
+    def index(self, row, column, parent=QModelIndex()):
+        """
+        Public method to get the index of an item.
+
+        @param row row of the item (integer)
+        @param column column of the item (integer)
+        @param parent index of the parent item (QModelIndex)
+        @return index of the item (QModelIndex)
+        """
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+
+        if not parent.isValid():
+            return self.createIndex(row, column, None)
+        return self.createIndex(row, column, self.__nodeAt(parent.row()))
+
+    def parent(self, index):
+        """
+        Public method to get the parent of an item.
+
+        @param index index of the item (QModelIndex)
+        @return index of the parent item (QModelIndex)
+        """
+        if not index.isValid():
+            return QModelIndex()
+        node = index.internalPointer()
+        if node is None:
+            return QModelIndex()
+        return self.createIndex(self.__row(node), 0, None)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        """
+        Public method to get the header data.
+
+        @param section section number (integer)
+        @param orientation header orientation (Qt.Orientation)
+        @param role data role (Qt.ItemDataRole)
+        @return header data
+        """
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and \
+                section < len(self.__headers):
+            return self.__headers[section]
+        return None
+
+    def flags(self, index):
+        """
+        Public method to get the item flags.
+
+        @param index index of the item (QModelIndex)
+        @return item flags (Qt.ItemFlags)
+        """
+        if not index.isValid():
+            return Qt.NoItemFlags
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if self.__checkable and index.column() == 0:
+            flags |= Qt.ItemIsUserCheckable
+        return flags
+
+    def data(self, index, role=Qt.DisplayRole):
+        """
+        Public method to get data of an item.
+
+        @param index index of the item (QModelIndex)
+        @param role data role (Qt.ItemDataRole)
+        @return requested data
+        """
+        if not index.isValid():
+            return None
+
+        store = self.__store
+        node = index.internalPointer()
+        column = index.column()
+        if node is None:
+            # file item
+            fileNode = self.__nodeAt(index.row())
+            fileNo = fileNode.fileNo
+            if column == 0:
+                if role == Qt.DisplayRole:
+                    return store.filePath(fileNo)
+                elif role == Qt.CheckStateRole and self.__checkable:
+                    checked = self.__checkedCount(fileNode)
+                    if checked == 0:
+                        return Qt.Unchecked
+                    elif checked == self.__matchCount(fileNode):
+                        return Qt.Checked
+                    else:
+                        return Qt.PartiallyChecked
+                elif role == self.Md5Role:
+                    return store.fileMd5(fileNo)
+            return None
+
+        # match item
+        matchNo = self.__matchNumber(node, index.row())
+        if column == 0:
+            if role == Qt.DisplayRole:
+                return store.line(matchNo)
+            elif role == Qt.TextAlignmentRole:
+                return Qt.AlignRight
+            elif role == Qt.CheckStateRole and self.__checkable:
+                return Qt.Checked if store.isChecked(matchNo) \
+                    else Qt.Unchecked
+            elif role == self.LineRole:
+                return store.line(matchNo)
+            elif role == self.StartRole:
+                return store.start(matchNo)
+            elif role == self.EndRole:
+                return store.end(matchNo)
+            elif role == self.ReplaceRole:
+                return store.replacedText(matchNo)
+            elif role == self.EditsRole:
+                return store.edits(matchNo)
+        elif column == 1 and role == Qt.DisplayRole:
+            if self.__checkable:
+                return "- {0}\n+ {1}".format(store.text(matchNo),
+                                             store.replacedText(matchNo))
+            return store.text(matchNo)
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        """
+        Public method to change the check state of an item.
+
+        @param index index of the item (QModelIndex)
+        @param value new check state (Qt.CheckState)
+        @param role data role (Qt.ItemDataRole)
+        @return flag indicating success (boolean)
+        """
+        if not index.isValid() or role != Qt.CheckStateRole or \
+                not self.__checkable:
+            return False
+
+        checked = value == Qt.Checked
+        node = index.internalPointer()
+        if node is None:
+            # file item, applies to all shown matches
+            node = self.__nodeAt(index.row())
+            if node.matches is None:
+                self.__store.setFileChecked(node.fileNo, checked)
+            else:
+                for matchNo in node.matches:
+                    self.__store.setChecked(node.fileNo, matchNo, checked)
+            fileIndex = self.index(self.__row(node), 0)
+            self.dataChanged.emit(fileIndex, fileIndex)
+            if node.fetched:
+                self.dataChanged.emit(self.index(0, 0, fileIndex),
+                                      self.index(node.fetched - 1, 0,
+                                                 fileIndex))
+        else:
+            self.__store.setChecked(
+                node.fileNo, self.__matchNumber(node, index.row()), checked)
+            self.dataChanged.emit(index, index)
+            fileIndex = self.index(self.__row(node), 0)
+            self.dataChanged.emit(fileIndex, fileIndex)
+        return True
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """
+        Public method to sort the files by name.
+
+        The files are always in ascending order, a descending order only
+        reverses the rows of the files.
+
+        @param column column to sort by (integer)
+        @param order sort order (Qt.SortOrder)
+        """
+        descending = order == Qt.DescendingOrder
+        if descending == self.__descending:
+            return
+
+        self.layoutAboutToBeChanged.emit()
+        oldIndexes = self.persistentIndexList()
+        # matches keep their rows below the (moved) file
+        last = len(self.__nodes) - 1
+        newIndexes = [
+            self.createIndex(last - index.row(), index.column(), None)
+            if index.internalPointer() is None else index
+            for index in oldIndexes]
+        self.__descending = descending
+        self.changePersistentIndexList(oldIndexes, newIndexes)
+        self.layoutChanged.emit()
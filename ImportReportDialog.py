@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing a dialog showing the versions of the QML imports used in
+a directory tree.
+"""
+
+from __future__ import unicode_literals
+
+import json
+
+from PyQt5.QtCore import pyqtSignal, Qt
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QTreeWidget, \
+    QTreeWidgetItem, QDialogButtonBox, QFileDialog, QHeaderView
+
+from E5Gui import E5MessageBox
+
+
+class ImportReportDialog(QDialog):
+    """
+    Class implementing a dialog showing an import report.
+
+    Every used module version is shown with the number of imports and the
+    importing files as children.
+
+    @signal ruleRequested(str, str) emitted with module and version to search
+        for a module version
+    """
+    ruleRequested = pyqtSignal(str, str)
+
+    ModuleRole = Qt.UserRole + 1
+    VersionRole = Qt.UserRole + 2
+
+    def __init__(self, report, root, parent=None):
+        """
+        Constructor
+
+        @param report report to be shown (ImportReport)
+        @param root scanned directory (string)
+        @param parent parent widget of this dialog (QWidget)
+        """
+        super(ImportReportDialog, self).__init__(parent)
+        self.setWindowTitle(self.tr("Import Report"))
+        self.resize(600, 450)
+        self.__report = report
+
+        layout = QVBoxLayout(self)
+        self.reportList = QTreeWidget(self)
+        self.reportList.setHeaderLabels([self.tr("Module"),
+                                         self.tr("Version"),
+                                         self.tr("Imports"),
+                                         self.tr("Files")])
+        self.reportList.setToolTip(
+            self.tr("Double click a version to search for it"))
+        self.reportList.itemDoubleClicked.connect(self.__itemDoubleClicked)
+        layout.addWidget(self.reportList)
+
+        self.buttonBox = QDialogButtonBox(QDialogButtonBox.Close, self)
+        self.saveButton = self.buttonBox.addButton(
+            self.tr("Save..."), QDialogButtonBox.ActionRole)
+        self.saveButton.clicked.connect(self.__save)
+        self.buttonBox.rejected.connect(self.close)
+        layout.addWidget(self.buttonBox)
+
+        prefix = root.replace("\\", "/").rstrip("/") + "/"
+        for module, version, count, usages in report.rows():
+            files = sorted(set(fileName for fileName, line in usages))
+            itm = QTreeWidgetItem(self.reportList, [
+                module, version or self.tr("(none)"), str(count),
+                str(len(files))])
+            itm.setData(0, self.ModuleRole, module)
+            itm.setData(0, self.VersionRole, version)
+            itm.setTextAlignment(2, Qt.AlignRight)
+            itm.setTextAlignment(3, Qt.AlignRight)
+            for fileName, line in usages:
+                path = fileName.replace("\\", "/")
+                if path.startswith(prefix):
+                    path = path[len(prefix):]
+                child = QTreeWidgetItem(itm, [path, "", str(line)])
+                child.setTextAlignment(2, Qt.AlignRight)
+
+        header = self.reportList.header()
+        header.setSectionResizeMode(0, QHeaderView.Stretch)
+        for column in range(1, 4):
+            self.reportList.resizeColumnToContents(column)
+
+    def __itemDoubleClicked(self, itm, column):
+        """
+        Private slot to request a search for a module version.
+
+        @param itm double clicked item (QTreeWidgetItem)
+        @param column double clicked column (integer)
+        """
+        if itm.parent() is None and itm.data(0, self.VersionRole):
+            self.ruleRequested.emit(itm.data(0, self.ModuleRole),
+                                    itm.data(0, self.VersionRole))
+
+    def __save(self):
+        """
+        Private slot to save the report as JSON or as a plain text table.
+        """
+        fileName, selectedFilter = QFileDialog.getSaveFileName(
+            self, self.tr("Save Import Report"), "imports.json",
+            self.tr("JSON Files (*.json);;Text Files (*.txt)"))
+        if fileName == '':
+            return
+
+        try:
+            with open(fileName, "w") as f:
+                if fileName.lower().endswith(".txt"):
+                    f.write(self.__report.formatTable())
+                else:
+                    json.dump(self.__report.toDict(), f, indent=4)
+        except (IOError, OSError) as err:
+            E5MessageBox.critical(
+                self,
+                self.tr("Save Import Report"),
+                self.tr("""<p>The report could not be written to"""
+                        """ <b>{0}</b>.</p><p>Reason: {1}</p>""")
+                .format(fileName, str(err)))
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing a thread applying a replace plan in the background.
+"""
+
+from __future__ import unicode_literals
+
+from PyQt5.QtCore import pyqtSignal, QThread
+
+from SearchEngine.Scanner import replaceFile
+
+
+class ReplaceThread(QThread):
+    """
+    Class implementing a thread applying a replace plan in the background.
+    
+    Cancellation is checked between files, so a file is always written
+    completely or not at all. Every file written or left unchanged is
+    recorded in the checkpoint journal of the run. Files, that could not be
+    read or written, stay pending, so resuming the run retries them.
+    
+    @signal fileStarted(str) emitted when a file is started
+    @signal fileDone(int, int) emitted with the number of finished and the
+        total number of files
+    @signal fileError(str, str) emitted with the file name and the error
+        message for a file, that could not be read or written
+    @signal conflict(str, str, object) emitted with the file name, the
+        reason and the edit rejected by the replace plan
+    """
+    fileStarted = pyqtSignal(str)
+    fileDone = pyqtSignal(int, int)
+    fileError = pyqtSignal(str, str)
+    conflict = pyqtSignal(str, str, object)
+    
+    def __init__(self, checkpoint, parent=None):
+        """
+        Constructor
+        
+        @param checkpoint checkpoint of the run containing the plan
+            (SearchEngine.Checkpoint.ReplaceCheckpoint)
+        @param parent reference to the parent object (QObject)
+        """
+        super(ReplaceThread, self).__init__(parent)
+        
+        self.__checkpoint = checkpoint
+        self.__cancelled = False
+        self.__journalError = ""
+    
+    def cancel(self):
+        """
+        Public method to stop the run after the current file.
+        """
+        self.__cancelled = True
+    
+    def journalError(self):
+        """
+        Public method to get the error of writing the checkpoint journal.
+        
+        @return error message or an empty string (string)
+        """
+        return self.__journalError
+    
+    def run(self):
+        """
+        Public method implementing the thread body.
+        """
+        checkpoint = self.__checkpoint
+        plan = checkpoint.plan
+        total = len(plan)
+        finished = len(checkpoint.done)
+        
+        for fn in checkpoint.pendingFiles():
+            if self.__cancelled:
+                return
+            
+            self.fileStarted.emit(fn)
+            try:
+                changed, conflicts = replaceFile(fn, plan)
+            except (IOError, OSError, LookupError, UnicodeError) as err:
+                self.fileError.emit(fn, str(err))
+            else:
+                for reason, edit in conflicts:
+                    self.conflict.emit(fn, reason, edit)
+                
+                if self.__journalError:
+                    checkpoint.done.add(fn)
+                else:
+                    try:
+                        checkpoint.markDone(fn)
+                    except (IOError, OSError) as err:
+                        # keep going, the run just cannot be resumed
+                        self.__journalError = str(err)
+            finished += 1
+            self.fileDone.emit(finished, total)
+        
+        if not checkpoint.pendingFiles():
+            checkpoint.remove()
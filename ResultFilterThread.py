@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing a thread filtering the search results in the background.
+"""
+
+from __future__ import unicode_literals
+
+from PyQt5.QtCore import pyqtSignal, QThread
+
+
+class ResultFilterThread(QThread):
+    """
+    Class implementing a thread filtering the search results in the
+    background.
+
+    The thread only reads the result store. Files added to the store while
+    filtering are not covered by the result, their number is given by the
+    signal.
+
+    @signal filtered(object, object, int) emitted with the filter, the
+        tuples of file number and passing match numbers and the number of
+        files covered
+    """
+    filtered = pyqtSignal(object, object, int)
+
+    def __init__(self, resultFilter, store, candidates, parent=None):
+        """
+        Constructor
+
+        @param resultFilter filter to be applied
+            (SearchEngine.ResultFilter.ResultFilter)
+        @param store result store to be filtered
+            (SearchEngine.ResultStore.ResultStore)
+        @param candidates tuples of file number and the match numbers to be
+            checked or None for all matches of the file (list of tuples)
+        @param parent reference to the parent object (QObject)
+        """
+        super(ResultFilterThread, self).__init__(parent)
+
+        self.__filter = resultFilter
+        self.__store = store
+        self.__candidates = candidates
+        self.__fileCount = store.fileCount()
+        self.__cancelled = False
+
+    def cancel(self):
+        """
+        Public method to stop filtering.
+        """
+        self.__cancelled = True
+
+    def run(self):
+        """
+        Public method implementing the thread body.
+        """
+        result = self.__filter.apply(self.__store, self.__candidates,
+                                     lambda: self.__cancelled)
+        if result is not None and not self.__cancelled:
+            self.filtered.emit(self.__filter, result, self.__fileCount)
@@ -0,0 +1,454 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing the model of the search and replace rules.
+"""
+
+from __future__ import unicode_literals
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, \
+    QCoreApplication
+from PyQt5.QtGui import QBrush
+
+from SearchEngine.Rules import SearchRule, RuleError
+
+
+class RuleModel(QAbstractTableModel):
+    """
+    Class implementing a table model of the rules of the dialog.
+
+    Every rule is a row, the rules of the user come first, the rules of
+    rule packs follow in the order the packs were loaded. No widgets are
+    created per rule, a single editor shows the current rule.
+
+    A rule is complete, if it has a search text and a file filter. The
+    number of incomplete rules is kept up to date as rules are added,
+    edited and removed, so checking all rules costs the same for any number
+    of rules.
+
+    Rules are compiled, when they are added or edited. The compiled rules
+    are used for searching as they are, the errors of invalid rules are
+    kept and shown in the columns of the offending fields.
+    """
+    PackColumn = 0
+    FindColumn = 1
+    ReplaceColumn = 2
+    FilterColumn = 3
+
+    # rule attribute and header of the columns after the pack column
+    Columns = [
+        ("findText", "Find"),
+        ("replaceText", "Replace"),
+        ("fileFilter", "Filter"),
+        ("caseSensitive", "Case"),
+        ("regexp", "Regexp"),
+        ("wholeWord", "Word"),
+        ("headerOnly", "Header"),
+        ("structural", "Structure"),
+    ]
+    FlagColumns = 4         # first column showing a flag
+
+    # column of the fields named by RuleError
+    ErrorColumns = {
+        'find': FindColumn,
+        'replace': ReplaceColumn,
+        'filter': FilterColumn,
+    }
+
+    def __init__(self, parent=None):
+        """
+        Constructor
+
+        @param parent reference to the parent object (QObject)
+        """
+        super(RuleModel, self).__init__(parent)
+
+        self.__packs = []
+        self.__rows = []            # tuples of pack or None and rule
+        self.__userRules = 0        # number of rules not of a pack
+        self.__incomplete = 0
+        self.__errors = {}          # rule -> RuleError
+        self.__compileArgs = None
+        self.__headers = [QCoreApplication.translate("RuleModel", "Pack")]
+        self.__headers.extend(QCoreApplication.translate("RuleModel", header)
+                              for attribute, header in self.Columns)
+
+    @staticmethod
+    def isRuleComplete(rule):
+        """
+        Static method to check, if a rule can be searched for.
+
+        @param rule rule to be checked (SearchRule)
+        @return flag indicating a search text and a file filter (boolean)
+        """
+        return bool(rule.findText) and bool(rule.fileFilter)
+
+    def isComplete(self):
+        """
+        Public method to check, if all rules can be searched for.
+
+        @return flag indicating at least one rule and only complete rules
+            (boolean)
+        """
+        return bool(self.__rows) and self.__incomplete == 0
+
+    def setCompileArgs(self, tables=None, withReplace=True, filters=None):
+        """
+        Public method to set the arguments of SearchRule.compile and to
+        compile all rules again.
+
+        @param tables named lookup tables for the replacement templates,
+            the tables of a pack take precedence for its rules
+            (dict of dict)
+        @param withReplace flag indicating to compile the replacement
+            templates as well (boolean)
+        @param filters additional filters of the replacement templates
+            (dict of functions)
+        """
+        self.__compileArgs = (tables, withReplace, filters)
+        self.__errors = {}
+        for pack, rule in self.__rows:
+            self.__compile(pack, rule)
+        if self.__rows:
+            self.dataChanged.emit(
+                self.index(0, 0),
+                self.index(len(self.__rows) - 1, len(self.__headers) - 1))
+
+    def __compile(self, pack, rule):
+        """
+        Private method to compile a rule and to keep its error.
+
+        @param pack pack of the rule or None (RulePack)
+        @param rule rule to be compiled (SearchRule)
+        """
+        if self.__compileArgs is None:
+            return
+
+        tables, withReplace, filters = self.__compileArgs
+        if pack is not None:
+            tables = pack.ruleTables(tables)
+        try:
+            rule.compile(tables, withReplace, filters)
+        except RuleError as err:
+            self.__errors[rule] = err
+        else:
+            self.__errors.pop(rule, None)
+
+    def ruleError(self, index):
+        """
+        Public method to get the error of an invalid rule.
+
+        @param index index of the row of the rule (QModelIndex)
+        @return error of the last compilation or None for a valid rule
+            (RuleError)
+        """
+        if not index.isValid():
+            return None
+        return self.__errors.get(self.__rows[index.row()][1])
+
+    def invalidRules(self):
+        """
+        Public method to get the rules, that could not be compiled.
+
+        @return tuples of the row and the error of the invalid rules
+            (list of tuples of integer and RuleError)
+        """
+        if not self.__errors:
+            return []
+        return [(row, self.__errors[rule])
+                for row, (pack, rule) in enumerate(self.__rows)
+                if rule in self.__errors]
+
+    def compiledRules(self):
+        """
+        Public method to get the compiled rules for a search.
+
+        @return rules in the order of the rows (list of SearchRule)
+        """
+        return [rule for pack, rule in self.__rows]
+
+    def clear(self):
+        """
+        Public method to remove all rules and packs.
+        """
+        self.beginResetModel()
+        self.__packs = []
+        self.__rows = []
+        self.__userRules = 0
+        self.__incomplete = 0
+        self.__errors = {}
+        self.endResetModel()
+
+    def addRule(self, rule):
+        """
+        Public method to add a rule of the user.
+
+        @param rule rule to be added (SearchRule)
+        @return index of the row of the rule (QModelIndex)
+        """
+        row = self.__userRules
+        self.__compile(None, rule)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.__rows.insert(row, (None, rule))
+        self.__userRules += 1
+        if not self.isRuleComplete(rule):
+            self.__incomplete += 1
+        self.endInsertRows()
+        return self.index(row, self.FindColumn)
+
+    def addPack(self, pack):
+        """
+        Public method to add the rules of a pack.
+
+        @param pack pack to be added (RulePack)
+        """
+        row = len(self.__rows)
+        self.__packs.append(pack)
+        if not pack.rules:
+            return
+        for rule in pack.rules:
+            self.__compile(pack, rule)
+        self.beginInsertRows(QModelIndex(), row, row + len(pack.rules) - 1)
+        self.__rows.extend((pack, rule) for rule in pack.rules)
+        self.__incomplete += sum(1 for rule in pack.rules
+                                 if not self.isRuleComplete(rule))
+        self.endInsertRows()
+
+    def removeRule(self, index):
+        """
+        Public method to remove a rule.
+
+        A rule of a pack is removed from the pack as well.
+
+        @param index index of the row of the rule (QModelIndex)
+        """
+        if not index.isValid():
+            return
+        row = index.row()
+        pack, rule = self.__rows[row]
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.__rows[row]
+        if pack is None:
+            self.__userRules -= 1
+        else:
+            pack.rules.remove(rule)
+        if not self.isRuleComplete(rule):
+            self.__incomplete -= 1
+        self.__errors.pop(rule, None)
+        self.endRemoveRows()
+
+    def removePack(self, pack):
+        """
+        Public method to remove the rules of a pack.
+
+        @param pack pack to be removed (RulePack)
+        """
+        if pack not in self.__packs:
+            return
+        rows = [row for row, (rowPack, rule) in enumerate(self.__rows)
+                if rowPack is pack]
+        self.__packs.remove(pack)
+        if not rows:
+            return
+        # the rules of a pack are consecutive
+        self.beginRemoveRows(QModelIndex(), rows[0], rows[-1])
+        self.__incomplete -= sum(
+            1 for rowPack, rule in self.__rows[rows[0]:rows[-1] + 1]
+            if not self.isRuleComplete(rule))
+        for rule in pack.rules:
+            self.__errors.pop(rule, None)
+        del self.__rows[rows[0]:rows[-1] + 1]
+        self.endRemoveRows()
+
+    def packs(self):
+        """
+        Public method to get the loaded packs.
+
+        @return packs in the order they were added (list of RulePack)
+        """
+        return list(self.__packs)
+
+    def userRules(self):
+        """
+        Public method to get the rules of the user.
+
+        @return rules not belonging to a pack (list of SearchRule)
+        """
+        return [rule for pack, rule in self.__rows[:self.__userRules]]
+
+    def rows(self):
+        """
+        Public method to get all rules with their packs.
+
+        @return tuples of the pack or None and the rule in the order of the
+            rows (list of tuples of RulePack and SearchRule)
+        """
+        return list(self.__rows)
+
+    def pack(self, index):
+        """
+        Public method to get the pack of a row.
+
+        @param index index of the row (QModelIndex)
+        @return pack of the rule or None for a rule of the user or an
+            invalid index (RulePack)
+        """
+        if not index.isValid():
+            return None
+        return self.__rows[index.row()][0]
+
+    def rule(self, index):
+        """
+        Public method to get the rule of a row.
+
+        @param index index of the row (QModelIndex)
+        @return rule or None for an invalid index (SearchRule)
+        """
+        if not index.isValid():
+            return None
+        return self.__rows[index.row()][1]
+
+    def setRuleData(self, index, data):
+        """
+        Public method to change a rule to the state of the rule editor.
+
+        @param index index of the row of the rule (QModelIndex)
+        @param data serialized rule as written by subForm.serialize (dict)
+        """
+        if not index.isValid():
+            return
+        rule = self.__rows[index.row()][1]
+        wasComplete = self.isRuleComplete(rule)
+        edited = SearchRule.fromDict(data)
+        for attribute, header in self.Columns:
+            setattr(rule, attribute, getattr(edited, attribute))
+        self.__ruleChanged(index.row(), wasComplete)
+
+    def __ruleChanged(self, row, wasComplete):
+        """
+        Private method to account for a changed rule and to compile it.
+
+        @param row row of the rule (integer)
+        @param wasComplete flag indicating a complete rule before the change
+            (boolean)
+        """
+        pack, rule = self.__rows[row]
+        self.__compile(pack, rule)
+        isComplete = self.isRuleComplete(rule)
+        if wasComplete and not isComplete:
+            self.__incomplete += 1
+        elif isComplete and not wasComplete:
+            self.__incomplete -= 1
+        self.dataChanged.emit(self.index(row, 0),
+                              self.index(row, len(self.__headers) - 1))
+
+    def columnCount(self, parent=QModelIndex()):
+        """
+        Public method to get the number of columns.
+
+        @param parent index of the parent item (QModelIndex)
+        @return number of columns (integer)
+        """
+        return len(self.__headers)
+
+    def rowCount(self, parent=QModelIndex()):
+        """
+        Public method to get the number of rows.
+
+        @param parent index of the parent item (QModelIndex)
+        @return number of rows (integer)
+        """
+        if parent.isValid():
+            return 0
+        return len(self.__rows)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        """
+        Public method to get the header data.
+
+        @param section number of the section (integer)
+        @param orientation orientation of the header (Qt.Orientation)
+        @param role data role (Qt.ItemDataRole)
+        @return header data
+        """
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.__headers[section]
+        return None
+
+    def flags(self, index):
+        """
+        Public method to get the item flags.
+
+        @param index index of the item (QModelIndex)
+        @return item flags (Qt.ItemFlags)
+        """
+        if not index.isValid():
+            return Qt.NoItemFlags
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.column() >= self.FlagColumns:
+            flags |= Qt.ItemIsUserCheckable
+        elif index.column() != self.PackColumn:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def data(self, index, role=Qt.DisplayRole):
+        """
+        Public method to get the data of an item.
+
+        @param index index of the item (QModelIndex)
+        @param role data role (Qt.ItemDataRole)
+        @return data of the item
+        """
+        if not index.isValid():
+            return None
+        pack, rule = self.__rows[index.row()]
+        column = index.column()
+        if column == self.PackColumn:
+            if pack is None:
+                return None
+            elif role == Qt.DisplayRole:
+                return str(pack)
+            elif role == Qt.ToolTipRole:
+                return pack.description or None
+            return None
+
+        error = self.__errors.get(rule)
+        if error is not None and \
+                self.ErrorColumns.get(error.field) == column:
+            if role == Qt.ForegroundRole:
+                return QBrush(Qt.red)
+            elif role == Qt.ToolTipRole:
+                return str(error)
+
+        attribute = self.Columns[column - 1][0]
+        if column >= self.FlagColumns:
+            if role == Qt.CheckStateRole:
+                return Qt.Checked if getattr(rule, attribute) \
+                    else Qt.Unchecked
+        elif role in (Qt.DisplayRole, Qt.EditRole, Qt.ToolTipRole):
+            return getattr(rule, attribute)
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        """
+        Public method to change the data of an item.
+
+        @param index index of the item (QModelIndex)
+        @param value new value
+        @param role data role (Qt.ItemDataRole)
+        @return flag indicating a changed item (boolean)
+        """
+        if not index.isValid() or index.column() == self.PackColumn:
+            return False
+        rule = self.__rows[index.row()][1]
+        attribute = self.Columns[index.column() - 1][0]
+        if index.column() >= self.FlagColumns:
+            if role != Qt.CheckStateRole:
+                return False
+            value = value == Qt.Checked
+        elif role != Qt.EditRole:
+            return False
+        wasComplete = self.isRuleComplete(rule)
+        setattr(rule, attribute, value)
+        self.__ruleChanged(index.row(), wasComplete)
+        return True
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing a cache of directory listings and decoded files for
+repeated searches.
+"""
+
+from __future__ import unicode_literals
+
+import os
+from collections import OrderedDict
+
+from . import FileIO
+
+
+def _stamp(st):
+    """
+    Function to get the modification stamp of a stat result.
+
+    @param st result of os.stat (os.stat_result)
+    @return modification time and size (tuple)
+    """
+    return getattr(st, "st_mtime_ns", st.st_mtime), st.st_size
+
+
+class SearchCache(object):
+    """
+    Class implementing a cache of directory listings and decoded files.
+
+    Directory listings are kept per directory and validated by the
+    modification time of the directory. Files are kept with their encoding
+    verdict and hash and validated by modification time and size, so a
+    changed file is always read again. The least recently used files are
+    dropped, when the cached files exceed maxBytes.
+
+    The stamp and hash of every file read are kept in a hash table, which
+    is not limited and may be saved and restored with a session.
+    """
+    def __init__(self, maxBytes=128 * 1024 * 1024):
+        """
+        Constructor
+
+        @param maxBytes maximum size of the cached files in bytes (integer)
+        """
+        self.maxBytes = maxBytes
+        self.clear()
+
+    def clear(self):
+        """
+        Public method to empty the cache.
+        """
+        self.__dirs = {}                # path -> (stamp, files, subdirs)
+        self.__files = OrderedDict()    # path -> (stamp, text, verdict, md5)
+        self.__hashes = {}              # path -> (stamp, md5)
+        self.__bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """
+        Public method to get the statistics of the cache.
+
+        @return dictionary with the number of cached directories and files,
+            the size of the cached files and the number of cache hits and
+            misses of file reads (dict)
+        """
+        return {
+            "directories": len(self.__dirs),
+            "files": len(self.__files),
+            "bytes": self.__bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def __listDirectory(self, dirname):
+        """
+        Private method to get the entries of a directory.
+
+        @param dirname name of the directory (string)
+        @return tuple of the file names and the names of the subdirectories
+            (list of strings, list of strings)
+        @exception OSError raised to indicate an unreadable directory
+        """
+        stamp = _stamp(os.stat(dirname))
+        entry = self.__dirs.get(dirname)
+        if entry is not None and entry[0] == stamp:
+            return entry[1], entry[2]
+
+        files = []
+        subdirs = []
+        for name in sorted(os.listdir(dirname)):
+            path = os.path.join(dirname, name)
+            if os.path.isdir(path):
+                # don't follow links, like os.walk
+                if not os.path.islink(path):
+                    subdirs.append(name)
+            else:
+                files.append(name)
+        self.__dirs[dirname] = (stamp, files, subdirs)
+        return files, subdirs
+
+    def iterFiles(self, root, filterRes):
+        """
+        Public method to iterate over the candidate files of a directory
+        tree.
+
+        The directory listings are only used by this method, so a
+        FileEnumerator thread may list the files, while the files are read
+        through the cache by another thread.
+
+        @param root directory to be searched (string)
+        @param filterRes regular expressions a file name has to match at
+            least one of (list of compiled regular expressions)
+        @return generator yielding tuples of path and size in bytes
+            (string, integer)
+        """
+        stack = [os.path.abspath(root)]
+        while stack:
+            dirname = stack.pop()
+            try:
+                files, subdirs = self.__listDirectory(dirname)
+            except OSError:
+                self.__dirs.pop(dirname, None)
+                continue
+
+            for name in files:
+                for filterRe in filterRes:
+                    if filterRe.match(name):
+                        break
+                else:
+                    continue
+
+                path = os.path.join(dirname, name)
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    continue
+                yield path, size
+            stack.extend(os.path.join(dirname, name)
+                         for name in reversed(subdirs))
+
+    def read(self, fileName):
+        """
+        Public method to read a file through the cache.
+
+        @param fileName name of the file (string)
+        @return tuple of decoded text, encoding verdict and hash value
+            (string, EncodingVerdict, string)
+        @exception IOError raised to indicate an unreadable file
+        """
+        stamp = _stamp(os.stat(fileName))
+        entry = self.__files.pop(fileName, None)
+        if entry is not None:
+            self.__bytes -= entry[0][1]
+            if entry[0] != stamp:
+                entry = None
+
+        if entry is None:
+            self.misses += 1
+            text, verdict, hashStr = FileIO.readEncodedFile(fileName)
+            entry = (stamp, text, verdict, hashStr)
+            self.__hashes[fileName] = (stamp, hashStr)
+        else:
+            self.hits += 1
+
+        # (re)insert as the most recently used file
+        self.__files[fileName] = entry
+        self.__bytes += stamp[1]
+        while self.__bytes > self.maxBytes and len(self.__files) > 1:
+            oldStamp = self.__files.popitem(last=False)[1][0]
+            self.__bytes -= oldStamp[1]
+        return entry[1], entry[2], entry[3]
+
+    def invalidate(self, fileName):
+        """
+        Public method to drop a file from the cache.
+
+        @param fileName name of the file (string)
+        """
+        self.__hashes.pop(fileName, None)
+        entry = self.__files.pop(fileName, None)
+        if entry is not None:
+            self.__bytes -= entry[0][1]
+
+    def hashTable(self):
+        """
+        Public method to get the stamps and hashes of the files read.
+
+        @return dictionary of the file name and a tuple of the modification
+            stamp and the MD5 hash (dict)
+        """
+        return self.__hashes
+
+    def setHashTable(self, hashes):
+        """
+        Public method to restore the stamps and hashes of files read before.
+
+        @param hashes dictionary of the file name and a tuple of the
+            modification stamp and the MD5 hash (dict)
+        """
+        self.__hashes = dict(hashes)
+
+    def knownHash(self, fileName):
+        """
+        Public method to get the hash of a file without reading it.
+
+        @param fileName name of the file (string)
+        @return MD5 hash of the file or None, if the file was not read or
+            was changed since (string)
+        """
+        entry = self.__hashes.get(fileName)
+        if entry is None:
+            return None
+        try:
+            stamp = _stamp(os.stat(fileName))
+        except OSError:
+            return None
+        return entry[1] if entry[0] == stamp else None
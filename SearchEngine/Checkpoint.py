@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing a checkpoint journal for interruptible replace runs.
+"""
+
+from __future__ import unicode_literals
+
+import os
+import json
+import hashlib
+
+from .ReplacePlan import ReplacePlan
+
+
+def checkpointPath():
+    """
+    Function to get the path of the checkpoint file of the current user.
+    
+    @return path of the checkpoint file (string)
+    """
+    return os.path.join(os.path.expanduser("~"), ".quick_change_qml",
+                        "replace.checkpoint")
+
+
+class ReplaceCheckpoint(object):
+    """
+    Class implementing a journal of a replace run.
+    
+    The first line of the journal holds the complete replace plan, every
+    following line the name of a file already written. Lines are appended
+    and flushed as files are finished, so an interrupted run can be resumed
+    without searching again and without touching finished files.
+    """
+    Version = 1
+    
+    def __init__(self, fileName, plan, planId, root="", done=None):
+        """
+        Constructor
+        
+        @param fileName name of the journal file or None to keep track of
+            finished files in memory only (string)
+        @param plan replace plan of the run (ReplacePlan)
+        @param planId identifier of the plan (string)
+        @param root directory the run was started for (string)
+        @param done names of files already finished (set of strings)
+        """
+        self.fileName = fileName
+        self.plan = plan
+        self.planId = planId
+        self.root = root
+        self.done = done or set()
+        self.__terminated = True
+    
+    @classmethod
+    def create(cls, fileName, plan, root=""):
+        """
+        Class method to start a journal for a replace plan.
+        
+        An existing journal of the same plan is continued, any other one is
+        replaced.
+        
+        @param fileName name of the journal file (string)
+        @param plan replace plan of the run (ReplacePlan)
+        @param root directory the run was started for (string)
+        @return checkpoint of the run (ReplaceCheckpoint)
+        @exception IOError raised to indicate a failure writing the journal
+        """
+        data = plan.serialize()
+        planId = hashlib.sha1(
+            json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+        
+        existing = cls.load(fileName)
+        if existing is not None and existing.planId == planId:
+            return existing
+        
+        directory = os.path.dirname(fileName)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(fileName, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"version": cls.Version, "id": planId,
+                                "root": root, "plan": data}))
+            f.write("\n")
+        return cls(fileName, plan, planId, root)
+    
+    @classmethod
+    def load(cls, fileName):
+        """
+        Class method to load a journal.
+        
+        @param fileName name of the journal file (string)
+        @return checkpoint or None, if there is no valid journal
+            (ReplaceCheckpoint)
+        """
+        try:
+            with open(fileName, "r", encoding="utf-8") as f:
+                header = json.loads(f.readline())
+                if header.get("version") != cls.Version:
+                    return None
+                done = set()
+                terminated = True
+                for line in f:
+                    terminated = line.endswith("\n")
+                    try:
+                        done.add(json.loads(line)["done"])
+                    except (ValueError, KeyError):
+                        # line of an interrupted write
+                        continue
+        except (IOError, OSError, ValueError):
+            return None
+        
+        plan = ReplacePlan().deserialize(header["plan"])
+        checkpoint = cls(fileName, plan, header["id"], header.get("root", ""),
+                         done)
+        checkpoint.__terminated = terminated
+        return checkpoint
+    
+    def pendingFiles(self):
+        """
+        Public method to get the files not yet finished.
+        
+        @return list of file names (list of strings)
+        """
+        return [fn for fn in self.plan.files() if fn not in self.done]
+    
+    def markDone(self, fn):
+        """
+        Public method to record a finished file.
+        
+        @param fn name of the file (string)
+        @exception IOError raised to indicate a failure writing the journal
+        """
+        self.done.add(fn)
+        if self.fileName:
+            with open(self.fileName, "a", encoding="utf-8") as f:
+                if not self.__terminated:
+                    # don't continue a line cut off by an interrupted write
+                    f.write("\n")
+                    self.__terminated = True
+                f.write(json.dumps({"done": fn}))
+                f.write("\n")
+    
+    def remove(self):
+        """
+        Public method to remove the journal after a complete run.
+        """
+        if not self.fileName:
+            return
+        try:
+            os.remove(self.fileName)
+        except OSError:
+            pass
@@ -0,0 +1,496 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing a long running search service keeping its caches warm
+between requests.
+
+Messages use the framing of Utilities.BackgroundService, a header packed as
+'!II' holding the length and the Adler-32 checksum of a JSON encoded list
+[command, root, data]. The service listens on a Unix socket in the data
+directory of the user or, where these are not available, on a TCP port of
+the local host written to a file in that directory. The file is readable
+by the user only and holds a random token as well, a client of the TCP
+service has to send it in an 'auth' request before any other request.
+"""
+
+from __future__ import unicode_literals
+
+import io
+import os
+import hmac
+import json
+import binascii
+import socket
+import struct
+from zlib import adler32
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver     # __IGNORE_WARNING__
+
+from .Cache import SearchCache
+from .DiffWriter import UnifiedDiffWriter
+from .QrcResolver import QrcResolver
+from .ReplacePlan import ReplacePlan
+from .Rules import SearchRule, RuleError
+from .Scanner import replaceFile, diffFile
+from .SearchJob import SearchJob
+
+HeaderFormat = b'!II'
+
+
+class DaemonError(Exception):
+    """
+    Class implementing an exception raised for failed requests.
+    """
+    pass
+
+
+def daemonDirectory():
+    """
+    Function to get the directory of the socket and port files.
+
+    @return path of the directory (string)
+    """
+    return os.path.join(os.path.expanduser("~"), ".quick_change_qml")
+
+
+def _portFile():
+    """
+    Private function to get the file of the port and token of a TCP service.
+
+    @return path of the file (string)
+    """
+    return os.path.join(daemonDirectory(), "daemon.port")
+
+
+def _readPortFile():
+    """
+    Private function to read the port and token of a TCP service.
+
+    @return tuple of port and token, None if no TCP service is known
+        (tuple of integer and string)
+    """
+    try:
+        with open(_portFile()) as f:
+            port, token = f.read().split()
+        return int(port), token
+    except (IOError, ValueError):
+        return None
+
+
+def daemonAddress():
+    """
+    Function to get the address of the service of the current user.
+
+    @return path of the Unix socket or a tuple of host and port, None if the
+        port of a TCP service is not known (string or tuple)
+    """
+    if hasattr(socket, "AF_UNIX"):
+        return os.path.join(daemonDirectory(), "daemon.sock")
+
+    portAndToken = _readPortFile()
+    if portAndToken is None:
+        return None
+    return ("127.0.0.1", portAndToken[0])
+
+
+def daemonToken():
+    """
+    Function to get the token of the TCP service of the current user.
+
+    @return token to be sent by the clients, None if no TCP service is known
+        (string)
+    """
+    portAndToken = _readPortFile()
+    if portAndToken is None:
+        return None
+    return portAndToken[1]
+
+
+def sendMessage(connection, command, root, data):
+    """
+    Function to send a message.
+
+    @param connection connected socket (socket.socket)
+    @param command name of the command (string)
+    @param root directory of the request (string)
+    @param data data of the message (JSON serializable)
+    """
+    packedData = json.dumps([command, root, data]).encode('utf-8')
+    header = struct.pack(HeaderFormat, len(packedData),
+                         adler32(packedData) & 0xffffffff)
+    connection.sendall(header + packedData)
+
+
+def __receive(connection, length):
+    """
+    Private function to receive a number of bytes.
+
+    @param connection connected socket (socket.socket)
+    @param length number of bytes to receive (integer)
+    @return received bytes, None if the connection was closed (bytes)
+    """
+    data = b''
+    while len(data) < length:
+        newData = connection.recv(length - len(data))
+        if not newData:
+            return None
+        data += newData
+    return data
+
+
+def receiveMessage(connection):
+    """
+    Function to receive a message.
+
+    @param connection connected socket (socket.socket)
+    @return tuple of command, root and data or None, if the connection was
+        closed (tuple)
+    @exception DaemonError raised to indicate a corrupted message
+    """
+    header = __receive(connection, struct.calcsize(HeaderFormat))
+    if header is None:
+        return None
+    length, datahash = struct.unpack(HeaderFormat, header)
+    packedData = __receive(connection, length)
+    if packedData is None:
+        return None
+    if adler32(packedData) & 0xffffffff != datahash:
+        raise DaemonError("corrupted message")
+    command, root, data = json.loads(packedData.decode('utf-8'))
+    return command, root, data
+
+
+def compileRules(ruleData, withReplace, filters=None):
+    """
+    Function to compile the rules of a rule file.
+
+    @param ruleData contents of a rule file as written by
+        FindFileDialog.serialize (dict)
+    @param withReplace flag indicating to compile the replacement templates
+        (boolean)
+    @param filters additional filters of the replacement templates
+        (dict of functions)
+    @return compiled rules (list of SearchRule)
+    @exception RuleError raised to indicate an invalid rule
+    @exception DaemonError raised to indicate invalid rule file contents
+    """
+    if not isinstance(ruleData, dict) or \
+            not isinstance(ruleData.get('subs', []), list) or \
+            not isinstance(ruleData.get('tables', {}), dict):
+        raise DaemonError("not a rule file")
+    rules = []
+    tables = ruleData.get('tables', {})
+    for data in ruleData.get('subs', []):
+        rule = SearchRule.fromDict(data)
+        if rule.findText:
+            rule.compile(tables, withReplace, filters)
+            rules.append(rule)
+    return rules
+
+
+class SearchService(object):
+    """
+    Class implementing the request handling of the service.
+    """
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.cache = SearchCache()
+        self.__resolvers = {}       # root -> QrcResolver
+
+    def handle(self, command, root, data):
+        """
+        Public method to handle a request.
+
+        @param command name of the command (string)
+        @param root directory of the request (string)
+        @param data data of the request (dict)
+        @return data of the response (dict)
+        @exception DaemonError raised to indicate an invalid request
+        """
+        if command == "search":
+            return self.__search(root, data)
+        elif command == "replace":
+            return self.__replace(root, data)
+        elif command == "stats":
+            return self.cache.stats()
+        elif command == "clear":
+            self.cache.clear()
+            return {}
+        raise DaemonError("unknown command '{0}'".format(command))
+
+    def __job(self, root, data, withReplace):
+        """
+        Private method to create a search job of a request.
+
+        @param root directory to search in (string)
+        @param data data of the request (dict)
+        @param withReplace flag indicating to compute the edits (boolean)
+        @return search job (SearchJob)
+        @exception DaemonError raised to indicate an invalid request
+        """
+        if not os.path.isdir(root):
+            raise DaemonError("not a directory: {0}".format(root))
+        resolver = self.__resolvers.get(root)
+        if resolver is None:
+            resolver = self.__resolvers[root] = QrcResolver(root)
+        else:
+            resolver.invalidate()
+        try:
+            rules = compileRules(data.get("rules", {}), withReplace,
+                                 resolver.filters())
+        except RuleError as err:
+            raise DaemonError("invalid {0} field: {1}".format(
+                err.field, err))
+        return SearchJob(rules, root, withReplace, cache=self.cache,
+                         resources=data.get("resources", False))
+
+    def __jobStats(self, job, response):
+        """
+        Private method to add the statistics of a job to a response.
+
+        @param job finished search job (SearchJob)
+        @param response response to be completed (dict)
+        @return completed response (dict)
+        """
+        response["files"] = job.files
+        response["bytes"] = job.meter.doneBytes
+        response["errors"] = response.get("errors", []) + job.errors
+        return response
+
+    def __search(self, root, data):
+        """
+        Private method to handle a search request.
+
+        @param root directory to search in (string)
+        @param data data of the request with the rule file contents 'rules',
+            the flag 'replace' to compute the edits and the flag 'resources'
+            to search Qt resources as well (dict)
+        @return response with the file name, MD5 hash and matches of the
+            files containing matches as 'results' (dict)
+        """
+        job = self.__job(root, data, data.get("replace", False))
+        results = [result for result in job.results() if result[2]]
+        return self.__jobStats(job, {"results": results})
+
+    def __replace(self, root, data):
+        """
+        Private method to handle a replace request.
+
+        @param root directory to search in (string)
+        @param data data of the request with the rule file contents 'rules'
+            and the flags 'dryRun' and 'resources' (dict)
+        @return response with the number of changed files 'changed', the
+            conflicts as 'conflicts' and for a dry run the diff as 'diff'
+            (dict)
+        """
+        job = self.__job(root, data, True)
+        plan = ReplacePlan()
+        for fileName, hashStr, matches in job.results():
+            plan.addMatches(fileName, matches)
+
+        dryRun = data.get("dryRun", False)
+        if dryRun:
+            stream = io.StringIO()
+            writer = UnifiedDiffWriter(stream, root)
+        changed = 0
+        conflicts = []
+        errors = []
+        for fileName in plan.files():
+            try:
+                if dryRun:
+                    fileChanged, fileConflicts = diffFile(
+                        fileName, plan, writer, self.cache.read)
+                else:
+                    fileChanged, fileConflicts = replaceFile(
+                        fileName, plan, self.cache.read)
+            except (IOError, OSError, LookupError, UnicodeError) as err:
+                errors.append((fileName, str(err)))
+                continue
+            finally:
+                if not dryRun:
+                    self.cache.invalidate(fileName)
+
+            if fileChanged:
+                changed += 1
+            conflicts.extend((fileName, edit.line, reason, edit.old, edit.new)
+                             for reason, edit in fileConflicts)
+
+        response = {"changed": changed, "conflicts": conflicts,
+                    "errors": errors}
+        if dryRun:
+            response["diff"] = stream.getvalue()
+        return self.__jobStats(job, response)
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    """
+    Class implementing the handler of a client connection.
+    """
+    def handle(self):
+        """
+        Public method handling the requests of a connection.
+
+        The clients of a TCP service have to authenticate first.
+        """
+        authenticated = self.server.token is None
+        while True:
+            try:
+                message = receiveMessage(self.request)
+                if message is None:
+                    return
+                command, root, data = message
+            except (DaemonError, ValueError, TypeError):
+                return
+            if not authenticated:
+                if command == "auth" and isinstance(data, dict) and \
+                        hmac.compare_digest(str(data.get("token", "")),
+                                            self.server.token):
+                    authenticated = True
+                    sendMessage(self.request, command, root, {})
+                else:
+                    sendMessage(self.request, "error", root,
+                                "authentication required")
+                    return
+                continue
+            if command == "shutdown":
+                sendMessage(self.request, command, root, {})
+                self.server.stopping = True
+                return
+
+            try:
+                response = self.server.service.handle(command, root, data)
+            except DaemonError as err:
+                sendMessage(self.request, "error", root, str(err))
+            except Exception as err:
+                # a malformed request must not cost the client its answer
+                sendMessage(self.request, "error", root,
+                            "cannot handle request: {0}: {1}".format(
+                                type(err).__name__, err))
+            else:
+                sendMessage(self.request, command, root, response)
+
+
+def serve(address=None):
+    """
+    Function to run the service until a shutdown request is received.
+
+    Requests are handled one after the other, so the caches need no locks.
+
+    @param address path of the Unix socket or tuple of host and port, the
+        default address of the current user if None (string or tuple)
+    """
+    directory = daemonDirectory()
+    if not os.path.isdir(directory):
+        os.makedirs(directory, 0o700)
+    # the mode given to makedirs is subject to the umask
+    os.chmod(directory, 0o700)
+
+    portFile = None
+    token = None
+    if address is None:
+        address = daemonAddress() if hasattr(socket, "AF_UNIX") \
+            else ("127.0.0.1", 0)
+    if isinstance(address, tuple):
+        server = socketserver.TCPServer(address, _RequestHandler)
+        # any local process may connect, only the user may read the token
+        token = binascii.hexlify(os.urandom(32)).decode("ascii")
+        portFile = _portFile()
+        if os.path.exists(portFile):
+            os.remove(portFile)
+        fd = os.open(portFile, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write("{0} {1}\n".format(server.server_address[1], token))
+    else:
+        if os.path.exists(address):
+            os.remove(address)
+        server = socketserver.UnixStreamServer(address, _RequestHandler)
+        os.chmod(address, 0o600)
+
+    server.service = SearchService()
+    server.token = token
+    server.stopping = False
+    try:
+        while not server.stopping:
+            server.handle_request()
+    finally:
+        server.server_close()
+        if isinstance(address, tuple):
+            if portFile is not None:
+                os.remove(portFile)
+        elif os.path.exists(address):
+            os.remove(address)
+
+
+class DaemonClient(object):
+    """
+    Class implementing a client of the service.
+    """
+    def __init__(self, address=None, timeout=None, token=None):
+        """
+        Constructor
+
+        @param address path of the Unix socket or tuple of host and port, the
+            default address of the current user if None (string or tuple)
+        @param timeout timeout of the connection in seconds (float)
+        @param token token authenticating the client of a TCP service, the
+            token of the service of the current user if None (string)
+        @exception DaemonError raised to indicate, that no service is running
+            or that the client was rejected
+        """
+        if address is None:
+            address = daemonAddress()
+        if token is None and isinstance(address, tuple):
+            token = daemonToken()
+        try:
+            if isinstance(address, tuple):
+                self.__connection = socket.create_connection(address,
+                                                             timeout)
+            elif address is not None:
+                self.__connection = socket.socket(socket.AF_UNIX)
+                self.__connection.settimeout(timeout)
+                self.__connection.connect(address)
+            else:
+                raise DaemonError("no search daemon running")
+        except (socket.error, OSError) as err:
+            raise DaemonError("no search daemon running: {0}".format(err))
+
+        if isinstance(address, tuple):
+            try:
+                self.request("auth", "", {"token": token or ""})
+            except DaemonError:
+                self.close()
+                raise
+
+    def request(self, command, root="", data=None):
+        """
+        Public method to send a request and wait for its response.
+
+        @param command name of the command (string)
+        @param root directory of the request (string)
+        @param data data of the request (dict)
+        @return data of the response (dict)
+        @exception DaemonError raised to indicate a failed request
+        """
+        try:
+            sendMessage(self.__connection, command, root, data or {})
+            message = receiveMessage(self.__connection)
+        except (socket.error, OSError) as err:
+            raise DaemonError(str(err))
+        if message is None:
+            raise DaemonError("connection closed by the search daemon")
+
+        responseCommand, root, response = message
+        if responseCommand == "error":
+            raise DaemonError(response)
+        return response
+
+    def close(self):
+        """
+        Public method to close the connection.
+        """
+        self.__connection.close()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing a writer for unified diffs of pending replacements.
+"""
+
+from __future__ import unicode_literals
+
+import os
+import difflib
+
+
+class UnifiedDiffWriter(object):
+    """
+    Class implementing a writer streaming unified diffs to a text stream.
+    
+    The diff is generated file by file, so only the lines of the file being
+    processed are held in memory.
+    """
+    NoNewline = "\\ No newline at end of file\n"
+    
+    def __init__(self, stream, root=None, context=3):
+        """
+        Constructor
+        
+        @param stream text stream to write the diff to (file like object)
+        @param root directory the file names are made relative to (string)
+        @param context number of context lines (integer)
+        """
+        self.__stream = stream
+        self.__root = os.path.abspath(root) if root else None
+        self.__context = context
+        
+        self.files = 0
+        self.additions = 0
+        self.deletions = 0
+    
+    def __displayName(self, fileName):
+        """
+        Private method to get the name of a file as shown in the diff header.
+        
+        @param fileName name of the file (string)
+        @return name relative to the root directory using '/' as the
+            separator (string)
+        """
+        name = fileName
+        if self.__root:
+            try:
+                name = os.path.relpath(os.path.abspath(fileName), self.__root)
+            except ValueError:
+                # different drives on Windows
+                pass
+        return name.replace("\\", "/")
+    
+    def addFile(self, fileName, oldLines, newLines):
+        """
+        Public method to write the diff of one file.
+        
+        @param fileName name of the file (string)
+        @param oldLines original lines including their line ends
+            (list of strings)
+        @param newLines modified lines including their line ends
+            (list of strings)
+        @return number of changed lines (integer)
+        """
+        name = self.__displayName(fileName)
+        changed = 0
+        write = self.__stream.write
+        for index, line in enumerate(difflib.unified_diff(
+                oldLines, newLines, "a/{0}".format(name),
+                "b/{0}".format(name), n=self.__context)):
+            if index < 2 or line.startswith("@@"):
+                # file and hunk headers
+                write(line)
+                continue
+            
+            if line.startswith("+"):
+                self.additions += 1
+                changed += 1
+            elif line.startswith("-"):
+                self.deletions += 1
+                changed += 1
+            
+            if line.endswith(("\n", "\r")):
+                write(line)
+            else:
+                write(line + "\n")
+                write(self.NoNewline)
+        
+        if changed:
+            self.files += 1
+        return changed
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing a background enumeration of the files to be searched.
+"""
+
+from __future__ import unicode_literals
+
+import os
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue   # __IGNORE_WARNING__
+
+from .Resources import resourceFiles
+
+
+class FileEnumerator(threading.Thread):
+    """
+    Class implementing a thread walking a directory tree.
+    
+    The candidate files are handed to the consumer through a queue while
+    the walk is still going on. The number of files and bytes found so far
+    is available through the attributes totalFiles and totalBytes, the
+    attribute finished tells, whether these are final.
+    
+    If requested, the files provided by Qt resources follow the files of
+    the walk. Given a search cache, the directories are listed through it.
+    """
+    def __init__(self, root, filterRes, resources=False, cache=None):
+        """
+        Constructor
+        
+        @param root directory to be searched (string)
+        @param filterRes regular expressions a file name has to match at
+            least one of (list of compiled regular expressions)
+        @param resources flag indicating to add the files of .qrc files
+            outside of the directory tree and the entries of .rcc files
+            (boolean)
+        @param cache cache of directory listings (SearchCache)
+        """
+        super(FileEnumerator, self).__init__()
+        self.daemon = True
+        
+        self.__root = os.path.abspath(root)
+        self.__filterRes = filterRes
+        self.__resources = resources
+        self.__cache = cache
+        self.__queue = queue.Queue()
+        self.__stopped = False
+        
+        self.totalFiles = 0
+        self.totalBytes = 0
+        self.finished = False
+    
+    def __matches(self, name):
+        """
+        Private method to check a file name against the filters.
+        
+        @param name file name without the directory (string)
+        @return flag indicating a candidate file (boolean)
+        """
+        for filterRe in self.__filterRes:
+            if filterRe.match(name):
+                return True
+        return False
+    
+    def run(self):
+        """
+        Public method implementing the thread body.
+        """
+        try:
+            for path, size in self.__walk():
+                if self.__stopped:
+                    return
+                self.totalFiles += 1
+                self.totalBytes += size
+                self.__queue.put((path, size))
+            
+            if self.__resources:
+                for path, size in resourceFiles(self.__root,
+                                                self.__filterRes):
+                    if self.__stopped:
+                        return
+                    self.totalFiles += 1
+                    self.totalBytes += size
+                    self.__queue.put((path, size))
+        finally:
+            self.finished = True
+            self.__queue.put(None)
+    
+    def __walk(self):
+        """
+        Private method to iterate over the candidate files of the tree.
+        
+        @return generator yielding tuples of path and size in bytes
+            (string, integer)
+        """
+        if self.__cache is not None:
+            for item in self.__cache.iterFiles(self.__root, self.__filterRes):
+                yield item
+            return
+        
+        for dirname, _, names in os.walk(self.__root):
+            for name in names:
+                if not self.__matches(name):
+                    continue
+                
+                path = os.path.join(dirname, name)
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    size = 0
+                yield path, size
+    
+    def stop(self):
+        """
+        Public method to stop the walk.
+        """
+        self.__stopped = True
+    
+    def files(self, idle=None, timeout=0.05):
+        """
+        Public method to iterate over the files found.
+        
+        @param idle function called while waiting for the walk (function)
+        @param timeout time to wait for a file before calling idle in
+            seconds (float)
+        @return generator yielding tuples of path and size in bytes
+            (string, integer)
+        """
+        while True:
+            try:
+                item = self.__queue.get(timeout=timeout)
+            except queue.Empty:
+                if idle is not None:
+                    idle()
+                continue
+            
+            if item is None:
+                return
+            yield item
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing Qt free functions to read and write encoded text files.
+
+The encoding of a file is determined once while reading it. The resulting
+verdict is handed to the write function, so changed files are written with
+exactly the codec, byte order mark and line end style they were read with.
+"""
+
+from __future__ import unicode_literals
+
+import os
+import re
+import codecs
+import hashlib
+import shutil
+import tempfile
+
+from codecs import BOM_UTF8, BOM_UTF16_BE, BOM_UTF16_LE, BOM_UTF32_BE, \
+    BOM_UTF32_LE
+
+codingBytes_regexps = [
+    (2, re.compile(br'''coding[:=]\s*([-\w_.]+)''')),
+    (1, re.compile(br'''<\?xml.*\bencoding\s*=\s*['"]([-\w_.]+)['"]\?>''')),
+]
+
+# UTF-32 has to be checked first, its BOMs start with the UTF-16 ones
+_boms = [
+    (BOM_UTF32_LE, 'utf-32-le', 'utf-32'),
+    (BOM_UTF32_BE, 'utf-32-be', 'utf-32'),
+    (BOM_UTF8, 'utf-8', 'utf-8-bom'),
+    (BOM_UTF16_LE, 'utf-16-le', 'utf-16'),
+    (BOM_UTF16_BE, 'utf-16-be', 'utf-16'),
+]
+
+_eol_regexp = re.compile(r"\r\n|\r|\n")
+
+
+class EncodingVerdict(object):
+    """
+    Class implementing the encoding properties of a file as detected when
+    reading it.
+    """
+    __slots__ = ("codec", "bom", "label", "eol", "lossy")
+    
+    def __init__(self, codec, bom=b"", label=None, eol=None, lossy=False):
+        """
+        Constructor
+        
+        @param codec Python codec decoding the file contents (string)
+        @param bom byte order mark preceding the contents (bytes)
+        @param label encoding name as used by Utilities.decode (string)
+        @param eol first line end found in the file or None (string)
+        @param lossy flag indicating a decode dropping undecodable bytes
+            (boolean)
+        """
+        self.codec = codec
+        self.bom = bom
+        self.label = label or codec
+        self.eol = eol
+        self.lossy = lossy
+
+
+def get_codingBytes(text):
+    """
+    Function to get the coding of a bytes text.
+    
+    Only the head of the text is split, the cookie must be in the first two
+    lines anyway.
+    
+    @param text bytes text to inspect (bytes)
+    @return coding string
+    """
+    lines = text[:1024].splitlines()
+    for maxLines, coding_re in codingBytes_regexps:
+        for l in lines[:maxLines]:
+            m = coding_re.search(l)
+            if m:
+                return str(m.group(1), "ascii").lower()
+    return None
+
+
+def detectEol(text):
+    """
+    Function to determine the line end style of a text.
+    
+    @param text text to inspect (string)
+    @return first line end found or None (string)
+    """
+    m = _eol_regexp.search(text)
+    if m:
+        return m.group(0)
+    return None
+
+
+def convertLineEnds(text, eol):
+    """
+    Function to convert the line ends of a text.
+    
+    @param text text to be converted (string)
+    @param eol new line end (string)
+    @return text with converted line ends (string)
+    """
+    if not eol or ("\n" not in text and "\r" not in text):
+        return text
+    return _eol_regexp.sub(eol, text)
+
+
+def decode(data):
+    """
+    Function to decode some byte text into a string.
+    
+    @param data byte text to decode (bytes)
+    @return tuple of decoded text and encoding verdict
+        (string, EncodingVerdict)
+    """
+    for bom, codec, label in _boms:
+        if data.startswith(bom):
+            try:
+                text = str(data[len(bom):], codec)
+                return text, EncodingVerdict(
+                    codec, bom, label, detectEol(text))
+            except UnicodeError:
+                break
+    
+    coding = get_codingBytes(data)
+    if coding:
+        try:
+            text = str(data, coding)
+            return text, EncodingVerdict(coding, eol=detectEol(text))
+        except (UnicodeError, LookupError):
+            pass
+    
+    # Assume UTF-8
+    try:
+        text = str(data, 'utf-8')
+        return text, EncodingVerdict('utf-8', label='utf-8-guessed',
+                                     eol=detectEol(text))
+    except UnicodeError:
+        pass
+    
+    # Assume UTF-8 loosing information
+    text = str(data, 'utf-8', 'ignore')
+    return text, EncodingVerdict('utf-8', label='utf-8-ignore',
+                                 eol=detectEol(text), lossy=True)
+
+
+def readEncodedFile(filename):
+    """
+    Function to read a file, calculate its MD5 hash and decode its contents.
+    
+    @param filename name of the file to read (string)
+    @return tuple of decoded text, encoding verdict and hash value
+        (string, EncodingVerdict, string)
+    """
+    with open(filename, "rb") as f:
+        data = f.read()
+    return decode(data) + (hashlib.md5(data).hexdigest(),)
+
+
+def writeEncodedLines(filename, lines, verdict):
+    """
+    Function to write lines of text with the encoding determined when reading
+    the file.
+    
+    The lines are encoded incrementally into a temporary file next to the
+    target, which replaces the target only after everything was written.
+    Unchanged lines are thus written byte identical to how they were read.
+    
+    @param filename name of the file to write (string)
+    @param lines lines to be written including their line ends
+        (iterable of strings)
+    @param verdict encoding verdict of the file (EncodingVerdict)
+    @exception UnicodeError raised to indicate, that the file was decoded
+        lossy or the text cannot be encoded with the files codec
+    """
+    if verdict.lossy:
+        raise UnicodeError(
+            "'{0}' was not decoded losslessly, refusing to overwrite it"
+            .format(filename))
+    
+    encoder = codecs.getincrementalencoder(verdict.codec)()
+    directory, name = os.path.split(os.path.abspath(filename))
+    fd, tmpName = tempfile.mkstemp(prefix=".{0}.".format(name),
+                                   suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(verdict.bom)
+            for line in lines:
+                f.write(encoder.encode(line))
+            f.write(encoder.encode("", True))
+        if os.path.exists(filename):
+            shutil.copymode(filename, tmpName)
+        os.replace(tmpName, filename)
+    except BaseException:
+        os.remove(tmpName)
+        raise
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing a report of the versions of the QML imports used in a
+directory tree.
+
+Only the import headers of the files are read. The files are scanned in
+process or by a pool of worker processes in batches.
+"""
+
+from __future__ import unicode_literals
+
+import multiprocessing
+
+try:
+    from concurrent.futures import ProcessPoolExecutor, wait, \
+        FIRST_COMPLETED
+except ImportError:
+    ProcessPoolExecutor = None      # Python 2 scans in process only
+
+from .Enumerator import FileEnumerator
+from .QmlImports import scanImports
+from .ResultStore import naturalSortKey
+from .Rules import fileFilterRegExp
+from .Scheduler import TimeSlicer
+
+
+def _scanFile(fileName):
+    """
+    Function to scan the imports of a file.
+
+    @param fileName name of the file (string)
+    @return tuple of file name, the imports as tuples of module, version and
+        line number and an error message, the imports are None for a file,
+        that could not be read (string, list of tuples, string)
+    """
+    try:
+        result = scanImports(fileName)
+    except (IOError, OSError) as err:
+        return fileName, None, str(err)
+    statements = result[0] if result is not None else []
+    return (fileName,
+            [(statement.module, statement.version, statement.line)
+             for statement in statements if statement.isModule()],
+            None)
+
+
+def _scanBatch(fileNames):
+    """
+    Function to scan the imports of a batch of files in a worker process.
+
+    @param fileNames names of the files to be scanned (list of strings)
+    @return results of _scanFile (list of tuples)
+    """
+    return [_scanFile(fileName) for fileName in fileNames]
+
+
+class ImportReport(object):
+    """
+    Class implementing the usage counts of the module versions imported by a
+    set of files.
+    """
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.files = 0
+        self.__usages = {}      # (module, version) -> [(file, line)]
+
+    def addFile(self, fileName, imports):
+        """
+        Public method to add the imports of a file.
+
+        @param fileName name of the file (string)
+        @param imports imports of the file as tuples of module, version and
+            line number (list of tuples)
+        """
+        self.files += 1
+        for module, version, line in imports:
+            self.__usages.setdefault((module, version), []).append(
+                (fileName, line))
+
+    def rows(self, module=None):
+        """
+        Public method to get the aggregated counts.
+
+        @param module name of the module to report, None for all (string)
+        @return tuples of module, version, number of imports and the
+            importing files as tuples of file name and line number sorted
+            by module and version (list of tuples)
+        """
+        keys = sorted((key for key in self.__usages
+                       if module is None or key[0] == module),
+                      key=lambda key: (key[0], naturalSortKey(key[1])))
+        return [(key[0], key[1], len(self.__usages[key]),
+                 sorted(self.__usages[key])) for key in keys]
+
+    def toDict(self, module=None):
+        """
+        Public method to convert the report into a JSON serializable form.
+
+        @param module name of the module to report, None for all (string)
+        @return report with the number of scanned files as 'files' and a
+            list of the used versions as 'imports' (dict)
+        """
+        return {
+            "files": self.files,
+            "imports": [
+                {"module": rowModule, "version": version, "count": count,
+                 "files": [{"file": fileName, "line": line}
+                           for fileName, line in usages]}
+                for rowModule, version, count, usages in self.rows(module)
+            ],
+        }
+
+    def formatTable(self, module=None):
+        """
+        Public method to format the report as a plain text table.
+
+        @param module name of the module to report, None for all (string)
+        @return table with one line per module version (string)
+        """
+        rows = [("MODULE", "VERSION", "IMPORTS", "FILES")]
+        rows.extend((rowModule, version or "-", str(count),
+                     str(len(set(fileName for fileName, line in usages))))
+                    for rowModule, version, count, usages
+                    in self.rows(module))
+        widths = [max(len(row[column]) for row in rows)
+                  for column in range(4)]
+        return "\n".join(
+            "{0:<{4}}  {1:<{5}}  {2:>{6}}  {3:>{7}}".format(
+                *(row + tuple(widths)))
+            for row in rows) + "\n"
+
+
+class ImportReportJob(object):
+    """
+    Class implementing the creation of an import report of a directory tree.
+    """
+    BatchSize = 64
+
+    def __init__(self, root, fileFilter="*.qml", workers=0):
+        """
+        Constructor
+
+        @param root directory to be scanned (string)
+        @param fileFilter file name wildcards separated by ';' (string)
+        @param workers number of worker processes, 0 scans in process
+            (integer)
+        """
+        self.root = root
+        self.fileFilter = fileFilter
+        self.workers = workers if ProcessPoolExecutor is not None else 0
+        self.errors = []
+        self.__cancelled = False
+
+    def cancel(self):
+        """
+        Public method to stop the scan.
+        """
+        self.__cancelled = True
+
+    def isCancelled(self):
+        """
+        Public method to check, if the scan was cancelled.
+
+        @return flag indicating a cancelled scan (boolean)
+        """
+        return self.__cancelled
+
+    def run(self, idle=None):
+        """
+        Public method to scan the directory tree.
+
+        @param idle function called while waiting for files or workers and
+            at least every time slice while files are scanned (function)
+        @return report of the scanned files (ImportReport)
+        """
+        report = ImportReport()
+        # workers keeping up never let the waits run idle
+        slicer = TimeSlicer(idle, checkEvery=1) if idle is not None else None
+        enumerator = FileEnumerator(self.root,
+                                    [fileFilterRegExp(self.fileFilter)])
+        enumerator.start()
+        try:
+            if self.workers > 0:
+                results = self.__parallelResults(enumerator, idle)
+            else:
+                results = (_scanFile(fileName) for fileName, size
+                           in enumerator.files(idle=idle))
+            for fileName, imports, error in results:
+                if self.__cancelled:
+                    break
+                if error is None:
+                    report.addFile(fileName, imports)
+                else:
+                    self.errors.append((fileName, error))
+                if slicer is not None:
+                    slicer.tick()
+        finally:
+            enumerator.stop()
+        return report
+
+    def __parallelResults(self, enumerator, idle):
+        """
+        Private method to scan the files by worker processes.
+
+        @param enumerator started enumerator of the files (FileEnumerator)
+        @param idle function called while waiting for files or workers
+            (function)
+        @return generator yielding the results of _scanFile (tuples)
+        """
+        # the enumerator thread is running already, forking is unsafe
+        executor = ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context("spawn"))
+        pending = set()
+        batch = []
+        try:
+            files = enumerator.files(idle=idle)
+            while not self.__cancelled:
+                item = next(files, None)
+                if item is not None:
+                    batch.append(item[0])
+                    if len(batch) < self.BatchSize:
+                        continue
+                if batch:
+                    pending.add(executor.submit(_scanBatch, batch))
+                    batch = []
+
+                limit = self.workers * 2 if item is not None else 1
+                while len(pending) >= limit and not self.__cancelled:
+                    done = wait(list(pending), timeout=0.05,
+                                return_when=FIRST_COMPLETED)[0]
+                    if not done and idle is not None:
+                        idle()
+                    for future in done:
+                        pending.discard(future)
+                        for result in future.result():
+                            yield result
+                if item is None and not pending:
+                    return
+        finally:
+            for future in pending:
+                future.cancel()
+            # only a cancelled job leaves the running batches behind, the
+            # pool is torn down completely otherwise
+            executor.shutdown(wait=not self.__cancelled)
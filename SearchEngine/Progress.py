@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing a meter for the progress of byte oriented work.
+"""
+
+from __future__ import unicode_literals
+
+import time
+
+
+class ProgressMeter(object):
+    """
+    Class implementing a meter calculating the throughput and the estimated
+    remaining time of work measured in bytes.
+    """
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.__start = time.monotonic()
+        self.doneBytes = 0
+        self.totalBytes = 0
+    
+    def advance(self, size):
+        """
+        Public method to account for processed bytes.
+        
+        @param size number of bytes processed (integer)
+        """
+        self.doneBytes += size
+    
+    def fraction(self, scale=1000):
+        """
+        Public method to get the progress scaled to an integer range.
+        
+        @param scale value representing completion (integer)
+        @return progress between 0 and scale (integer)
+        """
+        if self.totalBytes <= 0:
+            return 0
+        return min(scale, self.doneBytes * scale // self.totalBytes)
+    
+    def throughput(self):
+        """
+        Public method to get the throughput.
+        
+        @return processed bytes per second (float)
+        """
+        elapsed = time.monotonic() - self.__start
+        if elapsed <= 0:
+            return 0.0
+        return self.doneBytes / elapsed
+    
+    def eta(self):
+        """
+        Public method to get the estimated remaining time.
+        
+        @return remaining seconds or None, if it cannot be estimated yet
+            (float)
+        """
+        rate = self.throughput()
+        if rate <= 0:
+            return None
+        return max(0.0, (self.totalBytes - self.doneBytes) / rate)
+    
+    def summary(self):
+        """
+        Public method to format the throughput and remaining time.
+        
+        @return text like '12.3 MB/s, ETA 0:42' (string)
+        """
+        text = "{0:.1f} MB/s".format(self.throughput() / (1024 * 1024))
+        eta = self.eta()
+        if eta is not None:
+            minutes, seconds = divmod(int(eta + 0.5), 60)
+            text += ", ETA {0}:{1:02d}".format(minutes, seconds)
+        return text
@@ -0,0 +1,438 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing a scanner and an index of the import statements of QML
+files and a rewriter of their versions.
+
+Only the header of a file is read, i.e. the lines up to the first line,
+that is not empty, a comment, a pragma or an import. Offsets are byte
+offsets, so a version can be changed without decoding the rest of the file.
+"""
+
+from __future__ import unicode_literals
+
+import os
+import re
+import shutil
+import tempfile
+from codecs import BOM_UTF8
+
+from .Rules import fileFilterRegExp
+
+_ImportRe = re.compile(
+    br'^[ \t]*import[ \t]+'
+    br'(?:(?P<module>[A-Za-z_][\w.]*)'
+    br'(?:[ \t]+(?P<version>\d+(?:\.\d+)?))?'
+    br'|"(?P<path>[^"]*)")'
+    br'(?:[ \t]+as[ \t]+(?P<alias>\w+))?'
+    br'[ \t]*;?[ \t]*(?://.*|/\*.*)?$')
+_PragmaRe = re.compile(br'^[ \t]*pragma[ \t]+\w+')
+
+ChunkSize = 4096
+
+
+class ImportStatement(object):
+    """
+    Class implementing an import statement of a QML file.
+
+    Directory and script imports have the quoted path as module and no
+    version. The version offsets are the position the version would be
+    inserted at, if the statement has no version.
+    """
+    __slots__ = ("module", "version", "alias", "line", "versionStart",
+                 "versionEnd")
+
+    def __init__(self, module, version, alias, line, versionStart,
+                 versionEnd):
+        """
+        Constructor
+
+        @param module name of the module or quoted path (string)
+        @param version version or an empty string (string)
+        @param alias qualifier given by 'as' or an empty string (string)
+        @param line line number starting with 1 (integer)
+        @param versionStart byte offset of the version (integer)
+        @param versionEnd byte offset after the version (integer)
+        """
+        self.module = module
+        self.version = version
+        self.alias = alias
+        self.line = line
+        self.versionStart = versionStart
+        self.versionEnd = versionEnd
+
+    def isModule(self):
+        """
+        Public method to check for a module import.
+
+        @return flag indicating a module import (boolean)
+        """
+        return not self.module.startswith('"')
+
+    def __repr__(self):
+        """
+        Special method to get a printable representation.
+
+        @return representation of the statement (string)
+        """
+        return "ImportStatement({0!r}, {1!r}, line {2})".format(
+            self.module, self.version, self.line)
+
+
+class HeaderScanner(object):
+    """
+    Class implementing a scanner of the header of a QML file.
+    """
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.imports = []
+        self.headerEnd = 0
+        self.header = b""
+        self.__inComment = False
+
+    def scanLine(self, line, number, offset):
+        """
+        Public method to scan a line of the header.
+
+        Lines have to be passed in order starting with the first line.
+
+        @param line line without line end (bytes)
+        @param number line number starting with 1 (integer)
+        @param offset byte offset of the line (integer)
+        @return flag indicating, that the line belongs to the header
+            (boolean)
+        """
+        stripped = line.strip()
+        if self.__inComment:
+            if b"*/" in stripped:
+                self.__inComment = False
+                rest = stripped.split(b"*/", 1)[1].strip()
+                return not rest or rest.startswith(b"//")
+            return True
+
+        if not stripped or stripped.startswith(b"//"):
+            return True
+        if stripped.startswith(b"/*"):
+            if b"*/" not in stripped[2:]:
+                self.__inComment = True
+                return True
+            rest = stripped[2:].split(b"*/", 1)[1].strip()
+            return not rest or rest.startswith(b"//")
+        if _PragmaRe.match(line):
+            return True
+
+        match = _ImportRe.match(line)
+        if match is None:
+            return False
+
+        if match.group("path") is not None:
+            module = '"{0}"'.format(match.group("path").decode("utf-8"))
+            start = end = offset + match.end("path") + 1
+        else:
+            module = match.group("module").decode("ascii")
+            if match.group("version") is not None:
+                start = offset + match.start("version")
+                end = offset + match.end("version")
+            else:
+                start = end = offset + match.end("module")
+        version = (match.group("version") or b"").decode("ascii")
+        alias = (match.group("alias") or b"").decode("ascii")
+        self.imports.append(ImportStatement(module, version, alias, number,
+                                            start, end))
+        if stripped.endswith(b"/*") or (b"/*" in stripped and
+                                        b"*/" not in stripped):
+            self.__inComment = True
+        return True
+
+    def scan(self, stream):
+        """
+        Public method to scan the header of a file.
+
+        The file is read in chunks of ChunkSize bytes until the first line
+        not belonging to the header. The bytes of the header are kept in
+        the attribute 'header'.
+
+        @param stream binary stream positioned at the start of the file
+            (file like object)
+        @return flag indicating a file, that can be scanned, i.e. an ASCII
+            compatible one (boolean)
+        """
+        data = stream.read(ChunkSize)
+        offset = 0
+        if data.startswith(BOM_UTF8):
+            offset = len(BOM_UTF8)
+        elif data[:2] in (b"\xff\xfe", b"\xfe\xff") or b"\x00" in data[:4]:
+            return False
+
+        number = 0
+        while True:
+            newline = data.find(b"\n", offset)
+            if newline < 0:
+                chunk = stream.read(ChunkSize)
+                if chunk:
+                    data += chunk
+                    continue
+                # last line without line end
+                newline = len(data)
+                if offset >= newline:
+                    break
+
+            number += 1
+            line = data[offset:newline].rstrip(b"\r")
+            if not self.scanLine(line, number, offset):
+                break
+            offset = newline + 1
+            self.headerEnd = min(offset, len(data))
+        self.header = data[:self.headerEnd]
+        return True
+
+
+def scanImports(fileName):
+    """
+    Function to scan the import statements of a QML file.
+
+    @param fileName name of the file (string)
+    @return tuple of the import statements and the byte offset of the end
+        of the header, None for files, that cannot be scanned
+        (list of ImportStatement, integer)
+    @exception IOError raised to indicate an unreadable file
+    """
+    scanner = HeaderScanner()
+    with open(fileName, "rb") as f:
+        if not scanner.scan(f):
+            return None
+    return scanner.imports, scanner.headerEnd
+
+
+def readHeader(fileName):
+    """
+    Function to read the header of a QML file.
+
+    @param fileName name of the file (string)
+    @return bytes of the header including a byte order mark, None for
+        files, that cannot be scanned (bytes)
+    @exception IOError raised to indicate an unreadable file
+    """
+    scanner = HeaderScanner()
+    with open(fileName, "rb") as f:
+        if not scanner.scan(f):
+            return None
+    return scanner.header
+
+
+def headerLineCount(lines):
+    """
+    Function to count the header lines of a decoded QML file.
+
+    @param lines lines of the file with or without line ends
+        (list of strings)
+    @return number of lines belonging to the header (integer)
+    """
+    scanner = HeaderScanner()
+    count = 0
+    for line in lines:
+        line = line.rstrip("\r\n").encode("utf-8")
+        if not scanner.scanLine(line, count + 1, 0):
+            break
+        count += 1
+    return count
+
+
+def rewriteImports(fileName, statements, versions):
+    """
+    Function to change the versions of import statements of a file.
+
+    A version of the same length is patched in place. Otherwise the header
+    is written to a temporary file followed by a plain copy of the rest of
+    the file, which then replaces the file.
+
+    @param fileName name of the file (string)
+    @param statements import statements of the file as scanned
+        (list of ImportStatement)
+    @param versions new versions, an empty string removes the version
+        (dict of ImportStatement to string)
+    @return number of changed statements (integer)
+    @exception IOError raised to indicate a file, that could not be changed
+    """
+    edits = [(statement.versionStart, statement.versionEnd,
+              (" " + versions[statement] if not statement.version
+               else versions[statement]).encode("ascii")
+              if versions[statement] else b"")
+             for statement in statements
+             if statement in versions and
+             versions[statement] != statement.version]
+    if not edits:
+        return 0
+    edits.sort()
+
+    # removing a version removes the blank before it as well
+    edits = [(start - 1, end, new)
+             if not new and end > start else (start, end, new)
+             for start, end, new in edits]
+
+    if all(end - start == len(new) for start, end, new in edits):
+        with open(fileName, "r+b") as f:
+            for start, end, new in edits:
+                f.seek(start)
+                f.write(new)
+        return len(edits)
+
+    headerEnd = edits[-1][1]
+    directory, name = os.path.split(os.path.abspath(fileName))
+    with open(fileName, "rb") as source:
+        header = source.read(headerEnd)
+        for start, end, new in reversed(edits):
+            header = header[:start] + new + header[end:]
+        fd, tmpName = tempfile.mkstemp(prefix=".{0}.".format(name),
+                                       suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as target:
+                target.write(header)
+                shutil.copyfileobj(source, target)
+            shutil.copymode(fileName, tmpName)
+            os.replace(tmpName, fileName)
+        except BaseException:
+            os.remove(tmpName)
+            raise
+    return len(edits)
+
+
+class ImportIndex(object):
+    """
+    Class implementing an index of the import statements of the QML files of
+    a directory tree.
+
+    The headers are kept per file together with the modification time and
+    size of the file, an update only scans changed files.
+    """
+    def __init__(self, fileFilter="*.qml"):
+        """
+        Constructor
+
+        @param fileFilter file name wildcards separated by ';' (string)
+        """
+        self.__filterRe = fileFilterRegExp(fileFilter)
+        self.__files = {}       # file name -> (stamp, statements)
+
+    def __stamp(self, fileName):
+        """
+        Private method to get the modification stamp of a file.
+
+        @param fileName name of the file (string)
+        @return modification time and size (tuple)
+        """
+        st = os.stat(fileName)
+        return getattr(st, "st_mtime_ns", st.st_mtime), st.st_size
+
+    def update(self, root, idle=None):
+        """
+        Public method to bring the index up to date with a directory tree.
+
+        @param root directory to be indexed (string)
+        @param idle function called after every directory (function)
+        @return number of files scanned (integer)
+        """
+        scanned = 0
+        seen = set()
+        for dirname, dirs, names in os.walk(os.path.abspath(root)):
+            for name in names:
+                if not self.__filterRe.match(name):
+                    continue
+                fileName = os.path.join(dirname, name)
+                seen.add(fileName)
+                if self.updateFile(fileName):
+                    scanned += 1
+            if idle is not None:
+                idle()
+
+        prefix = os.path.join(os.path.abspath(root), "")
+        for fileName in list(self.__files):
+            if fileName.startswith(prefix) and fileName not in seen:
+                del self.__files[fileName]
+        return scanned
+
+    def updateFile(self, fileName):
+        """
+        Public method to bring the index up to date with a file.
+
+        @param fileName name of the file (string)
+        @return flag indicating, that the file was scanned (boolean)
+        """
+        try:
+            stamp = self.__stamp(fileName)
+            entry = self.__files.get(fileName)
+            if entry is not None and entry[0] == stamp:
+                return False
+            result = scanImports(fileName)
+        except (IOError, OSError):
+            self.__files.pop(fileName, None)
+            return False
+
+        self.__files[fileName] = (stamp, result[0] if result else [])
+        return True
+
+    def statements(self, fileName):
+        """
+        Public method to get the indexed import statements of a file.
+
+        @param fileName name of the file (string)
+        @return import statements (list of ImportStatement)
+        """
+        entry = self.__files.get(fileName)
+        return entry[1] if entry is not None else []
+
+    def entries(self, module=None, version=None):
+        """
+        Public method to query the index.
+
+        @param module name of the module to look for, None for all
+            (string)
+        @param version version to look for, None for all (string)
+        @return generator yielding tuples of module, version, file name and
+            line number sorted by file name (string, string, string,
+            integer)
+        """
+        for fileName in sorted(self.__files):
+            for statement in self.__files[fileName][1]:
+                if (module is None or statement.module == module) and \
+                        (version is None or statement.version == version):
+                    yield (statement.module, statement.version, fileName,
+                           statement.line)
+
+    def setVersion(self, module, newVersion, oldVersion=None):
+        """
+        Public method to change the version of a module in all indexed
+        files.
+
+        Files changed since they were indexed are scanned again before they
+        are changed.
+
+        @param module name of the module (string)
+        @param newVersion new version, an empty string removes the version
+            (string)
+        @param oldVersion version to be changed, None for all (string)
+        @return tuple of the number of changed statements and the files,
+            that could not be changed as tuples of file name and error
+            message (integer, list of tuples)
+        """
+        changed = 0
+        errors = []
+        for fileName in sorted(self.__files):
+            self.updateFile(fileName)
+            versions = dict(
+                (statement, newVersion)
+                for statement in self.statements(fileName)
+                if statement.module == module and statement.isModule() and
+                (oldVersion is None or statement.version == oldVersion))
+            if not versions:
+                continue
+            try:
+                changed += rewriteImports(fileName,
+                                          self.statements(fileName),
+                                          versions)
+            except (IOError, OSError) as err:
+                errors.append((fileName, str(err)))
+            self.updateFile(fileName)
+        return changed, errors
@@ -0,0 +1,801 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing a lightweight tokenizer and outline parser of QML files
+and structural queries against the outlines.
+
+The outline is the tree of the object declarations of a file with their
+ids, property bindings, property declarations, signals and functions.
+JavaScript expressions are skipped, only their text is kept. Outlines are
+cached by the hash of the file contents.
+
+A query is a selector in the style of CSS:
+<dl>
+<dt>Button, Controls.Button, *</dt>
+<dd>objects of a type, a type without qualifier matches qualified types
+    as well, e.g. 'Button' matches 'C.Button'</dd>
+<dt>#name</dt>
+<dd>the object with the id 'name'</dd>
+<dt>[style], [onClicked], [font.bold]</dt>
+<dd>objects binding or declaring a property or signal handler</dd>
+<dt>[text="OK"], [text*=OK], [text^=qsTr], [width~=\\d+]</dt>
+<dd>objects with a property value equal to, containing or starting with a
+    text or matching a regular expression</dd>
+<dt>Row Button, Row > Button</dt>
+<dd>objects inside of or being a direct child of another one</dd>
+</dl>
+"""
+
+from __future__ import unicode_literals
+
+import re
+from collections import OrderedDict
+
+_tokenRe = re.compile(r"""
+    (?P<Newline> \n )
+|   (?P<Space> [ \t\r\f\v]+ )
+|   (?P<LineComment> //[^\n]* )
+|   (?P<BlockComment> /\*.*?(?:\*/|\Z) )
+|   (?P<String>
+        " (?: [^"\\\n] | \\. )* "
+    |   ' (?: [^'\\\n] | \\. )* '
+    |   ` (?: [^`\\] | \\. )* `
+    )
+|   (?P<Name> (?: [^\W\d] | \$ ) [\w$]* )
+|   (?P<Number> \d [\w.]* )
+|   (?P<Punct> [{}\[\]():;,.] )
+|   (?P<Operator> . )
+""", re.VERBOSE | re.DOTALL | re.UNICODE)
+
+_kinds = {
+    "Name": "name",
+    "String": "string",
+    "Number": "number",
+    "Punct": "punct",
+    "Operator": "op",
+}
+
+_modifiers = ("readonly", "default", "required")
+
+
+class QmlTokenizer(object):
+    """
+    Class implementing an incremental tokenizer of QML text.
+
+    Tokens are tuples of kind, text, offset, line number and column. The
+    kinds are 'name', 'string', 'number', 'punct', 'op', 'nl' for line ends
+    and 'eof'. Comments and blanks are dropped, a comment spanning lines
+    gives a line end.
+    """
+    def __init__(self, text):
+        """
+        Constructor
+
+        @param text text to be tokenized (string)
+        """
+        self.__text = text
+        self.__matches = _tokenRe.finditer(text)
+        self.__buffer = []
+        self.__line = 1
+        self.__lineStart = 0
+
+    def __pull(self):
+        """
+        Private method to tokenize the next token.
+
+        @return next token (tuple)
+        """
+        for m in self.__matches:
+            kind = m.lastgroup
+            text = m.group()
+            start = m.start()
+            token = None
+            if kind == "Newline":
+                token = ("nl", text, start, self.__line,
+                         start - self.__lineStart)
+            elif kind in _kinds:
+                token = (_kinds[kind], text, start, self.__line,
+                         start - self.__lineStart)
+            elif kind == "BlockComment" and "\n" in text:
+                token = ("nl", "\n", start, self.__line,
+                         start - self.__lineStart)
+
+            newlines = text.count("\n")
+            if newlines:
+                self.__line += newlines
+                self.__lineStart = start + text.rindex("\n") + 1
+            if token is not None:
+                return token
+        return ("eof", "", len(self.__text), self.__line, 0)
+
+    def peek(self, ahead=0):
+        """
+        Public method to look at a coming token.
+
+        @param ahead number of tokens to skip (integer)
+        @return token (tuple)
+        """
+        while len(self.__buffer) <= ahead:
+            self.__buffer.append(self.__pull())
+        return self.__buffer[ahead]
+
+    def next(self):
+        """
+        Public method to consume the next token.
+
+        @return token (tuple)
+        """
+        if self.__buffer:
+            return self.__buffer.pop(0)
+        return self.__pull()
+
+
+class QmlBinding(object):
+    """
+    Class implementing a property binding or declaration of an object.
+    """
+    __slots__ = ("name", "value", "line", "column", "declaredType")
+
+    def __init__(self, name, value, line, column, declaredType=None):
+        """
+        Constructor
+
+        @param name name of the property, grouped properties are given as
+            'group.name' (string)
+        @param value source text of the value or None for a declaration
+            without value or a property group (string)
+        @param line line number starting with 1 (integer)
+        @param column column of the name starting with 0 (integer)
+        @param declaredType type of a declared property (string)
+        """
+        self.name = name
+        self.value = value
+        self.line = line
+        self.column = column
+        self.declaredType = declaredType
+
+
+class QmlObject(object):
+    """
+    Class implementing an object declaration of an outline.
+    """
+    __slots__ = ("typeName", "id", "line", "column", "offset", "endLine",
+                 "parent", "bindingName", "onTarget", "component",
+                 "bindings", "children", "signals", "functions")
+
+    def __init__(self, typeName, line, column, offset, parent=None,
+                 bindingName=None, onTarget=None):
+        """
+        Constructor
+
+        @param typeName type of the object, possibly qualified (string)
+        @param line line number of the type starting with 1 (integer)
+        @param column column of the type starting with 0 (integer)
+        @param offset offset of the type in the text (integer)
+        @param parent enclosing object (QmlObject)
+        @param bindingName property the object is assigned to (string)
+        @param onTarget property of a value source or interceptor declared
+            by 'Type on property' (string)
+        """
+        self.typeName = typeName
+        self.id = None
+        self.line = line
+        self.column = column
+        self.offset = offset
+        self.endLine = line
+        self.parent = parent
+        self.bindingName = bindingName
+        self.onTarget = onTarget
+        self.component = None
+        self.bindings = OrderedDict()
+        self.children = []
+        self.signals = []
+        self.functions = []
+
+    def __repr__(self):
+        """
+        Special method to get a printable representation.
+
+        @return representation of the object (string)
+        """
+        return "QmlObject({0!r}, line {1})".format(self.typeName, self.line)
+
+
+class QmlOutline(object):
+    """
+    Class implementing the outline of a QML file.
+    """
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.objects = []
+
+    def walk(self):
+        """
+        Public method to iterate over all objects in document order.
+
+        @return generator yielding the objects (QmlObject)
+        """
+        stack = list(reversed(self.objects))
+        while stack:
+            obj = stack.pop()
+            yield obj
+            stack.extend(reversed(obj.children))
+
+
+class _OutlineParser(object):
+    """
+    Class implementing the outline parser.
+    """
+    def __init__(self, text):
+        """
+        Constructor
+
+        @param text text to be parsed (string)
+        """
+        self.__text = text
+        self.__tokens = QmlTokenizer(text)
+
+    def __isPunct(self, token, chars):
+        """
+        Private method to check for a punctuation token.
+
+        @param token token to be checked (tuple)
+        @param chars accepted punctuation characters (string)
+        @return flag indicating one of the characters (boolean)
+        """
+        return token[0] == "punct" and token[1] in chars
+
+    def __qualifiedNameLength(self, ahead=0):
+        """
+        Private method to get the number of tokens of a qualified name.
+
+        @param ahead number of tokens to skip (integer)
+        @return number of tokens, 0 if there is no name (integer)
+        """
+        tokens = self.__tokens
+        if tokens.peek(ahead)[0] != "name":
+            return 0
+        length = 1
+        while self.__isPunct(tokens.peek(ahead + length), ".") and \
+                tokens.peek(ahead + length + 1)[0] == "name":
+            length += 2
+        return length
+
+    def __qualifiedName(self):
+        """
+        Private method to consume a qualified name.
+
+        @return the name (string)
+        """
+        length = self.__qualifiedNameLength()
+        return "".join(self.__tokens.next()[1] for _ in range(length))
+
+    def __objectStart(self, requireType=True):
+        """
+        Private method to check for the start of an object declaration.
+
+        @param requireType flag indicating, that the type has to start with
+            an upper case letter as usual for QML types (boolean)
+        @return flag indicating an object declaration (boolean)
+        """
+        tokens = self.__tokens
+        length = self.__qualifiedNameLength()
+        if not length:
+            return False
+        if requireType:
+            typeName = tokens.peek(length - 1)[1]
+            if not typeName[:1].isupper():
+                return False
+        following = tokens.peek(length)
+        if self.__isPunct(following, "{"):
+            return True
+        if following[0] == "name" and following[1] == "on":
+            targetLength = self.__qualifiedNameLength(length + 1)
+            return targetLength > 0 and self.__isPunct(
+                tokens.peek(length + 1 + targetLength), "{")
+        return False
+
+    def __skipLine(self):
+        """
+        Private method to skip the rest of a line.
+        """
+        while self.__tokens.peek()[0] not in ("nl", "eof"):
+            self.__tokens.next()
+
+    def __skipBalanced(self):
+        """
+        Private method to skip a bracketed part including the brackets.
+        """
+        depth = 0
+        while True:
+            token = self.__tokens.next()
+            if token[0] == "eof":
+                return
+            if self.__isPunct(token, "([{"):
+                depth += 1
+            elif self.__isPunct(token, ")]}"):
+                depth -= 1
+                if depth <= 0:
+                    return
+
+    def __nextSignificant(self):
+        """
+        Private method to look at the next token, that is not a line end.
+
+        @return token (tuple)
+        """
+        ahead = 0
+        while self.__tokens.peek(ahead)[0] == "nl":
+            ahead += 1
+        return self.__tokens.peek(ahead)
+
+    def __skipExpression(self, inArray=False):
+        """
+        Private method to skip a JavaScript expression or block.
+
+        The expression ends at a line end, unless the line ends or the next
+        line starts with an operator, '.' or ':', or at a ';' or an
+        unbalanced '}'.
+
+        @param inArray flag indicating an element of an array, that ends at
+            ',' or ']' as well (boolean)
+        @return offset of the end of the expression (integer)
+        """
+        tokens = self.__tokens
+        depth = 0
+        last = None
+        end = tokens.peek()[2]
+        while True:
+            token = tokens.peek()
+            kind = token[0]
+            if kind == "eof":
+                break
+            if depth == 0:
+                if self.__isPunct(token, ";})]") or \
+                        (inArray and self.__isPunct(token, ",")):
+                    break
+                if kind == "nl" and last is not None and \
+                        last[0] != "op" and not self.__isPunct(last, ".,"):
+                    following = self.__nextSignificant()
+                    if following[0] != "op" and \
+                            not self.__isPunct(following, ".:"):
+                        break
+            if self.__isPunct(token, "([{"):
+                depth += 1
+            elif self.__isPunct(token, ")]}"):
+                depth -= 1
+            tokens.next()
+            if kind != "nl":
+                last = token
+                end = token[2] + len(token[1])
+        return end
+
+    def parse(self):
+        """
+        Public method to parse the text.
+
+        @return outline of the text (QmlOutline)
+        """
+        outline = QmlOutline()
+        tokens = self.__tokens
+        while True:
+            token = tokens.peek()
+            if token[0] == "eof":
+                break
+            if token[0] == "name" and token[1] in ("import", "pragma"):
+                self.__skipLine()
+            elif self.__objectStart(False):
+                outline.objects.append(self.__objectDeclaration(None))
+            else:
+                tokens.next()
+        return outline
+
+    def __objectDeclaration(self, parent, bindingName=None):
+        """
+        Private method to parse an object declaration.
+
+        @param parent enclosing object (QmlObject)
+        @param bindingName property the object is assigned to (string)
+        @return parsed object (QmlObject)
+        """
+        first = self.__tokens.peek()
+        typeName = self.__qualifiedName()
+        onTarget = None
+        if self.__tokens.peek()[1] == "on":
+            self.__tokens.next()
+            onTarget = self.__qualifiedName()
+        self.__tokens.next()        # '{'
+
+        obj = QmlObject(typeName, first[3], first[4], first[2], parent,
+                        bindingName, onTarget)
+        if parent is not None:
+            parent.children.append(obj)
+        self.__members(obj, "")
+        return obj
+
+    def __members(self, obj, prefix):
+        """
+        Private method to parse the members of an object or a property
+        group up to the closing brace.
+
+        @param obj object to be filled (QmlObject)
+        @param prefix prefix of the property names of a group (string)
+        """
+        tokens = self.__tokens
+        while True:
+            token = tokens.peek()
+            kind, text = token[0], token[1]
+            if kind == "eof":
+                return
+            if kind == "nl" or self.__isPunct(token, ";,"):
+                tokens.next()
+                continue
+            if self.__isPunct(token, "}"):
+                tokens.next()
+                obj.endLine = token[3]
+                return
+
+            if kind != "name":
+                self.__skipStatement()
+            elif text == "property" or (
+                    text in _modifiers and tokens.peek(1)[0] == "name"):
+                self.__propertyDeclaration(obj, prefix)
+            elif text == "signal" and tokens.peek(1)[0] == "name":
+                tokens.next()
+                obj.signals.append(tokens.next()[1])
+                if self.__isPunct(tokens.peek(), "("):
+                    self.__skipBalanced()
+            elif text == "function" and tokens.peek(1)[0] == "name":
+                tokens.next()
+                obj.functions.append(tokens.next()[1])
+                while tokens.peek()[0] != "eof" and \
+                        not self.__isPunct(tokens.peek(), "{"):
+                    tokens.next()
+                self.__skipBalanced()
+            elif text == "enum" and tokens.peek(1)[0] == "name" and \
+                    self.__isPunct(tokens.peek(2), "{"):
+                tokens.next()
+                tokens.next()
+                self.__skipBalanced()
+            elif text == "component" and tokens.peek(1)[0] == "name" and \
+                    self.__isPunct(tokens.peek(2), ":"):
+                tokens.next()
+                name = tokens.next()[1]
+                tokens.next()
+                if self.__objectStart(False):
+                    child = self.__objectDeclaration(obj)
+                    child.component = name
+            elif self.__objectStart():
+                self.__objectDeclaration(obj)
+            else:
+                name = prefix + self.__qualifiedName()
+                following = tokens.peek()
+                if self.__isPunct(following, ":"):
+                    tokens.next()
+                    self.__bindingValue(obj, name, token)
+                elif self.__isPunct(following, "{"):
+                    # property group, e.g. 'font { bold: true }'
+                    tokens.next()
+                    obj.bindings[name] = QmlBinding(name, None, token[3],
+                                                    token[4])
+                    self.__members(obj, name + ".")
+                else:
+                    self.__skipStatement()
+
+    def __skipStatement(self):
+        """
+        Private method to skip an unknown statement.
+        """
+        if self.__isPunct(self.__tokens.peek(), "([{"):
+            self.__skipBalanced()
+        else:
+            self.__skipExpression()
+        if self.__isPunct(self.__tokens.peek(), ")]"):
+            self.__tokens.next()
+
+    def __propertyDeclaration(self, obj, prefix):
+        """
+        Private method to parse a property declaration.
+
+        @param obj object declaring the property (QmlObject)
+        @param prefix prefix of the property names of a group (string)
+        """
+        tokens = self.__tokens
+        typeParts = []
+        nameToken = None
+        while True:
+            token = tokens.peek()
+            if token[0] in ("nl", "eof") or self.__isPunct(token, ";}"):
+                break
+            tokens.next()
+            if token[0] == "name" and token[1] not in _modifiers and \
+                    token[1] != "property" and (
+                    tokens.peek()[0] in ("nl", "eof") or
+                    self.__isPunct(tokens.peek(), ":;}")):
+                nameToken = token
+                break
+            if token[1] not in _modifiers and token[1] != "property":
+                typeParts.append(token[1])
+        if nameToken is None:
+            return
+
+        name = prefix + nameToken[1]
+        declaredType = "".join(typeParts) or None
+        if self.__isPunct(tokens.peek(), ":"):
+            tokens.next()
+            self.__bindingValue(obj, name, nameToken, declaredType)
+        else:
+            obj.bindings[name] = QmlBinding(name, None, nameToken[3],
+                                            nameToken[4], declaredType)
+
+    def __bindingValue(self, obj, name, nameToken, declaredType=None):
+        """
+        Private method to parse the value of a property binding.
+
+        @param obj object binding the property (QmlObject)
+        @param name name of the property (string)
+        @param nameToken token of the name (tuple)
+        @param declaredType type of a declared property (string)
+        """
+        tokens = self.__tokens
+        start = tokens.peek()[2]
+        if self.__objectStart():
+            child = self.__objectDeclaration(obj, name)
+            value = child.typeName
+        elif self.__isPunct(tokens.peek(), "["):
+            tokens.next()
+            end = start + 1
+            while True:
+                token = tokens.peek()
+                if token[0] == "eof":
+                    break
+                if token[0] == "nl" or self.__isPunct(token, ","):
+                    tokens.next()
+                elif self.__isPunct(token, "]"):
+                    tokens.next()
+                    end = token[2] + 1
+                    break
+                elif self.__objectStart():
+                    self.__objectDeclaration(obj, name)
+                else:
+                    self.__skipExpression(True)
+                    if self.__isPunct(tokens.peek(), ")}"):
+                        # unbalanced, give up on the array
+                        break
+            value = self.__text[start:end]
+        else:
+            value = self.__text[start:self.__skipExpression()]
+
+        if name == "id":
+            obj.id = value.strip()
+        else:
+            obj.bindings[name] = QmlBinding(name, value.strip(),
+                                            nameToken[3], nameToken[4],
+                                            declaredType)
+
+
+def parseOutline(text):
+    """
+    Function to parse the outline of a QML text.
+
+    @param text text to be parsed (string)
+    @return outline of the text (QmlOutline)
+    """
+    return _OutlineParser(text).parse()
+
+
+MaxOutlineSize = 64 * 1024 * 1024     # characters of the parsed texts
+_outlines = OrderedDict()       # hash of the text -> outline, text length
+_outlineSize = 0
+
+
+def outlineOf(text, hashStr=None):
+    """
+    Function to get the outline of a QML text through the outline cache.
+
+    The cache is bounded by the total length of the parsed texts instead of
+    the number of outlines, so the outlines of a large tree searched in
+    order are kept as well.
+
+    @param text text to be parsed (string)
+    @param hashStr hash of the file contents, the outline isn't cached
+        without one (string)
+    @return outline of the text (QmlOutline)
+    """
+    global _outlineSize
+
+    if hashStr:
+        entry = _outlines.pop(hashStr, None)
+        if entry is not None:
+            _outlines[hashStr] = entry
+            return entry[0]
+
+    outline = parseOutline(text)
+    if hashStr:
+        _outlines[hashStr] = (outline, len(text))
+        _outlineSize += len(text)
+        while _outlineSize > MaxOutlineSize and len(_outlines) > 1:
+            _outlineSize -= _outlines.popitem(last=False)[1][1]
+    return outline
+
+
+_selectorPartRe = re.compile(r"""
+    (?P<Child> > )
+|   (?P<Type> \* | (?: [^\W\d] | \$ ) [\w$.]* )
+|   \# (?P<Id> \w+ )
+|   \[ \s* (?P<Attribute> [^\]\s=~*^]+ ) \s*
+    (?: (?P<Op> [~*^]?= ) \s*
+        (?: " (?P<DQuoted> [^"]* ) " | ' (?P<SQuoted> [^']* ) '
+        |   (?P<Value> [^\]]*? ) ) \s* )?
+    \]
+""", re.VERBOSE | re.UNICODE)
+
+
+class QmlSelector(object):
+    """
+    Class implementing a structural query against outlines.
+    """
+    def __init__(self, text, caseSensitive=True):
+        """
+        Constructor
+
+        @param text selector (string)
+        @param caseSensitive flag indicating to compare property values case
+            sensitive (boolean)
+        @exception ValueError raised to indicate an invalid selector
+        """
+        self.__caseSensitive = caseSensitive
+        self.__steps = []       # tuples of combinator and compound
+        combinator = None
+        compound = None
+        pos = 0
+        text = text.strip()
+        while pos < len(text):
+            if text[pos].isspace():
+                pos += 1
+                if compound is not None and combinator is None:
+                    combinator = " "
+                continue
+
+            m = _selectorPartRe.match(text, pos)
+            if m is None:
+                raise ValueError("invalid selector at '{0}'".format(
+                    text[pos:]))
+            pos = m.end()
+            if m.group("Child"):
+                if compound is None:
+                    raise ValueError("'>' without a parent selector")
+                combinator = ">"
+                continue
+
+            if compound is None or combinator is not None:
+                compound = {"type": None, "id": None, "attributes": []}
+                self.__steps.append((combinator, compound))
+                combinator = None
+            elif m.group("Type"):
+                raise ValueError("misplaced type '{0}'".format(
+                    m.group("Type")))
+
+            if m.group("Type"):
+                compound["type"] = m.group("Type")
+            elif m.group("Id"):
+                compound["id"] = m.group("Id")
+            else:
+                value = m.group("DQuoted")
+                if value is None:
+                    value = m.group("SQuoted")
+                if value is None:
+                    value = m.group("Value")
+                op = m.group("Op")
+                if op == "~=":
+                    try:
+                        value = re.compile(
+                            value, 0 if caseSensitive else re.IGNORECASE)
+                    except re.error as err:
+                        raise ValueError(str(err))
+                elif op and not caseSensitive:
+                    value = value.lower()
+                compound["attributes"].append(
+                    (m.group("Attribute"), op, value))
+
+        if not self.__steps or combinator == ">":
+            raise ValueError("incomplete selector '{0}'".format(text))
+
+    def __matchValue(self, binding, op, value):
+        """
+        Private method to check the value of a binding.
+
+        @param binding binding to be checked (QmlBinding)
+        @param op comparison operator (string)
+        @param value value to compare with (string or compiled regular
+            expression)
+        @return flag indicating a match (boolean)
+        """
+        if op is None:
+            return True
+        if binding.value is None:
+            return False
+        if op == "~=":
+            return value.search(binding.value) is not None
+
+        text = binding.value
+        if not self.__caseSensitive:
+            text = text.lower()
+        if op == "=":
+            return text == value or text[1:-1] == value and \
+                text[:1] in "\"'`" and text[:1] == text[-1:]
+        elif op == "*=":
+            return value in text
+        else:
+            return text.lstrip("\"'`").startswith(value)
+
+    def __matchCompound(self, obj, compound):
+        """
+        Private method to check an object against a compound selector.
+
+        @param obj object to be checked (QmlObject)
+        @param compound compound selector (dict)
+        @return flag indicating a match (boolean)
+        """
+        typeName = compound["type"]
+        if typeName not in (None, "*") and obj.typeName != typeName and \
+                not obj.typeName.endswith("." + typeName):
+            return False
+        if compound["id"] is not None and obj.id != compound["id"]:
+            return False
+
+        for name, op, value in compound["attributes"]:
+            binding = obj.bindings.get(name)
+            if binding is None:
+                if op is None and any(key.startswith(name + ".")
+                                      for key in obj.bindings):
+                    continue
+                return False
+            if not self.__matchValue(binding, op, value):
+                return False
+        return True
+
+    def __matchStep(self, obj, index):
+        """
+        Private method to check an object against the selector up to a
+        step.
+
+        @param obj object to be checked (QmlObject)
+        @param index index of the step (integer)
+        @return flag indicating a match (boolean)
+        """
+        combinator, compound = self.__steps[index]
+        if not self.__matchCompound(obj, compound):
+            return False
+        if index == 0:
+            return True
+
+        parent = obj.parent
+        while parent is not None:
+            if self.__matchStep(parent, index - 1):
+                return True
+            if combinator == ">":
+                return False
+            parent = parent.parent
+        return False
+
+    def matches(self, obj):
+        """
+        Public method to check an object against the selector.
+
+        @param obj object to be checked (QmlObject)
+        @return flag indicating a match (boolean)
+        """
+        return self.__matchStep(obj, len(self.__steps) - 1)
+
+    def find(self, outline):
+        """
+        Public method to find the objects of an outline matching the
+        selector.
+
+        @param outline outline to be searched (QmlOutline)
+        @return matching objects in document order (list of QmlObject)
+        """
+        return [obj for obj in outline.walk() if self.matches(obj)]
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing a resolver of Qt resource URLs to the files listed in
+the resource collection (.qrc) files of a project.
+
+The resolver is offered to replacement templates as the filter 'qrc', e.g.
+the rule 'qrc:/+[^"'\\s)]*' replaced by '${0|qrc}' rewrites every resource
+URL to a file URL in one pass. URLs, that cannot be resolved, are kept.
+"""
+
+from __future__ import unicode_literals
+
+import os
+import posixpath
+import xml.etree.ElementTree as ElementTree
+
+
+def parseQrc(fileName):
+    """
+    Function to parse a resource collection file.
+
+    @param fileName name of the .qrc file (string)
+    @return tuples of resource path and absolute file name
+        (list of tuples)
+    @exception IOError raised to indicate an unreadable file
+    @exception ElementTree.ParseError raised to indicate an invalid file
+    """
+    directory = os.path.dirname(os.path.abspath(fileName))
+    entries = []
+    for resource in ElementTree.parse(fileName).getroot().iter("qresource"):
+        prefix = resource.get("prefix", "/")
+        for element in resource.iter("file"):
+            path = (element.text or "").strip()
+            if not path:
+                continue
+            name = element.get("alias") or path
+            entries.append((
+                posixpath.normpath(posixpath.join("/", prefix, name)),
+                os.path.normpath(os.path.join(directory, path))))
+    return entries
+
+
+def resourcePath(url):
+    """
+    Function to get the resource path of a resource URL.
+
+    @param url URL starting with 'qrc:' or ':/' (string)
+    @return normalized resource path starting with '/' or None for other
+        URLs (string)
+    """
+    if url.startswith("qrc:"):
+        path = url[4:]
+    elif url.startswith(":/"):
+        path = url[1:]
+    else:
+        return None
+    for separator in "?#":
+        path = path.split(separator, 1)[0]
+    return posixpath.normpath("/" + path.lstrip("/"))
+
+
+def urlSuffix(url):
+    """
+    Function to get the query and fragment of an URL.
+
+    @param url URL (string)
+    @return query and fragment including the leading '?' or '#' or an empty
+        string (string)
+    """
+    positions = [pos for pos in (url.find("?"), url.find("#")) if pos >= 0]
+    return url[min(positions):] if positions else ""
+
+
+def fileUrl(fileName):
+    """
+    Function to convert an absolute file name into a file URL.
+
+    @param fileName absolute file name (string)
+    @return file URL (string)
+    """
+    path = fileName.replace("\\", "/")
+    if not path.startswith("/"):
+        # Windows drive letter
+        path = "/" + path
+    return "file://" + path
+
+
+class QrcResolver(object):
+    """
+    Class implementing a resolver of resource URLs of a project.
+
+    The .qrc files are parsed once, the map of resource paths is built again
+    only, if a .qrc file was added, removed or changed. Resource
+    directories are resolved as well, as far as the names of the files in
+    the resources and on disk agree.
+    """
+    def __init__(self, root):
+        """
+        Constructor
+
+        @param root root directory of the project (string)
+        """
+        self.root = os.path.abspath(root)
+        self.__qrcFiles = {}        # file name -> (stamp, entries)
+        self.__files = {}           # resource path -> file name
+        self.__dirs = {}            # resource directory -> directory
+        self.__stale = True
+        self.errors = []
+
+    def setRoot(self, root):
+        """
+        Public method to change the root directory of the project.
+
+        The filters of the resolver stay valid, the map is built for the new
+        directory on the next lookup.
+
+        @param root root directory of the project (string)
+        """
+        root = os.path.abspath(root)
+        if root != self.root:
+            self.root = root
+            self.__qrcFiles = {}
+            self.__files = {}
+            self.__dirs = {}
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        Public method to let the next lookup check the .qrc files for
+        changes.
+        """
+        self.__stale = True
+
+    def update(self):
+        """
+        Public method to bring the map up to date with the .qrc files.
+
+        @return flag indicating, that the map was built again (boolean)
+        """
+        self.__stale = False
+        self.errors = []
+        changed = False
+        seen = set()
+        for dirname, dirs, names in os.walk(self.root):
+            for name in names:
+                if not name.lower().endswith(".qrc"):
+                    continue
+                fileName = os.path.join(dirname, name)
+                seen.add(fileName)
+                try:
+                    st = os.stat(fileName)
+                    stamp = getattr(st, "st_mtime_ns", st.st_mtime), \
+                        st.st_size
+                    entry = self.__qrcFiles.get(fileName)
+                    if entry is not None and entry[0] == stamp:
+                        continue
+                    entries = parseQrc(fileName)
+                except (IOError, OSError, ElementTree.ParseError) as err:
+                    self.errors.append((fileName, str(err)))
+                    entries = []
+                    stamp = None
+                self.__qrcFiles[fileName] = (stamp, entries)
+                changed = True
+
+        for fileName in list(self.__qrcFiles):
+            if fileName not in seen:
+                del self.__qrcFiles[fileName]
+                changed = True
+
+        if changed:
+            self.__buildMap()
+        return changed
+
+    def __buildMap(self):
+        """
+        Private method to build the map of resource paths.
+        """
+        self.__files = {}
+        self.__dirs = {}
+        for fileName in sorted(self.__qrcFiles):
+            for path, target in self.__qrcFiles[fileName][1]:
+                self.__files.setdefault(path, target)
+                # the parents agree as long as the names do
+                path, name = posixpath.split(path)
+                target, targetName = os.path.split(target)
+                while name and name == targetName and path != "/":
+                    self.__dirs.setdefault(path, target)
+                    path, name = posixpath.split(path)
+                    target, targetName = os.path.split(target)
+
+    def resolve(self, url):
+        """
+        Public method to resolve a resource URL.
+
+        @param url resource URL, e.g. 'qrc:/images/icon.png' (string)
+        @return absolute file name or None, if the URL cannot be resolved
+            (string)
+        """
+        if self.__stale:
+            self.update()
+
+        path = resourcePath(url)
+        if path is None:
+            return None
+        if path in self.__files:
+            return self.__files[path]
+
+        rest = []
+        while path != "/":
+            if path in self.__dirs:
+                return os.path.join(self.__dirs[path], *reversed(rest))
+            path, name = posixpath.split(path)
+            rest.append(name)
+        return None
+
+    def toFileUrl(self, url):
+        """
+        Public method to rewrite a resource URL to a file URL.
+
+        The method is a filter of replacement templates.
+
+        @param url resource URL (string)
+        @return file URL keeping the query and fragment of the resource URL
+            or the unchanged URL, if it cannot be resolved (string)
+        """
+        if not url:
+            return url
+        fileName = self.resolve(url)
+        if fileName is None:
+            return url
+        return fileUrl(fileName) + urlSuffix(url)
+
+    def filters(self):
+        """
+        Public method to get the replacement template filters of the
+        resolver.
+
+        @return filters by name (dict of functions)
+        """
+        return {"qrc": self.toFileUrl}
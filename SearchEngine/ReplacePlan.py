@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing a replace plan combining the edits of several rules.
+"""
+
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+
+from .FileIO import convertLineEnds
+
+
+class ReplaceEdit(object):
+    """
+    Class implementing a single replacement inside a line.
+    """
+    __slots__ = ("line", "start", "end", "old", "new")
+    
+    def __init__(self, line, start, end, old, new):
+        """
+        Constructor
+        
+        @param line line number starting with 1 (integer)
+        @param start start position of the replaced text (integer)
+        @param end end position of the replaced text (integer)
+        @param old text expected between start and end (string)
+        @param new replacement text (string)
+        """
+        self.line = line
+        self.start = start
+        self.end = end
+        self.old = old
+        self.new = new
+    
+    def overlaps(self, other):
+        """
+        Public method to check, if two edits of the same line overlap.
+        
+        Two insertions at the same position are considered overlapping
+        because their order would be undefined.
+        
+        @param other edit to check against (ReplaceEdit)
+        @return flag indicating an overlap (boolean)
+        """
+        if self.start == self.end and other.start == other.end:
+            return self.start == other.start
+        return self.start < other.end and other.start < self.end
+    
+    def sameAs(self, other):
+        """
+        Public method to check, if two edits are identical.
+        
+        @param other edit to check against (ReplaceEdit)
+        @return flag indicating identical edits (boolean)
+        """
+        return (self.line, self.start, self.end, self.new) == \
+            (other.line, other.start, other.end, other.new)
+
+
+def spliceLine(line, edits):
+    """
+    Function to apply non-overlapping edits to a line.
+    
+    @param line text of the line (string)
+    @param edits edits to be applied (list of ReplaceEdit)
+    @return modified line (string)
+    """
+    for edit in sorted(edits, key=lambda e: (e.start, e.end), reverse=True):
+        line = line[:edit.start] + edit.new + line[edit.end:]
+    return line
+
+
+class ReplacePlan(object):
+    """
+    Class implementing a replace plan grouping the edits of all rules by file.
+    
+    All edits refer to the file contents as read by the search. They are
+    applied to a file in one pass, so every file has to be read and written
+    only once no matter how many rules changed it.
+    """
+    Overlap = "overlap"
+    Stale = "stale"
+    
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.__edits = OrderedDict()
+    
+    def addEdit(self, fileName, line, start, end, old, new):
+        """
+        Public method to add an edit to the plan.
+        
+        @param fileName name of the file to be changed (string)
+        @param line line number starting with 1 (integer)
+        @param start start position of the replaced text (integer)
+        @param end end position of the replaced text (integer)
+        @param old text expected between start and end (string)
+        @param new replacement text (string)
+        """
+        self.__edits.setdefault(fileName, []).append(
+            ReplaceEdit(line, start, end, old, new))
+    
+    def addLineEdits(self, fileName, line, edits):
+        """
+        Public method to add the edits of a line to the plan.
+        
+        @param fileName name of the file to be changed (string)
+        @param line line number starting with 1 (integer)
+        @param edits tuples of start, end, old and new text
+            (iterable of tuples)
+        """
+        for start, end, old, new in edits:
+            self.addEdit(fileName, line, start, end, old, new)
+    
+    def addMatches(self, fileName, matches):
+        """
+        Public method to add the edits of the matches of a file to the plan.
+        
+        @param fileName name of the file to be changed (string)
+        @param matches tuples of line number, line text, start and end of
+            the first hit and edits as returned by a search (list of tuples)
+        """
+        for line, text, start, end, edits in matches:
+            if edits:
+                self.addLineEdits(fileName, line, edits)
+    
+    def files(self):
+        """
+        Public method to get the names of the files to be changed.
+        
+        @return list of file names in the order they were added
+            (list of strings)
+        """
+        return list(self.__edits.keys())
+    
+    def edits(self, fileName):
+        """
+        Public method to get the edits of a file.
+        
+        @param fileName name of the file (string)
+        @return edits in the order they were added (list of ReplaceEdit)
+        """
+        return self.__edits.get(fileName, [])
+    
+    def serialize(self):
+        """
+        Public method to serialize the plan.
+        
+        @return list of file names with lists of edits given as line, start,
+            end, old and new text (list of [string, list of list])
+        """
+        return [[fileName, [[e.line, e.start, e.end, e.old, e.new]
+                            for e in edits]]
+                for fileName, edits in self.__edits.items()]
+    
+    def deserialize(self, data):
+        """
+        Public method to restore the edits of a serialized plan.
+        
+        @param data serialized plan as returned by serialize (list)
+        @return reference to the plan (ReplacePlan)
+        """
+        for fileName, edits in data:
+            self.__edits[fileName] = [ReplaceEdit(*edit) for edit in edits]
+        return self
+    
+    def __len__(self):
+        """
+        Special method returning the number of files to be changed.
+        
+        @return number of files (integer)
+        """
+        return len(self.__edits)
+    
+    def apply(self, fileName, lines, eol=None):
+        """
+        Public method to apply the edits of a file to its lines.
+        
+        Edits are accepted in the order they were added. An edit overlapping
+        an already accepted one of the same line or not matching the current
+        line contents is rejected and reported.
+        
+        @param fileName name of the file (string)
+        @param lines lines of the file including the line ends
+            (list of strings)
+        @param eol line end of the file used for line ends contained in
+            replacement texts (string)
+        @return tuple of the modified lines and a list of rejected edits
+            given as tuples of reason (Overlap or Stale) and the edit
+            (list of strings, list of tuples of (string, ReplaceEdit))
+        """
+        accepted = OrderedDict()
+        conflicts = []
+        for edit in self.__edits.get(fileName, []):
+            if edit.line < 1 or edit.line > len(lines) or \
+                    lines[edit.line - 1][edit.start:edit.end] != edit.old:
+                conflicts.append((self.Stale, edit))
+                continue
+            
+            lineEdits = accepted.setdefault(edit.line, [])
+            if any(e.sameAs(edit) for e in lineEdits):
+                # the same change requested by several rules
+                continue
+            if any(e.overlaps(edit) for e in lineEdits):
+                conflicts.append((self.Overlap, edit))
+                continue
+            if eol:
+                newText = convertLineEnds(edit.new, eol)
+                if newText != edit.new:
+                    edit = ReplaceEdit(edit.line, edit.start, edit.end,
+                                       edit.old, newText)
+            lineEdits.append(edit)
+        
+        newLines = lines[:]
+        for line, lineEdits in accepted.items():
+            newLines[line - 1] = spliceLine(lines[line - 1], lineEdits)
+        return newLines, conflicts
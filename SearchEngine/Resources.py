@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing the files of Qt resources as a source of files to be
+searched.
+
+Two kinds of resources are provided:
+<ul>
+<li>files listed in resource collection (.qrc) files, which are outside of
+    the searched directory tree</li>
+<li>entries of compiled binary resources (.rcc), which are read directly
+    from the archive without extracting them</li>
+</ul>
+
+An entry of an archive is named by a virtual path, the file name of the
+archive followed by '!' and the resource path, e.g. 'app.rcc!/qml/main.qml'.
+Such entries are read only.
+"""
+
+from __future__ import unicode_literals
+
+import os
+import struct
+import hashlib
+import zlib
+import xml.etree.ElementTree as ElementTree
+
+from . import FileIO
+from .QrcResolver import parseQrc
+
+ArchiveSeparator = "!"
+
+# flags of a tree node of a binary resource
+_Compressed = 0x01
+_Directory = 0x02
+_CompressedZstd = 0x04
+
+# marks the end of the archive name in a virtual path, compared in lower case
+_ArchiveMarker = ".rcc" + ArchiveSeparator + "/"
+
+
+def isResourcePath(path):
+    """
+    Function to check for the virtual path of an archive entry.
+
+    @param path file name or virtual path (string)
+    @return flag indicating a virtual path (boolean)
+    """
+    return _ArchiveMarker in path.lower()
+
+
+def checkWritable(path):
+    """
+    Function to refuse changing an archive entry.
+
+    @param path file name or virtual path (string)
+    @exception IOError raised to indicate a virtual path
+    """
+    if isResourcePath(path):
+        raise IOError("read only resource: {0}".format(path))
+
+
+def splitResourcePath(path):
+    """
+    Function to split the virtual path of an archive entry.
+
+    @param path virtual path (string)
+    @return tuple of the file name of the archive and the resource path
+        (string, string)
+    """
+    index = path.lower().index(_ArchiveMarker) + 4
+    return path[:index], path[index + 1:]
+
+
+class RccArchive(object):
+    """
+    Class implementing a reader of compiled binary resources.
+
+    The archive is read into memory once, the entries are decompressed when
+    read.
+    """
+    def __init__(self, fileName):
+        """
+        Constructor
+
+        @param fileName name of the .rcc file (string)
+        @exception IOError raised to indicate an unreadable or invalid file
+        """
+        with open(fileName, "rb") as f:
+            self.__data = f.read()
+        self.fileName = fileName
+
+        data = self.__data
+        if data[:4] != b"qres" or len(data) < 20:
+            raise IOError("not a binary Qt resource file: {0}".format(
+                fileName))
+        (self.version, self.__treeOffset, self.__dataOffset,
+         self.__namesOffset) = struct.unpack(">iiii", data[4:20])
+        if self.version < 1 or self.version > 3:
+            raise IOError("unsupported resource version {0}: {1}".format(
+                self.version, fileName))
+        self.__nodeSize = 14 if self.version == 1 else 22
+
+        self.__entries = {}         # resource path -> (flags, data offset)
+        try:
+            self.__readDirectory(0, "")
+        except (struct.error, IndexError, UnicodeError):
+            raise IOError("corrupted binary Qt resource file: {0}".format(
+                fileName))
+
+    def __name(self, offset):
+        """
+        Private method to read a name of the names table.
+
+        @param offset offset of the name in the names table (integer)
+        @return name (string)
+        """
+        start = self.__namesOffset + offset
+        length = struct.unpack(">H", self.__data[start:start + 2])[0]
+        start += 6          # length and hash
+        return self.__data[start:start + 2 * length].decode("utf-16-be")
+
+    def __readDirectory(self, node, path):
+        """
+        Private method to collect the entries of a directory node.
+
+        @param node index of the directory node (integer)
+        @param path resource path of the directory (string)
+        """
+        start = self.__treeOffset + node * self.__nodeSize
+        count, first = struct.unpack(">ii",
+                                     self.__data[start + 6:start + 14])
+        for child in range(first, first + count):
+            start = self.__treeOffset + child * self.__nodeSize
+            nameOffset, flags = struct.unpack(">iH",
+                                              self.__data[start:start + 6])
+            childPath = path + "/" + self.__name(nameOffset)
+            if flags & _Directory:
+                self.__readDirectory(child, childPath)
+            else:
+                dataOffset = struct.unpack(
+                    ">i", self.__data[start + 10:start + 14])[0]
+                self.__entries[childPath] = (flags, dataOffset)
+
+    def entries(self):
+        """
+        Public method to get the entries of the archive.
+
+        @return resource paths of the files sorted by path (list of strings)
+        """
+        return sorted(self.__entries)
+
+    def size(self, path):
+        """
+        Public method to get the stored size of an entry.
+
+        @param path resource path of the entry (string)
+        @return size of the possibly compressed data in bytes (integer)
+        @exception IOError raised to indicate a missing entry
+        """
+        if path not in self.__entries:
+            raise IOError("no resource {0} in {1}".format(
+                path, self.fileName))
+        start = self.__dataOffset + self.__entries[path][1]
+        return struct.unpack(">I", self.__data[start:start + 4])[0]
+
+    def read(self, path):
+        """
+        Public method to read an entry.
+
+        @param path resource path of the entry (string)
+        @return uncompressed contents of the entry (bytes)
+        @exception IOError raised to indicate a missing or unreadable entry
+        """
+        size = self.size(path)
+        flags = self.__entries[path][0]
+        start = self.__dataOffset + self.__entries[path][1] + 4
+        data = self.__data[start:start + size]
+        if flags & _CompressedZstd:
+            raise IOError("zstd compressed resource not supported:"
+                          " {0}".format(path))
+        if flags & _Compressed:
+            # qCompress: big endian length followed by a zlib stream
+            try:
+                data = zlib.decompress(data[4:])
+            except zlib.error as err:
+                raise IOError("corrupted resource {0}: {1}".format(
+                    path, err))
+        return data
+
+
+# archives of the process by file name, validated by their stamp
+_archives = {}
+
+
+def openArchive(fileName):
+    """
+    Function to get the reader of an archive.
+
+    Readers are kept while the archive is unchanged.
+
+    @param fileName name of the .rcc file (string)
+    @return reader of the archive (RccArchive)
+    @exception IOError raised to indicate an unreadable or invalid file
+    """
+    st = os.stat(fileName)
+    stamp = getattr(st, "st_mtime_ns", st.st_mtime), st.st_size
+    entry = _archives.get(fileName)
+    if entry is None or entry[0] != stamp:
+        entry = _archives[fileName] = (stamp, RccArchive(fileName))
+    return entry[1]
+
+
+def readResource(path):
+    """
+    Function to read, decode and hash an archive entry.
+
+    It is a replacement of FileIO.readEncodedFile for virtual paths.
+
+    @param path virtual path of the entry (string)
+    @return tuple of decoded text, encoding verdict and hash value
+        (string, EncodingVerdict, string)
+    @exception IOError raised to indicate an unreadable entry
+    """
+    fileName, resource = splitResourcePath(path)
+    data = openArchive(fileName).read(resource)
+    return FileIO.decode(data) + (hashlib.md5(data).hexdigest(),)
+
+
+def resourceFiles(root, filterRes, qrc=True, rcc=True):
+    """
+    Function to list the files provided by the resources of a directory
+    tree.
+
+    Files listed by .qrc files are only given, if they are outside of the
+    directory tree, the others are found by the walk of the tree anyway.
+
+    @param root directory to be searched (string)
+    @param filterRes regular expressions a file name has to match at
+        least one of (list of compiled regular expressions)
+    @param qrc flag indicating to list the files of .qrc files (boolean)
+    @param rcc flag indicating to list the entries of .rcc files (boolean)
+    @return generator yielding tuples of path or virtual path and size in
+        bytes (string, integer)
+    """
+    def matches(name):
+        for filterRe in filterRes:
+            if filterRe.match(name):
+                return True
+        return False
+
+    root = os.path.abspath(root)
+    prefix = os.path.join(root, "")
+    seen = set()
+    for dirname, dirs, names in os.walk(root):
+        for name in sorted(names):
+            fileName = os.path.join(dirname, name)
+            lowerName = name.lower()
+            if qrc and lowerName.endswith(".qrc"):
+                try:
+                    targets = parseQrc(fileName)
+                except (IOError, OSError, ElementTree.ParseError):
+                    continue
+                for resource, target in targets:
+                    if target.startswith(prefix) or target in seen or \
+                            not matches(os.path.basename(target)):
+                        continue
+                    seen.add(target)
+                    try:
+                        yield target, os.path.getsize(target)
+                    except OSError:
+                        continue
+            elif rcc and lowerName.endswith(".rcc"):
+                try:
+                    archive = openArchive(fileName)
+                except (IOError, OSError):
+                    continue
+                for resource in archive.entries():
+                    if matches(resource.rsplit("/", 1)[-1]):
+                        yield (fileName + ArchiveSeparator + resource,
+                               archive.size(resource))
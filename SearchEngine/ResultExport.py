@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing streaming export and import of search results.
+
+Two formats are supported, JSON Lines with one object per match and CSV
+with a header row. Both contain the fields listed in Fields, the edits are
+stored as a JSON encoded list in CSV files.
+"""
+
+from __future__ import unicode_literals
+
+import csv
+import json
+
+Fields = ["file", "line", "start", "end", "text", "replacement", "md5",
+          "edits"]
+
+JsonLines = "jsonl"
+Csv = "csv"
+
+
+def formatForFile(fileName):
+    """
+    Function to determine the export format from a file name.
+
+    @param fileName name of the file (string)
+    @return format (JsonLines or Csv)
+    """
+    if fileName.lower().endswith(".csv"):
+        return Csv
+    return JsonLines
+
+
+def iterRecords(store):
+    """
+    Function to iterate over the matches of a result store as records.
+
+    @param store result store (ResultStore)
+    @return generator yielding a list of values per match in the order
+        of Fields (list)
+    """
+    for fileNo in range(store.fileCount()):
+        path = store.filePath(fileNo)
+        md5 = store.fileMd5(fileNo)
+        for matchNo in store.matchNumbers(fileNo):
+            yield [path, store.line(matchNo), store.start(matchNo),
+                   store.end(matchNo), store.lineText(matchNo),
+                   store.replacedText(matchNo) if store.edits(matchNo)
+                   else "",
+                   md5, [list(edit) for edit in store.edits(matchNo)]]
+
+
+class ResultWriter(object):
+    """
+    Class implementing a writer streaming matches to a text stream.
+
+    The CSV header row is written by the constructor, so the matches of a
+    search may be written file by file as they are found.
+    """
+    def __init__(self, stream, fmt=JsonLines):
+        """
+        Constructor
+
+        @param stream text stream to write to, opened with newline=''
+            for CSV (file like object)
+        @param fmt export format (JsonLines or Csv)
+        """
+        self.__fmt = fmt
+        if fmt == Csv:
+            self.__csvWriter = csv.writer(stream)
+            self.__csvWriter.writerow(Fields)
+        else:
+            self.__write = stream.write
+
+    def writeStore(self, store):
+        """
+        Public method to write the matches of a result store.
+
+        @param store result store (ResultStore)
+        @return number of written matches (integer)
+        """
+        count = 0
+        if self.__fmt == Csv:
+            for record in iterRecords(store):
+                record[-1] = json.dumps(record[-1])
+                self.__csvWriter.writerow(record)
+                count += 1
+        else:
+            for record in iterRecords(store):
+                self.__write(json.dumps(dict(zip(Fields, record))))
+                self.__write("\n")
+                count += 1
+        return count
+
+
+def exportResults(store, stream, fmt=JsonLines):
+    """
+    Function to write the matches of a result store to a text stream.
+
+    The records are written one by one, the export is never assembled in
+    memory.
+
+    @param store result store (ResultStore)
+    @param stream text stream to write to, opened with newline=''
+        for CSV (file like object)
+    @param fmt export format (JsonLines or Csv)
+    @return number of exported matches (integer)
+    """
+    return ResultWriter(stream, fmt).writeStore(store)
+
+
+def _readRecords(stream, fmt):
+    """
+    Private function to read the records of an export.
+
+    @param stream text stream to read from (file like object)
+    @param fmt export format (JsonLines or Csv)
+    @return generator yielding a dictionary per match (dict)
+    @exception ValueError raised to indicate an invalid record
+    """
+    if fmt == Csv:
+        for row in csv.DictReader(stream):
+            row["edits"] = json.loads(row.get("edits") or "[]")
+            yield row
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def importResults(stream, fmt=JsonLines):
+    """
+    Function to read exported matches grouped by file.
+
+    Records of a file have to be consecutive as written by exportResults.
+
+    @param stream text stream to read from (file like object)
+    @param fmt export format (JsonLines or Csv)
+    @return generator yielding tuples of file name, MD5 hash and the
+        matches in the format of ResultStore.addFile
+        (string, string, list of tuples)
+    @exception ValueError raised to indicate an invalid record
+    """
+    path = None
+    md5 = ""
+    matches = []
+    for record in _readRecords(stream, fmt):
+        try:
+            match = (int(record["line"]), record["text"],
+                     int(record["start"]), int(record["end"]),
+                     tuple((int(s), int(e), old, new)
+                           for s, e, old, new in record.get("edits") or []))
+            recordPath = record["file"]
+        except (KeyError, TypeError) as err:
+            raise ValueError("Invalid result record: {0}".format(err))
+        
+        if recordPath != path:
+            if matches:
+                yield path, md5, matches
+            path = recordPath
+            md5 = record.get("md5", "")
+            matches = []
+        matches.append(match)
+    
+    if matches:
+        yield path, md5, matches
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing a filter over the matches of a result store.
+"""
+
+from __future__ import unicode_literals
+
+import re
+from array import array
+
+_TermRe = re.compile(r'(re:|path:)?("[^"]*"?|\S+)')
+
+
+class ResultFilter(object):
+    """
+    Class implementing a filter for search results.
+
+    A filter text consists of terms separated by white space, all terms have
+    to match. A plain term is searched case insensitively in the line text,
+    a "re:" term is a regular expression searched in the line text and a
+    "path:" term is searched case insensitively in the file name. Terms
+    containing white space may be given in double quotes.
+    """
+    Text = "text"
+    RegExp = "re"
+    Path = "path"
+
+    def __init__(self, filterText):
+        """
+        Constructor
+
+        @param filterText text of the filter (string)
+        @exception ValueError raised to indicate an invalid regular expression
+        """
+        self.__terms = []
+        for prefix, value in _TermRe.findall(filterText):
+            if value.startswith('"'):
+                value = value[1:-1] if value.endswith('"') and \
+                    len(value) > 1 else value[1:]
+            if not value:
+                continue
+
+            if prefix == "re:":
+                try:
+                    self.__terms.append((self.RegExp, value,
+                                         re.compile(value).search))
+                except re.error as err:
+                    raise ValueError(str(err))
+            elif prefix == "path:":
+                value = value.lower().replace("\\", "/")
+                self.__terms.append((self.Path, value, None))
+            else:
+                self.__terms.append((self.Text, value.lower(), None))
+
+    def isEmpty(self):
+        """
+        Public method to check for a filter without terms.
+
+        @return flag indicating an empty filter (boolean)
+        """
+        return not self.__terms
+
+    def terms(self):
+        """
+        Public method to get the terms of the filter.
+
+        @return tuples of kind and value (list of tuples of two strings)
+        """
+        return [(kind, value) for kind, value, search in self.__terms]
+
+    def narrows(self, other):
+        """
+        Public method to check, if the matches of this filter are a subset of
+        the matches of another filter.
+
+        This is the case, if every term of the other filter is repeated or
+        extended by a term of this one. Regular expressions only count, if
+        they are identical.
+
+        @param other filter to compare with (ResultFilter)
+        @return flag indicating a narrower filter (boolean)
+        """
+        if other is None:
+            return False
+
+        ownTerms = self.terms()
+        for kind, value in other.terms():
+            for ownKind, ownValue in ownTerms:
+                if ownKind == kind and (
+                    ownValue == value or
+                        (kind != self.RegExp and value in ownValue)):
+                    break
+            else:
+                return False
+        return True
+
+    def matchFile(self, store, fileNo, candidates=None):
+        """
+        Public method to filter the matches of a file.
+
+        @param store result store (ResultStore)
+        @param fileNo number of the file (integer)
+        @param candidates match numbers to be checked or None for all
+            matches of the file (sequence of integers)
+        @return numbers of the matches passing the filter (array of integers)
+        """
+        result = array('l')
+        path = store.filePath(fileNo).lower().replace("\\", "/")
+        textTerms = []
+        for kind, value, search in self.__terms:
+            if kind == self.Path:
+                if value not in path:
+                    return result
+            else:
+                textTerms.append((value, search))
+
+        if candidates is None:
+            candidates = store.matchNumbers(fileNo)
+        if not textTerms:
+            result.extend(candidates)
+            return result
+
+        for matchNo in candidates:
+            text = store.lineText(matchNo)
+            lowerText = None
+            for value, search in textTerms:
+                if search is not None:
+                    if not search(text):
+                        break
+                else:
+                    if lowerText is None:
+                        lowerText = text.lower()
+                    if value not in lowerText:
+                        break
+            else:
+                result.append(matchNo)
+        return result
+
+    def apply(self, store, candidates, cancelled=None):
+        """
+        Public method to filter the matches of several files.
+
+        @param store result store (ResultStore)
+        @param candidates tuples of file number and the match numbers to be
+            checked or None for all matches of the file (iterable of tuples)
+        @param cancelled function returning True to stop filtering
+            (function)
+        @return tuples of file number and numbers of the matches passing the
+            filter, None if filtering was cancelled
+            (list of tuples of integer and array of integers)
+        """
+        result = []
+        for fileNo, matchNos in candidates:
+            if cancelled is not None and cancelled():
+                return None
+            matchNos = self.matchFile(store, fileNo, matchNos)
+            if matchNos:
+                result.append((fileNo, matchNos))
+        return result
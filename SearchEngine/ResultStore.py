@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing a compact store for search results.
+"""
+
+from __future__ import unicode_literals
+
+import re
+import sys
+from array import array
+
+try:
+    intern = sys.intern
+except AttributeError:
+    pass    # Python 2 has a builtin intern
+
+MaxTextLength = 1024
+
+
+def truncateText(text):
+    """
+    Function to shorten an overlong line for display.
+
+    @param text text to be shortened (string)
+    @return shortened text (string)
+    """
+    if len(text) > MaxTextLength:
+        return "{0} ...".format(text[:MaxTextLength])
+    return text
+
+
+_DigitsRe = re.compile(r'(\d+)')
+
+
+def naturalSortKey(text):
+    """
+    Function to get a key sorting numbers in a text by their value.
+
+    "file2" is sorted before "file10" by this key, letters are compared case
+    insensitively.
+
+    @param text text to get the key for (string)
+    @return sort key (list)
+    """
+    parts = _DigitsRe.split(text.lower())
+    # the parts alternate between text and digits starting with text
+    parts[1::2] = [int(part) for part in parts[1::2]]
+    return parts
+
+
+def pathSortKey(path):
+    """
+    Function to get a key sorting file names naturally by their components.
+
+    @param path file name (string)
+    @return sort key (list of lists)
+    """
+    return [naturalSortKey(part)
+            for part in path.replace("\\", "/").split("/")]
+
+
+class ResultStore(object):
+    """
+    Class implementing a column oriented store of search results.
+
+    Matches are stored in arrays indexed by a match number, the matches of a
+    file occupy a contiguous range. The file name is stored once per file.
+    A match has a line number, the start and end of the first hit, the text
+    of the line (without line end, limited to MaxTextLength characters) and
+    the edits of the line as a tuple of (start, end, old, new) tuples.
+    """
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.clear()
+
+    def clear(self):
+        """
+        Public method to remove all results.
+        """
+        # file columns
+        self.__paths = []
+        self.__md5s = []
+        self.__firsts = array('l')
+        self.__counts = array('l')
+        self.__checkedCounts = array('l')
+
+        # match columns
+        self.__lines = array('l')
+        self.__starts = array('l')
+        self.__ends = array('l')
+        self.__texts = []
+        self.__edits = []
+        self.__checked = bytearray()
+
+    def addFile(self, path, md5, matches):
+        """
+        Public method to add the matches of a file.
+
+        @param path name of the file (string)
+        @param md5 MD5 hash of the file (string)
+        @param matches tuples of line number, line text, start and end of
+            the first hit and edits given as tuples of start, end, old and
+            new text (list of tuples)
+        @return number of the file (integer)
+        """
+        fileNo = len(self.__paths)
+        self.__paths.append(intern(path))
+        self.__md5s.append(md5)
+        self.__firsts.append(len(self.__lines))
+        self.__counts.append(len(matches))
+        self.__checkedCounts.append(len(matches))
+
+        for line, text, start, end, edits in sorted(matches,
+                                                    key=lambda m: m[0]):
+            self.__lines.append(line)
+            self.__starts.append(start)
+            self.__ends.append(end)
+            self.__texts.append(text[:MaxTextLength + 1])
+            self.__edits.append(tuple(
+                (s, e, old, intern(new) if len(new) < 32 else new)
+                for s, e, old, new in edits) if edits else ())
+        self.__checked.extend(b"\x01" * len(matches))
+        return fileNo
+
+    def columns(self):
+        """
+        Public method to get the columns of the store, e.g. to save them.
+
+        @return dictionary with the lists of the file names and hashes and
+            the match counts of the files, the line numbers, starts, ends,
+            texts, edits and check states of the matches (dict)
+        """
+        return {
+            "paths": self.__paths,
+            "md5s": self.__md5s,
+            "counts": self.__counts,
+            "lines": self.__lines,
+            "starts": self.__starts,
+            "ends": self.__ends,
+            "texts": self.__texts,
+            "edits": self.__edits,
+            "checked": self.__checked,
+        }
+
+    @classmethod
+    def fromColumns(cls, columns):
+        """
+        Class method to create a store of columns saved before.
+
+        The texts and edits may be given by any sequences, e.g. ones reading
+        their items on demand. No files can be added to such a store until
+        it is cleared.
+
+        @param columns columns as returned by columns() (dict)
+        @return created store (ResultStore)
+        """
+        store = cls()
+        store.__paths = [intern(path) for path in columns["paths"]]
+        store.__md5s = list(columns["md5s"])
+        store.__counts = array('l', columns["counts"])
+        store.__lines = array('l', columns["lines"])
+        store.__starts = array('l', columns["starts"])
+        store.__ends = array('l', columns["ends"])
+        store.__texts = columns["texts"]
+        store.__edits = columns["edits"]
+        store.__checked = bytearray(columns["checked"])
+
+        first = 0
+        for count in store.__counts:
+            store.__firsts.append(first)
+            store.__checkedCounts.append(
+                store.__checked[first:first + count].count(b"\x01"))
+            first += count
+        return store
+
+    def fileCount(self):
+        """
+        Public method to get the number of files.
+
+        @return number of files (integer)
+        """
+        return len(self.__paths)
+
+    def matchCount(self):
+        """
+        Public method to get the number of matches.
+
+        @return number of matches (integer)
+        """
+        return len(self.__lines)
+
+    def filePath(self, fileNo):
+        """
+        Public method to get the name of a file.
+
+        @param fileNo number of the file (integer)
+        @return file name (string)
+        """
+        return self.__paths[fileNo]
+
+    def fileMd5(self, fileNo):
+        """
+        Public method to get the hash of a file.
+
+        @param fileNo number of the file (integer)
+        @return MD5 hash (string)
+        """
+        return self.__md5s[fileNo]
+
+    def fileMatchCount(self, fileNo):
+        """
+        Public method to get the number of matches of a file.
+
+        @param fileNo number of the file (integer)
+        @return number of matches (integer)
+        """
+        return self.__counts[fileNo]
+
+    def matchNumber(self, fileNo, row):
+        """
+        Public method to get the number of a match of a file.
+
+        @param fileNo number of the file (integer)
+        @param row index of the match within the file (integer)
+        @return match number (integer)
+        """
+        return self.__firsts[fileNo] + row
+
+    def matchNumbers(self, fileNo):
+        """
+        Public method to get the numbers of all matches of a file.
+
+        @param fileNo number of the file (integer)
+        @return range of match numbers (range)
+        """
+        first = self.__firsts[fileNo]
+        return range(first, first + self.__counts[fileNo])
+
+    def line(self, matchNo):
+        """
+        Public method to get the line number of a match.
+
+        @param matchNo number of the match (integer)
+        @return line number (integer)
+        """
+        return self.__lines[matchNo]
+
+    def start(self, matchNo):
+        """
+        Public method to get the start of the first hit of a match.
+
+        @param matchNo number of the match (integer)
+        @return start position (integer)
+        """
+        return self.__starts[matchNo]
+
+    def end(self, matchNo):
+        """
+        Public method to get the end of the first hit of a match.
+
+        @param matchNo number of the match (integer)
+        @return end position (integer)
+        """
+        return self.__ends[matchNo]
+
+    def text(self, matchNo):
+        """
+        Public method to get the line text of a match.
+
+        @param matchNo number of the match (integer)
+        @return text of the line shortened for display (string)
+        """
+        return truncateText(self.__texts[matchNo])
+
+    def lineText(self, matchNo):
+        """
+        Public method to get the line text of a match as stored.
+
+        @param matchNo number of the match (integer)
+        @return text of the line limited to MaxTextLength + 1 characters
+            (string)
+        """
+        return self.__texts[matchNo]
+
+    def edits(self, matchNo):
+        """
+        Public method to get the edits of a match.
+
+        @param matchNo number of the match (integer)
+        @return tuples of start, end, old and new text (tuple of tuples)
+        """
+        return self.__edits[matchNo]
+
+    def replacedText(self, matchNo):
+        """
+        Public method to get the line text of a match with the edits
+        applied.
+
+        @param matchNo number of the match (integer)
+        @return modified text of the line shortened for display (string)
+        """
+        text = self.__texts[matchNo]
+        for start, end, old, new in sorted(self.__edits[matchNo],
+                                           reverse=True):
+            if start <= len(text):
+                text = text[:start] + new + text[end:]
+        return truncateText(text)
+
+    def isChecked(self, matchNo):
+        """
+        Public method to get the check state of a match.
+
+        @param matchNo number of the match (integer)
+        @return flag indicating a checked match (boolean)
+        """
+        return bool(self.__checked[matchNo])
+
+    def checkedCount(self, fileNo):
+        """
+        Public method to get the number of checked matches of a file.
+
+        @param fileNo number of the file (integer)
+        @return number of checked matches (integer)
+        """
+        return self.__checkedCounts[fileNo]
+
+    def setChecked(self, fileNo, matchNo, checked):
+        """
+        Public method to set the check state of a match.
+
+        @param fileNo number of the file of the match (integer)
+        @param matchNo number of the match (integer)
+        @param checked flag indicating a checked match (boolean)
+        """
+        value = 1 if checked else 0
+        if self.__checked[matchNo] != value:
+            self.__checked[matchNo] = value
+            self.__checkedCounts[fileNo] += 1 if value else -1
+
+    def setFileChecked(self, fileNo, checked):
+        """
+        Public method to set the check state of all matches of a file.
+
+        @param fileNo number of the file (integer)
+        @param checked flag indicating checked matches (boolean)
+        """
+        first = self.__firsts[fileNo]
+        count = self.__counts[fileNo]
+        self.__checked[first:first + count] = \
+            (b"\x01" if checked else b"\x00") * count
+        self.__checkedCounts[fileNo] = count if checked else 0
+
+    def checkedEdits(self):
+        """
+        Public method to iterate over the edits of all checked matches.
+
+        @return generator yielding tuples of file name, line number and
+            edits (string, integer, tuple of tuples)
+        """
+        for fileNo, path in enumerate(self.__paths):
+            if not self.__checkedCounts[fileNo]:
+                continue
+            for matchNo in self.matchNumbers(fileNo):
+                if self.__checked[matchNo] and self.__edits[matchNo]:
+                    yield path, self.__lines[matchNo], self.__edits[matchNo]
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing rule packs, collections of rules shipped as files.
+
+A rule pack is a rule file as written by the Export button of the dialog
+with an additional 'pack' entry holding its metadata:
+
+<pre>
+{
+    "pack": {
+        "name": "qt6-versionless-imports",
+        "title": "Qt 6: version-less imports",
+        "version": "1.0",
+        "description": "..."
+    },
+    "subs": [ ...rules in the format of subForm.serialize... ],
+    "tables": { ...lookup tables of the replacement templates... }
+}
+</pre>
+
+Packs are found in the 'RulePacks' directory of the application and in the
+'packs' directory of the user.
+"""
+
+from __future__ import unicode_literals
+
+import os
+import json
+from collections import OrderedDict
+
+from .Rules import SearchRule
+
+PackExtension = ".json"
+
+
+class RulePackError(ValueError):
+    """
+    Class implementing an exception raised for unreadable or invalid rule
+    packs.
+    """
+    pass
+
+
+def packDirectories():
+    """
+    Function to get the directories searched for rule packs.
+
+    @return paths of the directory of the application and of the user
+        (list of strings)
+    """
+    return [
+        os.path.join(os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))), "RulePacks"),
+        os.path.join(os.path.expanduser("~"), ".quick_change_qml", "packs"),
+    ]
+
+
+def availablePacks():
+    """
+    Function to list the rule packs of the pack directories.
+
+    Packs of the user take precedence over packs of the same file name
+    shipped with the application.
+
+    @return file names of the packs sorted by their base names
+        (list of strings)
+    """
+    packs = {}
+    for directory in packDirectories():
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            continue
+        for name in names:
+            if name.lower().endswith(PackExtension):
+                packs[name] = os.path.join(directory, name)
+    return [packs[name] for name in sorted(packs)]
+
+
+class RulePack(object):
+    """
+    Class implementing a rule pack.
+    """
+    def __init__(self, name, title="", version="", description="",
+                 rules=None, tables=None, fileName=""):
+        """
+        Constructor
+
+        @param name short name of the pack (string)
+        @param title title of the pack shown to the user (string)
+        @param version version of the pack (string)
+        @param description description of the pack (string)
+        @param rules rules of the pack (list of SearchRule)
+        @param tables named lookup tables of the replacement templates
+            (dict of dict)
+        @param fileName name of the file the pack was loaded from (string)
+        """
+        self.name = name
+        self.title = title or name
+        self.version = version
+        self.description = description
+        self.rules = rules or []
+        self.tables = tables or {}
+        self.fileName = fileName
+
+    def __str__(self):
+        """
+        Special method to get the name of the pack shown to the user.
+
+        @return title and version of the pack (string)
+        """
+        if self.version:
+            return "{0} {1}".format(self.title, self.version)
+        return self.title
+
+    @classmethod
+    def fromDict(cls, data, fileName=""):
+        """
+        Class method to create a pack from its serialized form.
+
+        A rule file without metadata is a pack named after the file.
+
+        @param data serialized pack (dict)
+        @param fileName name of the file the pack was loaded from (string)
+        @return created pack (RulePack)
+        @exception RulePackError raised to indicate an invalid pack
+        """
+        if not isinstance(data, dict) or \
+                not isinstance(data.get('subs', []), list):
+            raise RulePackError("not a rule file")
+        meta = data.get('pack', {})
+        name = meta.get('name') or \
+            os.path.splitext(os.path.basename(fileName))[0]
+        try:
+            rules = [SearchRule.fromDict(ruleData)
+                     for ruleData in data.get('subs', [])]
+        except (ValueError, TypeError, AttributeError) as err:
+            raise RulePackError("invalid rule: {0}".format(err))
+        return cls(name, meta.get('title', ""), meta.get('version', ""),
+                   meta.get('description', ""), rules,
+                   data.get('tables', {}), fileName)
+
+    def toDict(self):
+        """
+        Public method to serialize the pack.
+
+        @return serialized pack in the format of a rule file with metadata
+            (OrderedDict)
+        """
+        data = OrderedDict([
+            ('pack', OrderedDict([
+                ('name', self.name),
+                ('title', self.title),
+                ('version', self.version),
+                ('description', self.description),
+            ])),
+            ('subs', [rule.toDict() for rule in self.rules]),
+        ])
+        if self.tables:
+            data['tables'] = self.tables
+        return data
+
+    def save(self, fileName=None):
+        """
+        Public method to write the pack to a file.
+
+        @param fileName name of the file, None writes the file the pack was
+            loaded from (string)
+        @exception IOError raised to indicate an unwritable file
+        """
+        fileName = fileName or self.fileName
+        with open(fileName, "w") as f:
+            json.dump(self.toDict(), f, indent=4)
+        self.fileName = fileName
+
+    def ruleTables(self, tables=None):
+        """
+        Public method to get the lookup tables of the rules of the pack.
+
+        The lookup tables of the pack take precedence over the given ones.
+
+        @param tables named lookup tables of the rule file (dict of dict)
+        @return named lookup tables (dict of dict)
+        """
+        if not self.tables:
+            return tables
+        packTables = dict(tables or {})
+        packTables.update(self.tables)
+        return packTables
+
+
+def mergePack(data, pack):
+    """
+    Function to add the rules of a pack to a rule file.
+
+    The lookup tables of the pack take precedence over the tables of the
+    rule file.
+
+    @param data serialized rule file to be extended (dict)
+    @param pack pack to be added (RulePack)
+    """
+    data.setdefault('subs', []).extend(rule.toDict() for rule in pack.rules)
+    if pack.tables:
+        data.setdefault('tables', {}).update(pack.tables)
+
+
+def loadPack(fileName):
+    """
+    Function to load a rule pack.
+
+    @param fileName name of the pack file (string)
+    @return loaded pack (RulePack)
+    @exception RulePackError raised to indicate an unreadable or invalid
+        pack
+    """
+    try:
+        with open(fileName, "r") as f:
+            data = json.load(f)
+    except (IOError, OSError, ValueError) as err:
+        raise RulePackError("cannot read rule pack {0}: {1}".format(
+            fileName, err))
+    return RulePack.fromDict(data, fileName)
+
+
+def findPack(name):
+    """
+    Function to find a rule pack given by file name or by name.
+
+    @param name file name of the pack or its name without the extension
+        in one of the pack directories (string)
+    @return file name of the pack (string)
+    @exception RulePackError raised to indicate an unknown pack
+    """
+    if os.path.isfile(name):
+        return name
+    for fileName in availablePacks():
+        baseName = os.path.basename(fileName)
+        if name in (baseName, os.path.splitext(baseName)[0]):
+            return fileName
+    raise RulePackError("no rule pack {0}".format(name))
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing the search and replace rules.
+"""
+
+from __future__ import unicode_literals
+
+import re
+import sys
+from collections import OrderedDict
+
+try:
+    from re import _parser as sre_parse     # Python 3.11+
+except ImportError:
+    import sre_parse
+
+try:
+    basestring
+except NameError:
+    basestring = str    # Python 3
+
+from .Templates import compileTemplate, TemplateError
+from .QmlOutline import QmlSelector
+
+
+class RuleError(ValueError):
+    """
+    Class implementing an exception raised for rules, that cannot be
+    compiled.
+    
+    The attribute 'field' names the offending part of the rule, one of
+    'find', 'replace' or 'filter'.
+    """
+    def __init__(self, field, message):
+        """
+        Constructor
+        
+        @param field name of the invalid field (string)
+        @param message error message (string)
+        """
+        super(RuleError, self).__init__(message)
+        self.field = field
+
+
+def fileFilterRegExp(fileFilter):
+    """
+    Function to convert a list of file name wildcards into a regular
+    expression.
+    
+    @param fileFilter wildcards separated by ';' (e.g. '*.qml;*.js')
+        (string)
+    @return regular expression matching the file names
+        (compiled regular expression)
+    """
+    # *.qml -> .*\.qml
+    fileFilterList = \
+        ["^{0}$".format(filter.replace(".", r"\.").replace("*", ".*"))
+         for filter in fileFilter.split(";")]
+    return re.compile("|".join(fileFilterList))
+
+
+def requiredLiteral(pattern, flags=0):
+    """
+    Function to get a literal text every match of a regular expression
+    contains.
+    
+    The longest run of literal characters at the top level of the
+    expression is taken. A text not containing it cannot have a match, so
+    files without it can be skipped without searching them line by line.
+    
+    @param pattern regular expression (string)
+    @param flags flags of the expression (integer)
+    @return tuple of the literal text, an empty string if there is none, and
+        a flag indicating a literal to be compared with the lower case text
+        of an ASCII file (string, boolean)
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except re.error:
+        return "", False
+    state = getattr(parsed, "state", None) or parsed.pattern
+    folded = bool(state.flags & re.IGNORECASE)
+    
+    best = run = ""
+    for op, argument in parsed:
+        if op == sre_parse.LITERAL:
+            run += "%c" % argument
+        else:
+            run = ""
+        if len(run) > len(best):
+            best = run
+    if folded:
+        try:
+            best.encode("ascii")
+        except UnicodeError:
+            return "", False
+        best = best.lower()
+    return best, folded
+
+
+class SearchRule(object):
+    """
+    Class implementing a search and replace rule.
+    
+    A rule is a plain object, that can be created from and converted to the
+    dictionary written for each rule window by FindFileDialog.serialize.
+    
+    Rules can be pickled to be sent to worker processes. Only the plain
+    fields are pickled, a compiled rule is compiled again when unpickled.
+    """
+    def __init__(self, findText, replaceText="", caseSensitive=False,
+                 regexp=False, wholeWord=False, fileFilter="*.qml",
+                 headerOnly=False, structural=False):
+        """
+        Constructor
+        
+        @param findText text or regular expression to search for (string)
+        @param replaceText replacement template (string)
+        @param caseSensitive flag indicating a case sensitive search
+            (boolean)
+        @param regexp flag indicating, that findText is a regular expression
+            (boolean)
+        @param wholeWord flag indicating to match whole words only (boolean)
+        @param fileFilter file name wildcards separated by ';' (string)
+        @param headerOnly flag indicating to search only the header of a
+            file, i.e. the lines up to the first line, that is not a
+            comment, a pragma or an import (boolean)
+        @param structural flag indicating, that findText is a structural
+            query against the outline of QML files (see QmlOutline), such
+            rules have no replacements (boolean)
+        """
+        self.findText = findText
+        self.replaceText = replaceText
+        self.caseSensitive = caseSensitive
+        self.regexp = regexp
+        self.wholeWord = wholeWord
+        self.fileFilter = fileFilter
+        self.headerOnly = headerOnly
+        self.structural = structural
+        
+        self.search = None
+        self.selector = None
+        self.replace = None
+        self.filterRe = None
+        self.literal = ""
+        self.literalFolded = False
+        self.__compileArgs = None
+    
+    def __getstate__(self):
+        """
+        Special method to get the state to be pickled.
+        
+        @return plain fields of the rule and the arguments of the last
+            compile() call (dict)
+        """
+        state = self.toDict()
+        state['compileArgs'] = self.__compileArgs
+        return state
+    
+    def __setstate__(self, state):
+        """
+        Special method to restore a pickled rule.
+        
+        @param state pickled state (dict)
+        """
+        self.__init__(state['findtextCombo'], state['replacetextCombo'],
+                      state['caseCheckBox'], state['regexpCheckBox'],
+                      state['wordCheckBox'], state['filterEdit'],
+                      state['headerCheckBox'], state['structuralCheckBox'])
+        if state['compileArgs'] is not None:
+            self.compile(*state['compileArgs'])
+    
+    @classmethod
+    def fromDict(cls, data):
+        """
+        Class method to create a rule from its serialized form.
+        
+        @param data serialized rule as written by subForm.serialize (dict)
+        @return created rule (SearchRule)
+        @exception RuleError raised to indicate an invalid serialized rule
+        """
+        if not isinstance(data, dict):
+            raise RuleError('find', "not a rule")
+        for key, field in (('findtextCombo', 'find'),
+                           ('replacetextCombo', 'replace'),
+                           ('filterEdit', 'filter')):
+            if not isinstance(data.get(key, ""), basestring):
+                raise RuleError(field, "not a text")
+        if 'findtextCombo' not in data:
+            raise RuleError('find', "no search text")
+        return cls(data['findtextCombo'],
+                   data.get('replacetextCombo', ""),
+                   data.get('caseCheckBox', False),
+                   data.get('regexpCheckBox', False),
+                   data.get('wordCheckBox', False),
+                   data.get('filterEdit', "*.qml"),
+                   data.get('headerCheckBox', False),
+                   data.get('structuralCheckBox', False))
+    
+    def toDict(self):
+        """
+        Public method to serialize the rule.
+        
+        @return serialized rule in the format of subForm.serialize
+            (OrderedDict)
+        """
+        return OrderedDict([
+            ('findtextCombo', self.findText),
+            ('replacetextCombo', self.replaceText),
+            ('caseCheckBox', self.caseSensitive),
+            ('regexpCheckBox', self.regexp),
+            ('wordCheckBox', self.wholeWord),
+            ('feelLikeCheckBox', False),
+            ('filterEdit', self.fileFilter),
+            ('headerCheckBox', self.headerOnly),
+            ('structuralCheckBox', self.structural),
+        ])
+    
+    def compile(self, tables=None, withReplace=True, filters=None):
+        """
+        Public method to compile the search expression, the replacement
+        template and the file filter of the rule.
+        
+        @param tables named lookup tables for the replacement template
+            (dict of dict)
+        @param withReplace flag indicating to compile the replacement
+            template as well (boolean)
+        @param filters additional filters of the replacement template, they
+            have to be picklable to send the rule to worker processes
+            (dict of functions)
+        @exception RuleError raised to indicate an invalid rule
+        """
+        self.__compileArgs = (tables, withReplace, filters)
+        try:
+            self.filterRe = fileFilterRegExp(self.fileFilter)
+        except re.error as why:
+            raise RuleError('filter', str(why))
+        
+        if self.structural:
+            try:
+                self.selector = QmlSelector(self.findText, self.caseSensitive)
+            except ValueError as why:
+                raise RuleError('find', str(why))
+            return
+        
+        if self.regexp:
+            txt = self.findText
+        else:
+            txt = re.escape(self.findText)
+        if self.wholeWord:
+            txt = "\\b{0}\\b".format(txt)
+        if sys.version_info[0] == 2:
+            flags = re.UNICODE | re.LOCALE
+        else:
+            flags = re.UNICODE
+        if not self.caseSensitive:
+            flags |= re.IGNORECASE
+        try:
+            self.search = re.compile(txt, flags)
+        except re.error as why:
+            raise RuleError('find', str(why))
+        self.literal, self.literalFolded = requiredLiteral(txt, flags)
+        
+        if withReplace:
+            try:
+                self.replace = compileTemplate(
+                    self.replaceText, self.search, tables, filters)
+            except TemplateError as why:
+                raise RuleError('replace', str(why))
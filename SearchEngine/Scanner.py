@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing the scanning of files for search rules and the
+application of a replace plan to a file.
+"""
+
+from __future__ import unicode_literals
+
+import os
+
+from . import FileIO
+from .QmlImports import readHeader, headerLineCount
+from .QmlOutline import outlineOf
+from .Resources import isResourcePath, readResource, checkWritable
+
+
+def stripEol(line):
+    """
+    Function to strip the line end of a line.
+
+    @param line line to be stripped (string)
+    @return stripped line (string)
+    """
+    return line.replace("\r", "").replace("\n", "")
+
+
+def foldAscii(text):
+    """
+    Function to get the lower case text of an ASCII text.
+
+    The lower case text can stand in for case insensitive comparisons of
+    ASCII text only, there are non ASCII characters matching ASCII letters.
+
+    @param text text to be converted (string)
+    @return lower case text or an empty string for a non ASCII text
+        (string)
+    """
+    try:
+        text.encode("ascii")
+    except UnicodeError:
+        return ""
+    return text.lower()
+
+
+def searchLines(lines, rule, matches, withReplace=False, tick=None,
+                cancelled=None):
+    """
+    Function to search the lines of a file for a rule.
+
+    @param lines lines of the file including the line ends
+        (list of strings)
+    @param rule compiled rule to search for (SearchRule)
+    @param matches list the lines found are appended to as tuples of
+        line number, line text, start and end of the first match and
+        edits (list of tuples)
+    @param withReplace flag indicating to compute the edits of the rule
+        (boolean)
+    @param tick function called after every line (function)
+    @param cancelled function returning True to stop searching (function)
+    """
+    search = rule.search
+    count = 0
+    for line in lines:
+        if cancelled is not None and cancelled():
+            break
+
+        count += 1
+        contains = search.search(line)
+        if contains:
+            if withReplace:
+                edits = [(m.start(), m.end(), m.group(0), rule.replace(m))
+                         for m in search.finditer(line)]
+            else:
+                edits = None
+            matches.append((count, stripEol(line), contains.start(),
+                            contains.end(), edits))
+
+        if tick is not None:
+            tick()
+
+
+def searchOutline(text, outline, rule, matches, withReplace=False):
+    """
+    Function to search the outline of a QML file for a structural rule.
+
+    Every matching object gives a match of the line of its type, structural
+    rules have no edits.
+
+    @param text text of the file (string)
+    @param outline outline of the file (QmlOutline)
+    @param rule compiled structural rule to search for (SearchRule)
+    @param matches list the lines found are appended to as tuples of
+        line number, line text, start and end of the type and edits
+        (list of tuples)
+    @param withReplace flag indicating to give empty edits instead of None
+        (boolean)
+    """
+    lines = set()
+    for obj in rule.selector.find(outline):
+        if obj.line in lines:
+            continue
+        lines.add(obj.line)
+        lineStart = obj.offset - obj.column
+        lineEnd = text.find("\n", obj.offset)
+        if lineEnd < 0:
+            lineEnd = len(text)
+        matches.append((obj.line, stripEol(text[lineStart:lineEnd]),
+                        obj.column, obj.column + len(obj.typeName),
+                        [] if withReplace else None))
+
+
+def scanFile(fileName, rules, withReplace=False, tick=None, cancelled=None,
+             reader=None):
+    """
+    Function to search a file for all rules applying to it.
+
+    The file is read once for all rules. If all rules applying to the file
+    search the header only, just the header is read in small chunks.
+    Structural rules search the outline of the file, which is cached by the
+    hash of the file. Rules requiring a literal text, that is not contained
+    in the file, are skipped without searching the lines.
+    Entries of binary resources are given by their virtual path.
+
+    @param fileName name of the file (string)
+    @param rules compiled rules to search for (list of SearchRule)
+    @param withReplace flag indicating to compute the edits of the rules
+        (boolean)
+    @param tick function called after every line (function)
+    @param cancelled function returning True to stop searching (function)
+    @param reader function reading a file like FileIO.readEncodedFile, it
+        is not used for entries of binary resources (function)
+    @return tuple of the MD5 hash of the file, an empty string if only the
+        header was read, and the matches as tuples of line number, line
+        text, start and end of the first match and edits
+        (string, list of tuples)
+    @exception IOError raised to indicate a file, that could not be read
+    @exception UnicodeError raised to indicate a file, that could not be
+        decoded
+    """
+    name = os.path.basename(fileName)
+    rules = [rule for rule in rules if rule.filterRe.match(name)]
+    matches = []
+    if isResourcePath(fileName):
+        reader = readResource
+    elif rules and all(rule.headerOnly and not rule.structural
+                       for rule in rules):
+        header = readHeader(fileName)
+        if header is not None:
+            lines = FileIO.decode(header)[0].splitlines(True)
+            for rule in rules:
+                searchLines(lines, rule, matches, withReplace, tick,
+                            cancelled)
+            return "", matches
+
+    text, verdict, hashStr = (reader or FileIO.readEncodedFile)(fileName)
+    lines = text.splitlines(True)
+    headerLines = None
+    foldedText = None
+    for rule in rules:
+        if rule.literal:
+            # skip rules, whose required text is not in the file
+            if not rule.literalFolded:
+                if rule.literal not in text:
+                    continue
+            else:
+                if foldedText is None:
+                    foldedText = foldAscii(text)
+                if foldedText and rule.literal not in foldedText:
+                    continue
+
+        if rule.structural:
+            searchOutline(text, outlineOf(text, hashStr), rule, matches,
+                          withReplace)
+        elif rule.headerOnly:
+            if headerLines is None:
+                headerLines = lines[:headerLineCount(lines)]
+            searchLines(headerLines, rule, matches, withReplace, tick,
+                        cancelled)
+        else:
+            searchLines(lines, rule, matches, withReplace, tick, cancelled)
+    return hashStr, matches
+
+
+def replaceFile(fileName, plan, reader=None):
+    """
+    Function to apply the edits of a replace plan to a file.
+
+    The file is only written, if it is changed.
+
+    @param fileName name of the file (string)
+    @param plan replace plan containing the edits of the file (ReplacePlan)
+    @param reader function reading a file like FileIO.readEncodedFile
+        (function)
+    @return tuple of a flag indicating a changed file and the conflicts as
+        tuples of reason and edit (boolean, list of tuples)
+    @exception IOError raised to indicate a file, that could not be read or
+        written, or an entry of a binary resource
+    @exception UnicodeError raised to indicate a file, that could not be
+        decoded or encoded
+    """
+    checkWritable(fileName)
+    text, verdict, hashStr = (reader or FileIO.readEncodedFile)(fileName)
+    lines = text.splitlines(True)
+    newLines, conflicts = plan.apply(fileName, lines, verdict.eol)
+    changed = newLines != lines
+    if changed:
+        FileIO.writeEncodedLines(fileName, newLines, verdict)
+    return changed, conflicts
+
+
+def diffFile(fileName, plan, writer, reader=None):
+    """
+    Function to write the edits of a replace plan for a file as a diff
+    without changing the file.
+
+    @param fileName name of the file (string)
+    @param plan replace plan containing the edits of the file (ReplacePlan)
+    @param writer writer of the diff (UnifiedDiffWriter)
+    @param reader function reading a file like FileIO.readEncodedFile
+        (function)
+    @return tuple of a flag indicating a file to be changed and the
+        conflicts as tuples of reason and edit (boolean, list of tuples)
+    @exception IOError raised to indicate a file, that could not be read,
+        or an entry of a binary resource
+    @exception UnicodeError raised to indicate a file, that could not be
+        decoded
+    """
+    checkWritable(fileName)
+    text, verdict, hashStr = (reader or FileIO.readEncodedFile)(fileName)
+    lines = text.splitlines(True)
+    newLines, conflicts = plan.apply(fileName, lines, verdict.eol)
+    return writer.addFile(fileName, lines, newLines) > 0, conflicts
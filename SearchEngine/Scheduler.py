@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing helpers to interleave long running work with an event
+loop.
+"""
+
+from __future__ import unicode_literals
+
+import time
+
+
+class TimeSlicer(object):
+    """
+    Class implementing a scheduler yielding to an event loop between time
+    slices.
+    
+    The work loop calls tick() for every unit of work. The clock is only
+    read every few ticks, the yield function is called once a slice is used
+    up.
+    """
+    def __init__(self, yieldFunction, sliceMs=16, checkEvery=64):
+        """
+        Constructor
+        
+        @param yieldFunction function processing the pending events
+            (function)
+        @param sliceMs length of a time slice in milliseconds (integer)
+        @param checkEvery number of ticks between two clock readings
+            (integer)
+        """
+        self.__yield = yieldFunction
+        self.__slice = sliceMs / 1000.0
+        self.__checkEvery = checkEvery
+        self.__ticks = 0
+        self.__sliceStart = time.monotonic()
+    
+    def tick(self):
+        """
+        Public method to account for a unit of work.
+        
+        @return flag indicating, that the event loop was run (boolean)
+        """
+        self.__ticks += 1
+        if self.__ticks < self.__checkEvery:
+            return False
+        
+        self.__ticks = 0
+        if time.monotonic() - self.__sliceStart >= self.__slice:
+            self.yieldNow()
+            return True
+        return False
+    
+    def yieldNow(self):
+        """
+        Public method to run the event loop and start a new time slice.
+        """
+        self.__yield()
+        self.__ticks = 0
+        self.__sliceStart = time.monotonic()
+
+
+class RateLimiter(object):
+    """
+    Class implementing a limiter for the rate of an action (e.g. updating
+    progress information).
+    """
+    def __init__(self, rate=10):
+        """
+        Constructor
+        
+        @param rate maximum number of actions per second (integer)
+        """
+        self.__interval = 1.0 / rate
+        self.__last = None
+    
+    def due(self):
+        """
+        Public method to check, if the action may be performed now.
+        
+        @return flag indicating, that the action is due (boolean)
+        """
+        now = time.monotonic()
+        if self.__last is None or now - self.__last >= self.__interval:
+            self.__last = now
+            return True
+        return False
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing a search of a directory tree for a set of rules.
+"""
+
+from __future__ import unicode_literals
+
+import multiprocessing
+
+try:
+    from concurrent.futures import ProcessPoolExecutor, wait, \
+        FIRST_COMPLETED
+except ImportError:
+    ProcessPoolExecutor = None      # Python 2 searches in process only
+
+from .Enumerator import FileEnumerator
+from .Progress import ProgressMeter
+from .Scanner import scanFile
+
+# state of a worker process
+_workerRules = None
+_workerWithReplace = False
+
+
+def _initWorker(rules, withReplace):
+    """
+    Function to initialize a worker process.
+
+    @param rules compiled rules, they are compiled again when unpickled
+        (list of SearchRule)
+    @param withReplace flag indicating to compute the edits (boolean)
+    """
+    global _workerRules, _workerWithReplace
+    _workerRules = rules
+    _workerWithReplace = withReplace
+
+
+def _scanBatch(fileNames):
+    """
+    Function to scan a batch of files in a worker process.
+
+    @param fileNames names of the files to be scanned (list of strings)
+    @return tuples of file name, MD5 hash, matches and error message, hash
+        and matches are None for a file that could not be read
+        (list of tuples)
+    """
+    results = []
+    for fileName in fileNames:
+        try:
+            hashStr, matches = scanFile(fileName, _workerRules,
+                                        _workerWithReplace)
+            results.append((fileName, hashStr, matches, None))
+        except (IOError, UnicodeError) as err:
+            results.append((fileName, None, None, str(err)))
+    return results
+
+
+class SearchJob(object):
+    """
+    Class implementing a search of a directory tree for a set of rules.
+
+    The job has no user interface. The caller iterates over the results and
+    may pass functions to keep an event loop running. The files are scanned
+    in process or, if workers are requested, by a pool of worker processes
+    in batches.
+    """
+    BatchSize = 16
+
+    def __init__(self, rules, root, withReplace=False, workers=0,
+                 cache=None, resources=False):
+        """
+        Constructor
+
+        @param rules compiled rules (list of SearchRule)
+        @param root directory to search in (string)
+        @param withReplace flag indicating to compute the edits of the rules
+            (boolean)
+        @param workers number of worker processes, 0 scans in process
+            (integer)
+        @param cache cache of directory listings and files used to scan in
+            process (SearchCache)
+        @param resources flag indicating to search the files of .qrc files
+            outside of the directory tree and the entries of .rcc files as
+            well (boolean)
+        """
+        self.rules = rules
+        self.root = root
+        self.withReplace = withReplace
+        self.workers = workers if ProcessPoolExecutor is not None else 0
+        self.cache = cache
+        self.resources = resources
+        if cache is not None:
+            # the cache lives in this process
+            self.workers = 0
+
+        self.meter = ProgressMeter()
+        self.files = 0
+        self.errors = []
+        self.__cancelled = False
+
+    def cancel(self):
+        """
+        Public method to stop the search.
+
+        In process the current file is left after the current line, worker
+        processes finish their current batch.
+        """
+        self.__cancelled = True
+
+    def isCancelled(self):
+        """
+        Public method to check, if the search was cancelled.
+
+        @return flag indicating a cancelled search (boolean)
+        """
+        return self.__cancelled
+
+    def results(self, idle=None, tick=None):
+        """
+        Public method to run the search.
+
+        @param idle function called while waiting for files or workers
+            (function)
+        @param tick function called after every line searched in process
+            (function)
+        @return generator yielding tuples of file name, MD5 hash and matches
+            for every file scanned, matches are given as tuples of line
+            number, line text, start and end of the first hit and edits
+            (string, string, list of tuples)
+        """
+        # the cached listing is streamed like a walk, so scanning and the
+        # byte total progress while the tree is still being listed
+        enumerator = FileEnumerator(self.root,
+                                    [rule.filterRe for rule in self.rules],
+                                    self.resources, self.cache)
+        enumerator.start()
+        try:
+            if self.workers > 0:
+                results = self.__parallelResults(enumerator, idle)
+            else:
+                results = self.__serialResults(enumerator, idle, tick)
+            for result in results:
+                yield result
+        finally:
+            enumerator.stop()
+
+    def __serialResults(self, enumerator, idle, tick):
+        """
+        Private method to scan the files in process, through the cache if
+        there is one.
+
+        @param enumerator started enumerator of the files (FileEnumerator)
+        @param idle function called while waiting for files (function)
+        @param tick function called after every line (function)
+        @return generator yielding tuples of file name, MD5 hash and matches
+            (string, string, list of tuples)
+        """
+        reader = self.cache.read if self.cache is not None else None
+        for fileName, size in enumerator.files(idle=idle):
+            if self.__cancelled:
+                return
+
+            self.meter.totalBytes = enumerator.totalBytes
+            try:
+                hashStr, matches = scanFile(fileName, self.rules,
+                                            self.withReplace, tick,
+                                            self.isCancelled, reader)
+            except (IOError, OSError, UnicodeError) as err:
+                self.errors.append((fileName, str(err)))
+                continue
+            finally:
+                self.files += 1
+                self.meter.advance(size)
+            yield fileName, hashStr, matches
+
+    def __parallelResults(self, enumerator, idle):
+        """
+        Private method to scan the files by worker processes.
+
+        @param enumerator started enumerator of the files (FileEnumerator)
+        @param idle function called while waiting for files or workers
+            (function)
+        @return generator yielding tuples of file name, MD5 hash and matches
+            (string, string, list of tuples)
+        """
+        # the enumerator thread is running already, forking is unsafe
+        executor = ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_initWorker, initargs=(self.rules, self.withReplace))
+        pending = {}            # future -> sizes of the batch
+        batch = []
+        sizes = []
+        try:
+            files = enumerator.files(idle=idle)
+            while not self.__cancelled:
+                item = next(files, None)
+                if item is not None:
+                    batch.append(item[0])
+                    sizes.append(item[1])
+                    if len(batch) < self.BatchSize:
+                        continue
+                if batch:
+                    pending[executor.submit(_scanBatch, batch)] = sizes
+                    batch = []
+                    sizes = []
+
+                # keep a few batches per worker in flight
+                limit = self.workers * 2 if item is not None else 1
+                while len(pending) >= limit and not self.__cancelled:
+                    done = wait(list(pending), timeout=0.05,
+                                return_when=FIRST_COMPLETED)[0]
+                    if not done and idle is not None:
+                        idle()
+                    for future in done:
+                        self.meter.totalBytes = enumerator.totalBytes
+                        for size in pending.pop(future):
+                            self.meter.advance(size)
+                        for result in self.__batchResults(future):
+                            yield result
+                if item is None and not pending:
+                    return
+        finally:
+            for future in pending:
+                future.cancel()
+            # only a cancelled job leaves the running batches behind, the
+            # pool is torn down completely otherwise
+            executor.shutdown(wait=not self.__cancelled)
+
+    def __batchResults(self, future):
+        """
+        Private method to get the results of a finished batch.
+
+        @param future finished batch (concurrent.futures.Future)
+        @return tuples of file name, MD5 hash and matches
+            (list of tuples)
+        """
+        results = []
+        for fileName, hashStr, matches, error in future.result():
+            self.files += 1
+            if error is None:
+                results.append((fileName, hashStr, matches))
+            else:
+                self.errors.append((fileName, error))
+        return results
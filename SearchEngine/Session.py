@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing sessions, files keeping the rules, the results and the
+hash table of the files of a search.
+
+A session is a SQLite database. The rules are stored as in a rule file, the
+results column by column: the file names and hashes as joined strings
+preceded by their number, the numbers of the result store as packed
+arrays and the texts and edits of the matches as compressed JSON pages of
+PageSize matches. Loading a session reads the rules and the packed columns
+only, a page of texts or edits is read, when one of its matches is needed
+for the first time.
+"""
+
+from __future__ import unicode_literals
+
+import os
+import json
+import sqlite3
+import threading
+import zlib
+from array import array
+from collections import OrderedDict
+
+from .ResultStore import ResultStore
+
+SessionExtension = ".qcsession"
+Version = 2
+PageSize = 1024
+
+_Schema = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE columns (name TEXT PRIMARY KEY, data BLOB);
+CREATE TABLE pages (name TEXT, pageNo INTEGER, data BLOB,
+                    PRIMARY KEY (name, pageNo));
+"""
+
+
+class SessionError(Exception):
+    """
+    Class implementing an exception raised for unreadable or unwritable
+    sessions.
+    """
+    pass
+
+
+def _packArray(values):
+    """
+    Function to pack integers independent of the platform.
+
+    @param values integers to be packed (sequence of integers)
+    @return packed integers (bytes)
+    """
+    return array('q', values).tobytes()
+
+
+def _unpackArray(data):
+    """
+    Function to unpack integers packed by _packArray.
+
+    @param data packed integers (bytes)
+    @return integers (array)
+    """
+    values = array('q')
+    values.frombytes(data)
+    return values
+
+
+def _packStrings(strings):
+    """
+    Function to pack strings.
+
+    The number of strings precedes the joined strings, so an empty list and
+    a list of an empty string are told apart.
+
+    @param strings strings not containing a NUL character (list of strings)
+    @return packed strings (bytes)
+    """
+    return _packArray([len(strings)]) + "\0".join(strings).encode("utf-8")
+
+
+def _unpackStrings(data):
+    """
+    Function to unpack strings packed by _packStrings.
+
+    @param data packed strings (bytes)
+    @return strings (list of strings)
+    @exception ValueError raised to indicate damaged data
+    """
+    data = bytes(data)
+    count = _unpackArray(data[:8])[0]
+    if count == 0:
+        return []
+    strings = data[8:].decode("utf-8").split("\0")
+    if len(strings) != count:
+        raise ValueError("expected {0} strings, found {1}".format(
+            count, len(strings)))
+    return strings
+
+
+def _checkLengths(columns, **lengths):
+    """
+    Function to check the lengths of columns read from a session.
+
+    @param columns columns to be checked (dict of sequences)
+    @keyparam lengths expected length per column name (integers)
+    @exception SessionError raised to indicate a column of another length
+    """
+    for name, length in lengths.items():
+        if len(columns[name]) != length:
+            raise SessionError(
+                "column {0} has {1} entries instead of {2}".format(
+                    name, len(columns[name]), length))
+
+
+def _packPage(items):
+    """
+    Function to pack a page of a column.
+
+    @param items JSON serializable items (list)
+    @return compressed page (bytes)
+    """
+    return zlib.compress(json.dumps(items).encode("utf-8"))
+
+
+def _unpackPage(data):
+    """
+    Function to unpack a page of a column.
+
+    @param data compressed page (bytes)
+    @return items (list)
+    """
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+def _toEdits(edits):
+    """
+    Function to convert edits read from JSON.
+
+    @param edits edits as lists of start, end, old and new text (list)
+    @return edits as stored by a result store (tuple of tuples)
+    """
+    return tuple(tuple(edit) for edit in edits)
+
+
+class PagedColumn(object):
+    """
+    Class implementing a read only column of a session reading its items on
+    demand.
+
+    The items are read page by page, the MaxPages most recently used pages
+    are kept. The column may be read by several threads, e.g. by the thread
+    filtering the results.
+    """
+    MaxPages = 64
+
+    def __init__(self, connection, lock, name, length, convert=None):
+        """
+        Constructor
+
+        @param connection connection to the session (sqlite3.Connection)
+        @param lock lock serializing the use of the connection
+            (threading.Lock)
+        @param name name of the column (string)
+        @param length number of items (integer)
+        @param convert function converting an item read (function)
+        """
+        self.__connection = connection
+        self.__lock = lock
+        self.__name = name
+        self.__length = length
+        self.__convert = convert
+        self.__pages = OrderedDict()    # page number -> items
+
+    def __len__(self):
+        """
+        Special method to get the number of items.
+
+        @return number of items (integer)
+        """
+        return self.__length
+
+    def __getitem__(self, index):
+        """
+        Special method to get an item.
+
+        @param index index of the item (integer)
+        @return item (any)
+        @exception IndexError raised to indicate an invalid index
+        """
+        if index < 0:
+            index += self.__length
+        if not 0 <= index < self.__length:
+            raise IndexError(index)
+
+        pageNo, offset = divmod(index, PageSize)
+        with self.__lock:
+            page = self.__pages.pop(pageNo, None)
+            if page is None:
+                page = self.__readPage(pageNo)
+            self.__pages[pageNo] = page
+            while len(self.__pages) > self.MaxPages:
+                self.__pages.popitem(last=False)
+        return page[offset]
+
+    def __readPage(self, pageNo):
+        """
+        Private method to read a page.
+
+        @param pageNo number of the page (integer)
+        @return items of the page (list)
+        """
+        row = self.__connection.execute(
+            "SELECT data FROM pages WHERE name = ? AND pageNo = ?",
+            (self.__name, pageNo)).fetchone()
+        items = _unpackPage(row[0]) if row is not None else []
+        if self.__convert is not None:
+            items = [self.__convert(item) for item in items]
+        # a damaged session shows empty items instead of failing
+        items.extend([self.__convert([]) if self.__convert else ""] *
+                     (PageSize - len(items)))
+        return items
+
+
+def saveSession(fileName, rules, store, hashes=None):
+    """
+    Function to write a session.
+
+    The session is written to a temporary file first, an existing session
+    is replaced only once the new one is complete.
+
+    @param fileName name of the session file (string)
+    @param rules serialized rules in the format of a rule file (dict)
+    @param store results (ResultStore)
+    @param hashes dictionary of the file name and a tuple of the
+        modification stamp and the MD5 hash of the files read (dict)
+    @exception SessionError raised to indicate an unwritable session
+    """
+    columns = store.columns()
+    matchCount = store.matchCount()
+    hashes = hashes or {}
+    hashPaths = sorted(hashes)
+
+    tmpName = fileName + ".tmp"
+    try:
+        if os.path.exists(tmpName):
+            os.remove(tmpName)
+        connection = sqlite3.connect(tmpName)
+        try:
+            with connection:
+                connection.executescript(_Schema)
+                connection.executemany(
+                    "INSERT INTO meta VALUES (?, ?)", [
+                        ("version", str(Version)),
+                        ("rules", json.dumps(rules)),
+                        ("matches", str(matchCount)),
+                    ])
+                connection.executemany(
+                    "INSERT INTO columns VALUES (?, ?)", [
+                        ("paths", _packStrings(columns["paths"])),
+                        ("md5s", _packStrings(columns["md5s"])),
+                        ("counts", _packArray(columns["counts"])),
+                        ("lines", _packArray(columns["lines"])),
+                        ("starts", _packArray(columns["starts"])),
+                        ("ends", _packArray(columns["ends"])),
+                        ("checked", bytes(columns["checked"])),
+                        ("hashPaths", _packStrings(hashPaths)),
+                        ("hashMtimes", _packArray(
+                            int(hashes[path][0][0]) for path in hashPaths)),
+                        ("hashSizes", _packArray(
+                            hashes[path][0][1] for path in hashPaths)),
+                        ("hashMd5s", _packStrings(
+                            [hashes[path][1] for path in hashPaths])),
+                    ])
+                for first in range(0, matchCount, PageSize):
+                    matchNos = range(first, min(first + PageSize, matchCount))
+                    pageNo = first // PageSize
+                    connection.executemany(
+                        "INSERT INTO pages VALUES (?, ?, ?)", [
+                            ("texts", pageNo, _packPage(
+                                [columns["texts"][n] for n in matchNos])),
+                            ("edits", pageNo, _packPage(
+                                [columns["edits"][n] for n in matchNos])),
+                        ])
+        finally:
+            connection.close()
+        os.replace(tmpName, fileName)
+    except (sqlite3.Error, OSError) as err:
+        raise SessionError("cannot write session {0}: {1}".format(
+            fileName, err))
+
+
+def loadSession(fileName):
+    """
+    Function to read a session.
+
+    The texts and edits of the matches are read on demand, the returned
+    store keeps the session open.
+
+    @param fileName name of the session file (string)
+    @return tuple of the serialized rules, the results and the dictionary
+        of the file name and a tuple of the modification stamp and the MD5
+        hash of the files read (dict, ResultStore, dict)
+    @exception SessionError raised to indicate an unreadable session
+    """
+    if not os.path.isfile(fileName):
+        raise SessionError("no session {0}".format(fileName))
+
+    connection = None
+    try:
+        connection = sqlite3.connect(fileName, check_same_thread=False)
+        meta = dict(connection.execute("SELECT key, value FROM meta"))
+        if meta.get("version") != str(Version):
+            raise SessionError("unsupported session version {0}".format(
+                meta.get("version")))
+        data = dict(connection.execute("SELECT name, data FROM columns"))
+        rules = json.loads(meta["rules"])
+        matchCount = int(meta["matches"])
+
+        lock = threading.Lock()
+        columns = {
+            "paths": _unpackStrings(data["paths"]),
+            "md5s": _unpackStrings(data["md5s"]),
+            "counts": _unpackArray(data["counts"]),
+            "lines": _unpackArray(data["lines"]),
+            "starts": _unpackArray(data["starts"]),
+            "ends": _unpackArray(data["ends"]),
+            "texts": PagedColumn(connection, lock, "texts", matchCount),
+            "edits": PagedColumn(connection, lock, "edits", matchCount,
+                                 _toEdits),
+            "checked": data["checked"],
+        }
+        fileCount = len(columns["paths"])
+        _checkLengths(columns, md5s=fileCount, counts=fileCount,
+                      lines=matchCount, starts=matchCount, ends=matchCount,
+                      checked=matchCount)
+        if sum(columns["counts"]) != matchCount:
+            raise SessionError("match counts of the files don't add up")
+        store = ResultStore.fromColumns(columns)
+
+        hashColumns = {
+            "hashPaths": _unpackStrings(data["hashPaths"]),
+            "hashMtimes": _unpackArray(data["hashMtimes"]),
+            "hashSizes": _unpackArray(data["hashSizes"]),
+            "hashMd5s": _unpackStrings(data["hashMd5s"]),
+        }
+        hashCount = len(hashColumns["hashPaths"])
+        _checkLengths(hashColumns, hashMtimes=hashCount,
+                      hashSizes=hashCount, hashMd5s=hashCount)
+        hashes = dict(zip(hashColumns["hashPaths"], zip(
+            zip(hashColumns["hashMtimes"], hashColumns["hashSizes"]),
+            hashColumns["hashMd5s"])))
+    except SessionError:
+        connection.close()
+        raise
+    except (sqlite3.Error, KeyError, ValueError) as err:
+        if connection is not None:
+            connection.close()
+        raise SessionError("cannot read session {0}: {1}".format(
+            fileName, err))
+    return rules, store, hashes
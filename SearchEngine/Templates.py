@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing a template language for computed replacement texts.
+
+Besides the backreferences understood by re.sub (e.g. '\\1' or '\\g<name>')
+a template may contain expressions of the form '${group|filter|...}'. The
+group is given by name or number, '0' being the whole match. The following
+filters are supported:
+
+<dl>
+<dt>upper, lower, title, capitalize, strip</dt>
+<dd>the respective string methods</dd>
+<dt>default(text)</dt>
+<dd>text to be used, if the group did not participate in the match</dd>
+<dt>map(key=value, ..., *=fallback)</dt>
+<dd>inline lookup table, values without an entry are kept unless a
+    fallback is given</dd>
+<dt>table(name)</dt>
+<dd>lookup in a named table passed to compileTemplate</dd>
+</dl>
+
+A dollar sign is special only when followed by '{', '$${' gives a literal
+'${'. Other dollar signs, e.g. in '$$5', are kept as they are, so plain
+re.sub templates work unchanged. Templates are compiled once into a
+function of the match object, which may be passed to re.sub directly.
+"""
+
+from __future__ import unicode_literals
+
+import re
+
+
+class TemplateError(ValueError):
+    """
+    Class implementing an exception raised for invalid templates.
+    """
+    pass
+
+
+_expression = re.compile(r"\$(?:(\$)(?=\{)|\{([^}]*)\})")
+_filterCall = re.compile(r"^\s*(\w+)\s*(?:\((.*)\))?\s*$", re.DOTALL)
+
+
+def _groupValue(ref):
+    """
+    Function to create an accessor for a match group.
+    
+    @param ref group number or name (integer or string)
+    @return function returning the group value of a match (function)
+    """
+    def value(match):
+        return match.group(ref)
+    return value
+
+
+def _parseMapping(argument, expression):
+    """
+    Function to parse the entries of an inline lookup table.
+    
+    @param argument table entries separated by ',' (string)
+    @param expression complete expression for error messages (string)
+    @return tuple of the lookup table and the fallback value or None
+        (dict, string)
+    @exception TemplateError raised to indicate an invalid entry
+    """
+    table = {}
+    fallback = None
+    for entry in argument.split(","):
+        if not entry.strip():
+            continue
+        if "=" not in entry:
+            raise TemplateError(
+                "Invalid map entry '{0}' in '${{{1}}}'.".format(
+                    entry.strip(), expression))
+        key, value = entry.split("=", 1)
+        key = key.strip()
+        if key == "*":
+            fallback = value.strip()
+        else:
+            table[key] = value.strip()
+    return table, fallback
+
+
+def _lookup(table, fallback):
+    """
+    Function to create a table lookup filter.
+    
+    @param table lookup table (dict)
+    @param fallback value for missing keys, None keeps the value (string)
+    @return filter function (function)
+    """
+    if fallback is None:
+        return lambda value: table.get(value, value)
+    else:
+        return lambda value: table.get(value, fallback)
+
+
+_simpleFilters = {
+    "upper": lambda value: value and value.upper(),
+    "lower": lambda value: value and value.lower(),
+    "title": lambda value: value and value.title(),
+    "capitalize": lambda value: value and value.capitalize(),
+    "strip": lambda value: value and value.strip(),
+}
+
+
+def _compileFilter(spec, expression, tables, filters):
+    """
+    Function to compile one filter of an expression.
+    
+    @param spec filter specification (string)
+    @param expression complete expression for error messages (string)
+    @param tables named lookup tables (dict of dict)
+    @param filters additional filters (dict of functions)
+    @return filter function (function)
+    @exception TemplateError raised to indicate an invalid filter
+    """
+    m = _filterCall.match(spec)
+    if m is None:
+        raise TemplateError(
+            "Invalid filter '{0}' in '${{{1}}}'.".format(spec, expression))
+    name, argument = m.group(1), m.group(2)
+    
+    if name in _simpleFilters and argument is None:
+        return _simpleFilters[name]
+    elif name in filters and argument is None:
+        return filters[name]
+    elif name == "default" and argument is not None:
+        return lambda value, default=argument: default \
+            if value is None else value
+    elif name == "map" and argument is not None:
+        return _lookup(*_parseMapping(argument, expression))
+    elif name == "table" and argument is not None:
+        tableName = argument.strip()
+        if tableName not in tables:
+            raise TemplateError(
+                "Unknown table '{0}' in '${{{1}}}'.".format(
+                    tableName, expression))
+        table = dict(tables[tableName])
+        fallback = table.pop("*", None)
+        return _lookup(table, fallback)
+    
+    raise TemplateError(
+        "Unknown filter '{0}' in '${{{1}}}'.".format(spec, expression))
+
+
+def _compileExpression(expression, pattern, tables, filters):
+    """
+    Function to compile a '${...}' expression.
+    
+    @param expression text between the braces (string)
+    @param pattern regular expression the template is used with
+        (compiled regular expression) or None
+    @param tables named lookup tables (dict of dict)
+    @param filters additional filters (dict of functions)
+    @return function returning the expression value for a match (function)
+    @exception TemplateError raised to indicate an invalid expression
+    """
+    # split at '|' not enclosed in parentheses
+    parts = re.split(r"\|(?![^(]*\))", expression)
+    ref = parts[0].strip()
+    if ref.isdigit():
+        ref = int(ref)
+        if pattern is not None and ref > pattern.groups:
+            raise TemplateError(
+                "Invalid group reference '{0}'.".format(ref))
+    elif not re.match(r"^[A-Za-z_]\w*$", ref):
+        raise TemplateError(
+            "Invalid group name '{0}' in '${{{1}}}'.".format(
+                ref, expression))
+    elif pattern is not None and ref not in pattern.groupindex:
+        raise TemplateError("Unknown group name '{0}'.".format(ref))
+    
+    getter = _groupValue(ref)
+    functions = [_compileFilter(spec, expression, tables, filters)
+                 for spec in parts[1:]]
+    
+    def evaluate(match):
+        value = getter(match)
+        for function in functions:
+            value = function(value)
+        return "" if value is None else value
+    
+    return evaluate
+
+
+def _checkBackreferences(literal, pattern):
+    """
+    Function to check the backreferences of a literal template part.
+    
+    @param literal template part (string)
+    @param pattern regular expression the template is used with
+        (compiled regular expression) or None
+    @exception TemplateError raised to indicate an invalid backreference
+    """
+    if pattern is not None and "\\" in literal:
+        try:
+            # the template is parsed even if nothing matches
+            pattern.sub(literal, "")
+        except re.error as why:
+            raise TemplateError(str(why))
+
+
+def compileTemplate(template, pattern=None, tables=None, filters=None):
+    """
+    Function to compile a replacement template.
+    
+    @param template replacement template (string)
+    @param pattern regular expression the template is used with. It is
+        used to check the group references. (compiled regular expression)
+    @param tables named lookup tables (dict of dict)
+    @param filters additional filters taking and returning a string
+        (dict of functions)
+    @return function returning the replacement text for a match object
+        (function)
+    @exception TemplateError raised to indicate an invalid template
+    """
+    tables = tables or {}
+    filters = filters or {}
+    
+    if "${" not in template:
+        # plain re.sub template
+        _checkBackreferences(template, pattern)
+        return lambda match: match.expand(template)
+    
+    parts = []
+    pos = 0
+    for m in _expression.finditer(template):
+        literal = template[pos:m.start()]
+        if m.group(1):
+            literal += "$"
+        if literal:
+            parts.append(literal)
+        if m.group(2) is not None:
+            parts.append(_compileExpression(
+                m.group(2), pattern, tables, filters))
+        pos = m.end()
+    if template[pos:]:
+        parts.append(template[pos:])
+    
+    # merge adjacent literals and wrap the ones with backreferences
+    functions = []
+    for part in parts:
+        if callable(part):
+            functions.append(part)
+        elif functions and isinstance(functions[-1], str):
+            functions[-1] += part
+        else:
+            functions.append(part)
+    for index, part in enumerate(functions):
+        if isinstance(part, str):
+            if "\\" in part:
+                _checkBackreferences(part, pattern)
+                functions[index] = (
+                    lambda match, literal=part: match.expand(literal))
+            else:
+                functions[index] = lambda match, literal=part: literal
+    
+    if len(functions) == 1:
+        return functions[0]
+    
+    def replace(match):
+        return "".join([function(match) for function in functions])
+    
+    return replace
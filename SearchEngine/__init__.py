@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+
+"""
+Package implementing the Qt free parts of the search and replace engine.
+
+The modules of this package must not import PyQt5 so they can be used by
+command line tools and worker processes as well.
+"""
@@ -20,10 +20,10 @@ class Ui_FindFileDialog(object):
         self.buttonBox.setOrientation(QtCore.Qt.Horizontal)
         self.buttonBox.setStandardButtons(QtWidgets.QDialogButtonBox.Close)
         self.buttonBox.setObjectName("buttonBox")
-        self.gridLayout_2.addWidget(self.buttonBox, 7, 0, 1, 1)
+        self.gridLayout_2.addWidget(self.buttonBox, 8, 0, 1, 1)
         self.replaceButton = QtWidgets.QPushButton(FindFileDialog)
         self.replaceButton.setObjectName("replaceButton")
-        self.gridLayout_2.addWidget(self.replaceButton, 6, 0, 1, 1)
+        self.gridLayout_2.addWidget(self.replaceButton, 7, 0, 1, 1)
         self.gridLayout = QtWidgets.QGridLayout()
         self.gridLayout.setContentsMargins(2, 2, 2, 2)
         self.gridLayout.setHorizontalSpacing(2)
@@ -46,14 +46,32 @@ class Ui_FindFileDialog(object):
         self.dirButton.setChecked(True)
         self.dirButton.setObjectName("dirButton")
         self.gridLayout.addWidget(self.dirButton, 0, 1, 1, 1)
+        self.resourcesCheckBox = QtWidgets.QCheckBox(FindFileDialog)
+        self.resourcesCheckBox.setObjectName("resourcesCheckBox")
+        self.gridLayout.addWidget(self.resourcesCheckBox, 0, 2, 1, 1)
         self.add_btn = QtWidgets.QPushButton(FindFileDialog)
         self.add_btn.setObjectName("add_btn")
         self.gridLayout.addWidget(self.add_btn, 0, 3, 1, 1)
+        self.packButton = QtWidgets.QPushButton(FindFileDialog)
+        self.packButton.setObjectName("packButton")
+        self.gridLayout.addWidget(self.packButton, 0, 4, 1, 1)
         self.gridLayout_2.addLayout(self.gridLayout, 0, 0, 1, 1)
-        self.mdiArea = QtWidgets.QMdiArea(FindFileDialog)
-        self.mdiArea.setObjectName("mdiArea")
-        self.gridLayout_2.addWidget(self.mdiArea, 1, 0, 1, 1)
-        self.findList = QtWidgets.QTreeWidget(FindFileDialog)
+        self.rulesView = QtWidgets.QTableView(FindFileDialog)
+        self.rulesView.setContextMenuPolicy(QtCore.Qt.ActionsContextMenu)
+        self.rulesView.setAlternatingRowColors(True)
+        self.rulesView.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
+        self.rulesView.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.rulesView.setObjectName("rulesView")
+        self.rulesView.verticalHeader().setVisible(False)
+        self.gridLayout_2.addWidget(self.rulesView, 1, 0, 1, 1)
+        self.ruleEditor = subForm(FindFileDialog)
+        self.ruleEditor.setObjectName("ruleEditor")
+        self.gridLayout_2.addWidget(self.ruleEditor, 2, 0, 1, 1)
+        self.filterEdit = QtWidgets.QLineEdit(FindFileDialog)
+        self.filterEdit.setClearButtonEnabled(True)
+        self.filterEdit.setObjectName("filterEdit")
+        self.gridLayout_2.addWidget(self.filterEdit, 5, 0, 1, 1)
+        self.findList = QtWidgets.QTreeView(FindFileDialog)
         sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
         sizePolicy.setHorizontalStretch(0)
         sizePolicy.setVerticalStretch(3)
@@ -61,9 +79,9 @@ class Ui_FindFileDialog(object):
         self.findList.setSizePolicy(sizePolicy)
         self.findList.setMinimumSize(QtCore.QSize(0, 150))
         self.findList.setAlternatingRowColors(True)
-        self.findList.setColumnCount(2)
+        self.findList.setUniformRowHeights(False)
         self.findList.setObjectName("findList")
-        self.gridLayout_2.addWidget(self.findList, 5, 0, 1, 1)
+        self.gridLayout_2.addWidget(self.findList, 6, 0, 1, 1)
         self.findProgress = QtWidgets.QProgressBar(FindFileDialog)
         self.findProgress.setProperty("value", 0)
         self.findProgress.setOrientation(QtCore.Qt.Horizontal)
@@ -84,6 +102,7 @@ class Ui_FindFileDialog(object):
         self.buttonBox.rejected.connect(FindFileDialog.close)
         self.dirButton.toggled['bool'].connect(self.dirPicker.setEnabled)
         QtCore.QMetaObject.connectSlotsByName(FindFileDialog)
+        FindFileDialog.setTabOrder(self.filterEdit, self.findList)
         FindFileDialog.setTabOrder(self.findList, self.replaceButton)
 
     def retranslateUi(self, FindFileDialog):
@@ -95,12 +114,18 @@ class Ui_FindFileDialog(object):
         self.dirPicker.setToolTip(_translate("FindFileDialog", "Enter the directory to search in"))
         self.dirButton.setToolTip(_translate("FindFileDialog", "Search in files of a directory tree to be entered below"))
         self.dirButton.setText(_translate("FindFileDialog", "Find in Directory tree"))
+        self.resourcesCheckBox.setToolTip(_translate("FindFileDialog", "Select to search the files of .qrc files outside of the directory tree and the entries of .rcc files as well, the latter are read only"))
+        self.resourcesCheckBox.setText(_translate("FindFileDialog", "Include Qt resources"))
         self.add_btn.setText(_translate("FindFileDialog", "Add"))
+        self.packButton.setToolTip(_translate("FindFileDialog", "Load, save or remove rule packs"))
+        self.packButton.setText(_translate("FindFileDialog", "Packs"))
+        self.rulesView.setToolTip(_translate("FindFileDialog", "Rules to search for, the current rule is edited below"))
+        self.filterEdit.setToolTip(_translate("FindFileDialog", "Enter terms to filter the results, use \"re:\" for a regular expression and \"path:\" to filter by file name"))
+        self.filterEdit.setPlaceholderText(_translate("FindFileDialog", "Filter results"))
         self.findList.setSortingEnabled(True)
-        self.findList.headerItem().setText(0, _translate("FindFileDialog", "File/Line"))
-        self.findList.headerItem().setText(1, _translate("FindFileDialog", "Text"))
         self.findProgress.setToolTip(_translate("FindFileDialog", "Shows the progress of the search action"))
         self.findProgress.setFormat(_translate("FindFileDialog", "%v/%m Files"))
 
 from E5Gui.E5PathPicker import E5ComboPathPicker
 from E5Gui.E5SqueezeLabels import E5SqueezeLabelPath
+from subWindow import subForm
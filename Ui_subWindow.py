@@ -76,6 +76,12 @@ class Ui_Form(object):
         self.wordCheckBox = QtWidgets.QCheckBox(Form)
         self.wordCheckBox.setObjectName("wordCheckBox")
         self.gridLayout.addWidget(self.wordCheckBox, 1, 0, 1, 1)
+        self.headerCheckBox = QtWidgets.QCheckBox(Form)
+        self.headerCheckBox.setObjectName("headerCheckBox")
+        self.gridLayout.addWidget(self.headerCheckBox, 3, 0, 1, 1)
+        self.structuralCheckBox = QtWidgets.QCheckBox(Form)
+        self.structuralCheckBox.setObjectName("structuralCheckBox")
+        self.gridLayout.addWidget(self.structuralCheckBox, 3, 1, 1, 1)
         self.verticalLayout.addLayout(self.gridLayout)
         self.gridLayout_3 = QtWidgets.QGridLayout()
         self.gridLayout_3.setObjectName("gridLayout_3")
@@ -108,7 +114,7 @@ class Ui_Form(object):
         self.TextLabel1.setText(_translate("Form", "Find text:"))
         self.findtextCombo.setToolTip(_translate("Form", "Enter the search text or regular expression"))
         self.replaceLabel.setText(_translate("Form", "Replace text:"))
-        self.replacetextCombo.setToolTip(_translate("Form", "Enter the replacement text or regular expression"))
+        self.replacetextCombo.setToolTip(_translate("Form", "Enter the replacement text or template, e.g. ${1|upper} or ${name|map(0=1,*=2)}"))
         self.filterCheckBox.setToolTip(_translate("Form", "Select to filter the files by a given filename pattern"))
         self.filterCheckBox.setText(_translate("Form", "Filter(format:*.qml;*.py)"))
         self.regexpCheckBox.setToolTip(_translate("Form", "Select if the searchtext is a regular expression"))
@@ -121,6 +127,10 @@ class Ui_Form(object):
         self.caseCheckBox.setText(_translate("Form", "&Match upper/lower case"))
         self.wordCheckBox.setToolTip(_translate("Form", "Select to match whole words only"))
         self.wordCheckBox.setText(_translate("Form", "&Whole word"))
+        self.headerCheckBox.setToolTip(_translate("Form", "Select to search only the header of the files, i.e. the lines up to the first line, that is not a comment, a pragma or an import"))
+        self.headerCheckBox.setText(_translate("Form", "&Header only"))
+        self.structuralCheckBox.setToolTip(_translate("Form", "Select to search the QML objects matching a query like \'Button[style]\', \'#okButton\' or \'Column > *[onClicked]\' instead of the text"))
+        self.structuralCheckBox.setText(_translate("Form", "QML s&tructure"))
         self.btn3.setText(_translate("Form", "qrc"))
         self.btn1.setText(_translate("Form", "QtQuick 2.*"))
         self.btn2.setText(_translate("Form", "Controls 2.*"))
@@ -0,0 +1,522 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module implementing the command line interface running rule files without a
+display.
+
+A rule file is the JSON file written by the Export button of the dialog.
+Rule packs (see SearchEngine.RulePack) are rule files as well, they may be
+given by name instead of a file name and added to a rule file by --pack.
+
+Usage:
+    python cli.py search RULES [PATH] [--format text|jsonl|csv] [--check]
+        [--jobs N] [--resources] [--pack PACK ...]
+    python cli.py replace RULES [PATH] [--dry-run] [--jobs N] [--resources]
+        [--pack PACK ...]
+    python cli.py serve [--stop | --stats]
+    python cli.py imports PATH [--module M] [--set MODULE[@OLD]=NEW ...]
+    python cli.py report PATH [--module M] [--format table|json] [--jobs N]
+
+The search and replace commands accept --daemon to let a running search
+daemon (started by the serve command) do the work with its warm caches.
+
+The exit code is 0 on success, 1 if matches were found in check mode and 2
+on errors.
+"""
+
+from __future__ import unicode_literals, print_function
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from SearchEngine.Rules import SearchRule, RuleError
+from SearchEngine.SearchJob import SearchJob
+from SearchEngine.ReplacePlan import ReplacePlan
+from SearchEngine.ResultStore import ResultStore
+from SearchEngine.DiffWriter import UnifiedDiffWriter
+from SearchEngine.Scanner import replaceFile, diffFile
+from SearchEngine.Daemon import DaemonClient, DaemonError, serve
+from SearchEngine.QmlImports import ImportIndex
+from SearchEngine.ImportReport import ImportReportJob
+from SearchEngine.QrcResolver import QrcResolver
+from SearchEngine.RulePack import RulePack, RulePackError, loadPack, \
+    findPack, mergePack
+from SearchEngine import ResultExport
+
+ExitOk = 0
+ExitMatches = 1
+ExitError = 2
+
+
+class CliError(Exception):
+    """
+    Class implementing an exception reporting a fatal error to the user.
+    """
+    pass
+
+
+class CliRun(object):
+    """
+    Class implementing the state of a command line run.
+    """
+    def __init__(self, args):
+        """
+        Constructor
+
+        @param args parsed command line arguments (argparse.Namespace)
+        """
+        self.args = args
+        self.ruleData = {}
+        self.errors = 0
+        self.files = 0
+        self.bytes = 0
+        self.__start = time.time()
+
+    def error(self, fileName, err):
+        """
+        Public method to report a file, that could not be processed.
+
+        @param fileName name of the file (string)
+        @param err error of the file (Exception)
+        """
+        self.errors += 1
+        print("{0}: {1}".format(fileName, err), file=sys.stderr)
+
+    def loadRules(self, withReplace=False):
+        """
+        Public method to load and compile the rules of the rule file.
+
+        @param withReplace flag indicating to compile the replacement
+            templates (boolean)
+        @return tuple of the compiled rules and the directory to search in
+            (list of SearchRule, string)
+        @exception CliError raised to indicate an unreadable or invalid rule
+            file or rule pack or an invalid directory
+        """
+        fileName = self.args.rules
+        try:
+            if not os.path.isfile(fileName):
+                fileName = findPack(fileName)
+            with open(fileName, "r") as f:
+                data = json.load(f)
+        except RulePackError:
+            raise CliError("no rule file or rule pack {0}".format(fileName))
+        except (IOError, ValueError) as err:
+            raise CliError("cannot read rule file {0}: {1}".format(
+                fileName, err))
+        if not isinstance(data, dict) or \
+                not isinstance(data.get('subs', []), list) or \
+                not isinstance(data.get('packs', []), list) or \
+                not isinstance(data.get('tables', {}), dict):
+            raise CliError("not a rule file: {0}".format(fileName))
+
+        # the rules of the packs follow the rules of the file
+        try:
+            packs = [RulePack.fromDict(packData)
+                     for packData in data.pop('packs', [])]
+            packs.extend(loadPack(findPack(name)) for name in self.args.pack)
+        except RulePackError as err:
+            raise CliError(str(err))
+        for pack in packs:
+            mergePack(data, pack)
+        self.ruleData = data
+
+        root = self.args.path or data.get('path', "")
+        if not root or not os.path.isdir(root):
+            raise CliError("not a directory: {0}".format(root))
+
+        rules = []
+        tables = data.get('tables', {})
+        filters = QrcResolver(root).filters()
+        for number, ruleData in enumerate(data.get('subs', []), 1):
+            try:
+                rule = SearchRule.fromDict(ruleData)
+                if not rule.findText:
+                    continue
+                rule.compile(tables, withReplace, filters)
+            except RuleError as err:
+                raise CliError("rule {0}: invalid {1} field: {2}".format(
+                    number, err.field, err))
+            rules.append(rule)
+        if not rules:
+            raise CliError("no rules in {0}".format(fileName))
+        return rules, root
+
+    def scan(self, rules, root, withReplace=False):
+        """
+        Public method to search a directory tree for rules.
+
+        @param rules compiled rules (list of SearchRule)
+        @param root directory to search in (string)
+        @param withReplace flag indicating to compute the edits (boolean)
+        @return generator yielding tuples of file name, MD5 hash and matches
+            of the files containing matches (string, string, list of tuples)
+        """
+        if self.args.daemon:
+            response = self.request("search", root,
+                                    {"rules": self.ruleData,
+                                     "replace": withReplace,
+                                     "resources": self.args.resources})
+            for fileName, hashStr, matches in response["results"]:
+                yield fileName, hashStr, matches
+            return
+
+        job = SearchJob(rules, root, withReplace, self.args.jobs,
+                        resources=self.args.resources)
+        for fileName, hashStr, matches in job.results():
+            if matches:
+                yield fileName, hashStr, matches
+        self.files += job.files
+        self.bytes += job.meter.doneBytes
+        for fileName, err in job.errors:
+            self.error(fileName, err)
+
+    def request(self, command, root, data):
+        """
+        Public method to send a request to the search daemon.
+
+        @param command name of the command (string)
+        @param root directory to search in (string)
+        @param data data of the request (dict)
+        @return response of the daemon (dict)
+        @exception CliError raised to indicate a failed request
+        """
+        try:
+            client = DaemonClient()
+            try:
+                response = client.request(command, os.path.abspath(root),
+                                          data)
+            finally:
+                client.close()
+        except DaemonError as err:
+            raise CliError(str(err))
+
+        self.files += response.get("files", 0)
+        self.bytes += response.get("bytes", 0)
+        for fileName, err in response.get("errors", []):
+            self.error(fileName, err)
+        return response
+
+    def conflict(self, fileName, line, reason, old, new):
+        """
+        Public method to report an edit rejected by the replace plan.
+
+        @param fileName name of the file (string)
+        @param line line number of the edit (integer)
+        @param reason reason of the rejection (string)
+        @param old text to be replaced (string)
+        @param new replacement text (string)
+        """
+        print("{0}:{1}: {2} edit skipped: {3!r} -> {4!r}".format(
+            fileName, line, reason, old, new), file=sys.stderr)
+
+    def printStats(self, text):
+        """
+        Public method to print the statistics of the run to stderr.
+
+        @param text description of the result (string)
+        """
+        if not self.args.quiet:
+            elapsed = max(time.time() - self.__start, 1e-6)
+            print("{0}, {1} file(s) scanned, {2:.1f} MB/s".format(
+                text, self.files, self.bytes / elapsed / (1024 * 1024)),
+                file=sys.stderr)
+
+
+def searchCommand(args):
+    """
+    Function implementing the search command.
+
+    @param args parsed command line arguments (argparse.Namespace)
+    @return exit code (integer)
+    """
+    run = CliRun(args)
+    rules, root = run.loadRules()
+
+    occurrences = 0
+    files = 0
+    writer = None
+    if args.format != "text" and not args.quiet:
+        # the matches are written file by file through a one file store
+        writer = ResultExport.ResultWriter(sys.stdout, args.format)
+        store = ResultStore()
+    for fileName, hashStr, matches in run.scan(rules, root):
+        occurrences += len(matches)
+        files += 1
+        if writer is not None:
+            store.addFile(fileName, hashStr, matches)
+            writer.writeStore(store)
+            store.clear()
+        elif not args.quiet:
+            for line, text, start, end, edits in sorted(matches):
+                print("{0}:{1}: {2}".format(fileName, line, text))
+
+    run.printStats("{0} occurrence(s) in {1} file(s)".format(
+        occurrences, files))
+    if run.errors:
+        return ExitError
+    if args.check and occurrences:
+        return ExitMatches
+    return ExitOk
+
+
+def replaceCommand(args):
+    """
+    Function implementing the replace command.
+
+    @param args parsed command line arguments (argparse.Namespace)
+    @return exit code (integer)
+    """
+    run = CliRun(args)
+    rules, root = run.loadRules(True)
+
+    if args.daemon:
+        response = run.request("replace", root, {"rules": run.ruleData,
+                                                 "dryRun": args.dry_run,
+                                                 "resources": args.resources})
+        sys.stdout.write(response.get("diff", ""))
+        for conflict in response["conflicts"]:
+            run.conflict(*conflict)
+        run.printStats("{0} file(s) {1}".format(
+            response["changed"],
+            "to be changed" if args.dry_run else "changed"))
+        return ExitError if run.errors else ExitOk
+
+    plan = ReplacePlan()
+    for fileName, hashStr, matches in run.scan(rules, root, True):
+        plan.addMatches(fileName, matches)
+
+    writer = UnifiedDiffWriter(sys.stdout, root) if args.dry_run else None
+    changed = 0
+    for fileName in plan.files():
+        try:
+            if writer is not None:
+                fileChanged, conflicts = diffFile(fileName, plan, writer)
+            else:
+                fileChanged, conflicts = replaceFile(fileName, plan)
+        except (IOError, OSError, LookupError, UnicodeError) as err:
+            run.error(fileName, err)
+            continue
+
+        for reason, edit in conflicts:
+            run.conflict(fileName, edit.line, reason, edit.old, edit.new)
+        if fileChanged:
+            changed += 1
+
+    run.printStats("{0} file(s) {1}".format(
+        changed, "to be changed" if args.dry_run else "changed"))
+    return ExitError if run.errors else ExitOk
+
+
+def importsCommand(args):
+    """
+    Function implementing the imports command.
+
+    @param args parsed command line arguments (argparse.Namespace)
+    @return exit code (integer)
+    @exception CliError raised to indicate an invalid argument
+    """
+    if not os.path.isdir(args.path):
+        raise CliError("not a directory: {0}".format(args.path))
+
+    changes = []
+    for change in args.set:
+        target, sep, newVersion = change.partition("=")
+        module, sep2, oldVersion = target.partition("@")
+        if not sep or not module:
+            raise CliError("invalid change '{0}', expected"
+                           " MODULE[@OLD]=NEW".format(change))
+        changes.append((module, newVersion, oldVersion if sep2 else None))
+
+    index = ImportIndex(args.filter)
+    index.update(args.path)
+    if not changes:
+        for module, version, fileName, line in index.entries(args.module):
+            print("{0}:{1}: import {2} {3}".format(
+                fileName, line, module, version).rstrip())
+        return ExitOk
+
+    errors = 0
+    for module, newVersion, oldVersion in changes:
+        changed, failed = index.setVersion(module, newVersion, oldVersion)
+        for fileName, err in failed:
+            print("{0}: {1}".format(fileName, err), file=sys.stderr)
+        errors += len(failed)
+        if not args.quiet:
+            print("{0}: {1} import(s) changed".format(module, changed),
+                  file=sys.stderr)
+    return ExitError if errors else ExitOk
+
+
+def reportCommand(args):
+    """
+    Function implementing the report command.
+
+    @param args parsed command line arguments (argparse.Namespace)
+    @return exit code (integer)
+    @exception CliError raised to indicate an invalid argument
+    """
+    if not os.path.isdir(args.path):
+        raise CliError("not a directory: {0}".format(args.path))
+
+    job = ImportReportJob(args.path, args.filter, args.jobs)
+    report = job.run()
+    for fileName, err in job.errors:
+        print("{0}: {1}".format(fileName, err), file=sys.stderr)
+
+    if args.format == "json":
+        print(json.dumps(report.toDict(args.module), indent=4))
+    else:
+        sys.stdout.write(report.formatTable(args.module))
+    if not args.quiet:
+        print("{0} file(s) scanned".format(report.files), file=sys.stderr)
+    return ExitError if job.errors else ExitOk
+
+
+def serveCommand(args):
+    """
+    Function implementing the serve command.
+
+    @param args parsed command line arguments (argparse.Namespace)
+    @return exit code (integer)
+    @exception CliError raised to indicate a failed request
+    """
+    if not args.stop and not args.stats:
+        serve()
+        return ExitOk
+
+    try:
+        client = DaemonClient()
+        try:
+            response = client.request("shutdown" if args.stop else "stats")
+        finally:
+            client.close()
+    except DaemonError as err:
+        raise CliError(str(err))
+    if args.stats:
+        print(json.dumps(response, indent=4))
+    return ExitOk
+
+
+def createParser():
+    """
+    Function to create the command line parser.
+
+    @return command line parser (argparse.ArgumentParser)
+    """
+    parser = argparse.ArgumentParser(
+        description="Run the rules of a rule file exported by the dialog"
+                    " without a display.")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    search = subparsers.add_parser(
+        "search", help="search for the rules and print the matches")
+    search.add_argument(
+        "--format", choices=["text", ResultExport.JsonLines,
+                             ResultExport.Csv],
+        default="text", help="output format of the matches")
+    search.add_argument(
+        "--check", action="store_true",
+        help="exit with code {0}, if matches were found".format(
+            ExitMatches))
+    search.set_defaults(function=searchCommand)
+
+    replace = subparsers.add_parser(
+        "replace", help="apply the replacements of the rules")
+    replace.add_argument(
+        "--dry-run", action="store_true",
+        help="print the changes as a unified diff instead of writing them")
+    replace.set_defaults(function=replaceCommand)
+
+    imports = subparsers.add_parser(
+        "imports", help="list or change the versions of QML imports, only"
+                        " the import headers of the files are read")
+    imports.add_argument("path", help="directory to search in")
+    imports.add_argument(
+        "--filter", default="*.qml",
+        help="file name wildcards separated by ';' (default: *.qml)")
+    imports.add_argument("--module", help="list the imports of a module")
+    imports.add_argument(
+        "--set", action="append", default=[], metavar="MODULE[@OLD]=NEW",
+        help="change the version of a module (only OLD, if given), an empty"
+             " NEW removes the version")
+    imports.add_argument(
+        "-q", "--quiet", action="store_true", help="don't print statistics")
+    imports.set_defaults(function=importsCommand)
+
+    report = subparsers.add_parser(
+        "report", help="count the imported versions of the QML modules,"
+                       " only the import headers of the files are read")
+    report.add_argument("path", help="directory to search in")
+    report.add_argument(
+        "--filter", default="*.qml",
+        help="file name wildcards separated by ';' (default: *.qml)")
+    report.add_argument("--module", help="report the versions of a module")
+    report.add_argument(
+        "--format", choices=["table", "json"], default="table",
+        help="output format of the report")
+    report.add_argument(
+        "-j", "--jobs", type=int, default=0,
+        help="number of worker processes (default: scan in process)")
+    report.add_argument(
+        "-q", "--quiet", action="store_true", help="don't print statistics")
+    report.set_defaults(function=reportCommand)
+
+    serveParser = subparsers.add_parser(
+        "serve", help="run a search daemon keeping its caches warm")
+    serveGroup = serveParser.add_mutually_exclusive_group()
+    serveGroup.add_argument(
+        "--stop", action="store_true", help="stop the running daemon")
+    serveGroup.add_argument(
+        "--stats", action="store_true",
+        help="print the cache statistics of the running daemon")
+    serveParser.set_defaults(function=serveCommand)
+
+    for subparser in (search, replace):
+        subparser.add_argument("rules", help="rule file (JSON)")
+        subparser.add_argument(
+            "path", nargs="?", default="",
+            help="directory to search in (default: path of the rule file)")
+        subparser.add_argument(
+            "-q", "--quiet", action="store_true",
+            help="don't print matches and statistics")
+        subparser.add_argument(
+            "-j", "--jobs", type=int, default=0,
+            help="number of worker processes (default: search in process)")
+        subparser.add_argument(
+            "--daemon", action="store_true",
+            help="let the running search daemon do the work")
+        subparser.add_argument(
+            "--resources", action="store_true",
+            help="search the files of .qrc files outside of the directory"
+                 " and the entries of .rcc files as well, the latter are"
+                 " read only")
+        subparser.add_argument(
+            "--pack", action="append", default=[],
+            help="add the rules of a rule pack given by file name or by"
+                 " name, the lookup tables of packs take precedence")
+    return parser
+
+
+def main(argv=None):
+    """
+    Function implementing the command line interface.
+
+    @param argv command line arguments without the program name
+        (list of strings)
+    @return exit code (integer)
+    """
+    args = createParser().parse_args(argv)
+    try:
+        return args.function(args)
+    except CliError as err:
+        print("error: {0}".format(err), file=sys.stderr)
+        return ExitError
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -33,8 +33,11 @@ except ImportError as e:
 
 class subForm(QWidget, Ui_Form):
     """
-    Class documentation goes here.
+    Class implementing the editor of a search and replace rule.
+
+    @signal ruleChanged() emitted, when a field of the rule was changed
     """
+    ruleChanged = pyqtSignal()
 
     def __init__(self, parent=None):
         """
@@ -45,11 +48,14 @@ class subForm(QWidget, Ui_Form):
         """
         super(subForm, self).__init__(parent)
         self.setupUi(self)
-        self.findParent().enableFindButton(self)
 
-    def closeEvent(self, QCloseEvent):
-        dia = self.findParent()
-        dia.enableFindButton(self, close=True)
+        self.findtextCombo.editTextChanged.connect(self.ruleChanged)
+        self.replacetextCombo.editTextChanged.connect(self.ruleChanged)
+        self.filterEdit.textChanged.connect(self.ruleChanged)
+        for checkBox in (self.caseCheckBox, self.regexpCheckBox,
+                         self.wordCheckBox, self.feelLikeCheckBox,
+                         self.headerCheckBox, self.structuralCheckBox):
+            checkBox.toggled.connect(self.ruleChanged)
 
     # ========================= quick input
     @pyqtSlot()
@@ -73,47 +79,13 @@ class subForm(QWidget, Ui_Form):
         """
         Slot documentation goes here.
         """
-        self.findtextCombo.setCurrentText("qrc:")
-        self.replacetextCombo.setCurrentText("file:///"+self.findParent().projectPath)
+        # resource URLs are resolved through the .qrc files of the project
+        self.findtextCombo.setCurrentText("qrc:/+[^\"'\\s)]*")
+        self.replacetextCombo.setCurrentText("${0|qrc}")
+        self.regexpCheckBox.setChecked(True)
+        self.filterEdit.setText("*.qml;*.js")
 
     # ========================= quick input
-    @pyqtSlot(str)
-    def on_findtextCombo_editTextChanged(self, text):
-        """
-        Private slot to handle the editTextChanged signal of the find
-        text combo.
-
-        @param text (ignored)
-        """
-        self.findParent().enableFindButton(self)
-
-    # @pyqtSlot(str)
-    # def on_replacetextCombo_editTextChanged(self, text):
-    #     """
-    #     Private slot to handle the editTextChanged signal of the replace
-    #     text combo.
-    #
-    #     @param text (ignored)
-    #     """
-    #
-    #     self.findParent().enableFindButton(self)
-
-    @pyqtSlot(str)
-    def on_filterEdit_textEdited(self, text):
-        """
-        Private slot to handle the textChanged signal of the file filter edit.
-
-        @param text (ignored)
-        """
-
-        self.findParent().enableFindButton(self)
-
-
-    def findParent(self):
-        own = self
-        while not isinstance(own.parent(), QDialog):
-            own = own.parent()
-        return own.parent()
 
     def serialize(self):
         return OrderedDict([
@@ -124,6 +96,8 @@ class subForm(QWidget, Ui_Form):
             ('wordCheckBox', self.wordCheckBox.isChecked()),
             ('feelLikeCheckBox', self.feelLikeCheckBox.isChecked()),
             ('filterEdit', self.filterEdit.text()),
+            ('headerCheckBox', self.headerCheckBox.isChecked()),
+            ('structuralCheckBox', self.structuralCheckBox.isChecked()),
         ])
 
     def deserialize(self, data):
@@ -136,6 +110,9 @@ class subForm(QWidget, Ui_Form):
         self.wordCheckBox.setChecked(data['wordCheckBox'])
         self.feelLikeCheckBox.setChecked(data['feelLikeCheckBox'])
         self.filterEdit.setText(data['filterEdit'])
+        self.headerCheckBox.setChecked(data.get('headerCheckBox', False))
+        self.structuralCheckBox.setChecked(
+            data.get('structuralCheckBox', False))
 
         return self
 